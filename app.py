@@ -1,6 +1,8 @@
 """
 小红书内容工作流 - 主程序入口
 """
+import gc
+
 import streamlit as st
 from dotenv import load_dotenv
 
@@ -26,6 +28,11 @@ from ui.components import (
 
 load_dotenv()
 
+# 模块导入完成后把已有对象移入永久代：分代 GC 不再反复扫描这些长期存活的对象。
+# 只在进程内首次运行时执行一次（脚本每次重跑都会执行到这里，GC 本身保持开启，不影响其他会话）
+if gc.get_freeze_count() == 0:
+    gc.freeze()
+
 # ========== 页面配置 ==========
 st.set_page_config(
     page_title="内容工作流",
@@ -7,8 +7,11 @@ import sys
 from pathlib import Path
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+import orjson
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 
@@ -19,6 +22,9 @@ sys.path.insert(0, str(ROOT_DIR))
 load_dotenv(ROOT_DIR / ".env")
 
 from backend.routers import topics, content, media, video, config
+from backend.routers.topics import close_topics_cache
+from modules.audio import close_volc_session
+from modules.writer import close_openrouter_client
 
 
 @asynccontextmanager
@@ -29,8 +35,22 @@ async def lifespan(app: FastAPI):
     (ROOT_DIR / "output/audio").mkdir(parents=True, exist_ok=True)
     (ROOT_DIR / "output/video").mkdir(parents=True, exist_ok=True)
     print("[Backend] 输出目录已就绪")
+    
+    # 环境变量在启动时读取一次，健康检查直接返回预序列化的结果
+    app.state.health_json = orjson.dumps({
+        "status": "ok",
+        "openrouter": bool(os.getenv("OPENROUTER_API_KEY")),
+        "replicate": bool(os.getenv("REPLICATE_API_TOKEN")),
+        "ark": bool(os.getenv("ARK_API_KEY")),
+        "volc_tts": bool(os.getenv("VOLC_TTS_APPID")),
+    })
+    app.state.ready = True
     yield
-    # 关闭时清理（如需要）
+    app.state.ready = False
+    # 关闭时清理：释放共享的 HTTP 连接池和 Redis 连接
+    close_openrouter_client()
+    close_volc_session()
+    await close_topics_cache()
 
 
 app = FastAPI(
@@ -38,8 +58,37 @@ app = FastAPI(
     description="Notion 风格 UI 的后端 API 服务",
     version="2.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,  # orjson 序列化，大响应（正文 + 分镜列表）更快
 )
 
+class StreamAwareGZipMiddleware(GZipMiddleware):
+    """GZip 压缩，但跳过流式接口（*/stream）：压缩缓冲会推迟 SSE / NDJSON 事件的送达"""
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/stream"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    带 Cache-Control 的静态文件服务
+    
+    素材都可能被同名覆盖（「换一张」、重新生成后写回同一缓存键），
+    不能长期缓存：每次用 ETag 协商，未变化时返回 304
+    """
+    
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = "no-cache"
+        return response
+
+
+# 响应压缩（正文、人设库等大于 1KB 的 JSON）
+app.add_middleware(StreamAwareGZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # CORS 配置（允许本地开发）
 app.add_middleware(
     CORSMiddleware,
@@ -56,9 +105,9 @@ app.add_middleware(
 )
 
 # 挂载静态文件（输出的图片/音频/视频）
-app.mount("/static/images", StaticFiles(directory=str(ROOT_DIR / "output/images")), name="images")
-app.mount("/static/audio", StaticFiles(directory=str(ROOT_DIR / "output/audio")), name="audio")
-app.mount("/static/video", StaticFiles(directory=str(ROOT_DIR / "output/video")), name="video")
+app.mount("/static/images", CachedStaticFiles(directory=str(ROOT_DIR / "output/images")), name="images")
+app.mount("/static/audio", CachedStaticFiles(directory=str(ROOT_DIR / "output/audio")), name="audio")
+app.mount("/static/video", CachedStaticFiles(directory=str(ROOT_DIR / "output/video")), name="video")
 
 # 注册路由
 app.include_router(topics.router, prefix="/api/topics", tags=["选题分析"])
@@ -73,19 +122,43 @@ async def root():
     return {"message": "小红书内容工作流 API", "version": "2.0.0"}
 
 
+_LIVE_JSON = orjson.dumps({"status": "ok"})
+_NOT_READY_JSON = orjson.dumps({"status": "starting"})
+
+
 @app.get("/health")
-async def health_check():
-    """健康检查"""
-    return {
-        "status": "ok",
-        "openrouter": bool(os.getenv("OPENROUTER_API_KEY")),
-        "replicate": bool(os.getenv("REPLICATE_API_TOKEN")),
-        "ark": bool(os.getenv("ARK_API_KEY")),
-        "volc_tts": bool(os.getenv("VOLC_TTS_APPID")),
-    }
+async def health_check(request: Request):
+    """健康检查（含各服务密钥是否配置，启动时计算）"""
+    return Response(content=request.app.state.health_json, media_type="application/json")
+
+
+@app.get("/health/live")
+async def health_live():
+    """存活探针：进程能响应即可"""
+    return Response(content=_LIVE_JSON, media_type="application/json")
+
+
+@app.get("/health/ready")
+async def health_ready(request: Request):
+    """就绪探针：启动流程完成后才返回 200"""
+    if getattr(request.app.state, "ready", False):
+        return Response(content=_LIVE_JSON, media_type="application/json")
+    return Response(content=_NOT_READY_JSON, media_type="application/json", status_code=503)
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8501, reload=True)
+    
+    # DEV=1 时单进程热重载；否则按 WEB_CONCURRENCY 启动多 worker
+    dev_mode = bool(os.getenv("DEV"))
+    uvicorn.run(
+        "backend.main:app",
+        host="0.0.0.0",
+        port=8501,
+        reload=dev_mode,
+        workers=1 if dev_mode else int(os.getenv("WEB_CONCURRENCY", "4")),
+        # uvloop 不支持 Windows，回退到默认事件循环
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+    )
 
@@ -0,0 +1,50 @@
+"""
+并发请求合并（singleflight）
+相同 key 的请求同时到达时只执行一次，其余请求等待同一结果
+"""
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict
+
+from pydantic import BaseModel
+
+# 进行中的请求（key -> Future）
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def request_key(endpoint: str, req: BaseModel) -> str:
+    """由端点名 + 请求体 JSON 计算合并键"""
+    return hashlib.sha256(f"{endpoint}:{req.model_dump_json()}".encode()).hexdigest()
+
+
+async def singleflight(key: str, factory: Callable[[], Awaitable[Any]], label: str = "") -> Any:
+    """
+    执行 factory()，若相同 key 的调用正在进行则直接等待其结果
+
+    Args:
+        key: 合并键
+        factory: 返回协程的无参函数（仅在没有进行中的调用时执行）
+        label: 日志标签
+    """
+    existing = _inflight.get(key)
+    if existing is not None:
+        print(f"[Singleflight] 合并重复请求: {label or key[:12]}")
+        # shield：某个等待方断开时不影响共享的任务
+        return await asyncio.shield(existing)
+
+    future = asyncio.get_running_loop().create_future()
+    # 没有其他等待方时也要取走异常，避免 "exception was never retrieved" 警告
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _inflight[key] = future
+    try:
+        result = await factory()
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _inflight.pop(key, None)
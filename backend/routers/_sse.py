@@ -0,0 +1,72 @@
+"""
+SSE 流式响应公共工具
+"""
+import asyncio
+from typing import AsyncIterator, Optional
+
+import orjson
+from fastapi.responses import StreamingResponse
+
+# 空闲多久（秒）发送一次心跳注释，防止代理/负载均衡断开长时间无数据的连接
+SSE_KEEPALIVE_INTERVAL = 15
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",  # 禁止 Nginx 缓冲，事件即时送达
+}
+
+KEEPALIVE_FRAME = b": keepalive\n\n"
+
+
+def sse_frame(data: dict, event: Optional[str] = None) -> bytes:
+    """
+    构造一帧 SSE 事件（直接输出 UTF-8 bytes，Starlette 无需再次编码）
+
+    Args:
+        data: 事件数据（序列化为 data 行）
+        event: 事件名（可选，生成 event 行）
+    """
+    frame = b"data: " + orjson.dumps(data) + b"\n\n"
+    if event:
+        return b"event: " + event.encode() + b"\n" + frame
+    return frame
+
+
+async def with_keepalive(events: AsyncIterator[bytes], interval: float = SSE_KEEPALIVE_INTERVAL) -> AsyncIterator[bytes]:
+    """
+    包装 SSE 事件流：两次事件间隔超过 interval 秒时插入 ": keepalive" 注释行
+
+    注释行以冒号开头，EventSource 和前端的 data 行解析都会忽略。
+    """
+    iterator = events.__aiter__()
+    next_event = asyncio.ensure_future(iterator.__anext__())
+    try:
+        while True:
+            done, _ = await asyncio.wait({next_event}, timeout=interval)
+            if not done:
+                yield KEEPALIVE_FRAME
+                continue
+
+            try:
+                event = next_event.result()
+            except StopAsyncIteration:
+                break
+
+            yield event
+            next_event = asyncio.ensure_future(iterator.__anext__())
+    finally:
+        # 客户端断开时：先取消正在等待的事件，再关闭底层生成器
+        if not next_event.done():
+            next_event.cancel()
+            await asyncio.gather(next_event, return_exceptions=True)
+        await iterator.aclose()
+
+
+def sse_response(events: AsyncIterator[bytes]) -> StreamingResponse:
+    """构造带心跳和防缓冲响应头的 SSE 响应"""
+    return StreamingResponse(
+        with_keepalive(events),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
@@ -0,0 +1,63 @@
+"""
+本地素材路径 -> 静态文件 URL 的公共转换
+"""
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+# 项目根目录
+ROOT_DIR = Path(__file__).parent.parent.parent
+
+# 各类素材的输出目录（启动时解析一次，与 main.py 中的 /static 挂载一致）
+OUTPUT_DIRS = {
+    media_type: (ROOT_DIR / "output" / media_type).resolve()
+    for media_type in ("images", "audio", "video")
+}
+_OUTPUT_PREFIXES = {media_type: str(d) + os.sep for media_type, d in OUTPUT_DIRS.items()}
+
+
+@lru_cache(maxsize=4096)
+def _local_url(path: str, media_type: str) -> str:
+    """本地路径 -> /static URL（纯字符串映射，结果可缓存）"""
+    # 快速路径：绝对路径已在输出目录下，无需 resolve 的系统调用
+    abs_path = os.path.abspath(path)
+    prefix = _OUTPUT_PREFIXES[media_type]
+    if abs_path.startswith(prefix):
+        rel_path = abs_path[len(prefix):].replace(os.sep, "/")
+        return f"/static/{media_type}/{rel_path}"
+
+    # 慢速路径：可能经过符号链接，解析后再比较
+    try:
+        rel_path = Path(path).resolve().relative_to(OUTPUT_DIRS[media_type])
+        return f"/static/{media_type}/{rel_path.as_posix()}"
+    except ValueError:
+        # 如果不在预期目录下，返回文件名
+        return f"/static/{media_type}/{Path(path).name}"
+
+
+def path_to_url(path: Optional[str], media_type: str, check_exists: bool = True) -> Optional[str]:
+    """
+    将本地路径转换为静态文件 URL，或直接返回 OSS URL
+
+    Args:
+        path: 本地文件路径或 OSS URL
+        media_type: "images" / "audio" / "video"
+        check_exists: 是否检查文件存在。刚生成/刚检查过的路径传 False，省去一次 stat
+            （挂载的远程文件系统上每次 stat 都是一次网络请求）
+
+    Returns:
+        URL，文件不存在时返回 None
+    """
+    if not path:
+        return None
+
+    # 如果已经是 URL（OSS 链接），直接返回
+    if path.startswith("http://") or path.startswith("https://"):
+        return path
+
+    # 本地路径：检查文件是否存在（不缓存，文件可能被删除）
+    if check_exists and not os.path.exists(path):
+        return None
+
+    return _local_url(path, media_type)
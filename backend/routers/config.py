@@ -1,11 +1,15 @@
 """
 配置 API（语音列表、模型列表、人设库等）
 """
+import threading
+
+import orjson
 from fastapi import APIRouter
+from fastapi.responses import Response
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Mapping, Optional, Tuple
 
-from modules.persona import get_categories, get_personas_by_category
+from modules.persona import get_personas_by_category, load_personas
 from modules.audio import EDGE_VOICES, VOLC_VOICES
 
 router = APIRouter()
@@ -53,99 +57,143 @@ class PersonaCategory(BaseModel):
     personas: List[PersonaItem]
 
 
+def _model_options() -> List[dict]:
+    return [
+        ModelOption(label=label, value=value).model_dump()
+        for label, value in AVAILABLE_MODELS.items()
+    ]
+
+
+def _provider_options(providers: Dict[str, str]) -> List[Dict[str, str]]:
+    return [
+        {"label": label, "value": value}
+        for value, label in providers.items()
+    ]
+
+
+def _voice_list(voices: Dict[str, str]) -> List[dict]:
+    return [
+        VoiceOption(label=label, value=value).model_dump()
+        for label, value in voices.items()
+    ]
+
+
+def _persona_items(personas) -> List[dict]:
+    return [
+        PersonaItem(name=p["name"], prompt=p.get("prompt", "")).model_dump()
+        for p in personas
+    ]
+
+
+def _persona_categories(personas: Mapping) -> List[dict]:
+    return [
+        PersonaCategory(category=cat, personas=_persona_items(items)).model_dump()
+        for cat, items in personas.items()
+    ]
+
+
+def _json_response(content: bytes) -> Response:
+    return Response(content=content, media_type="application/json")
+
+
+# ========== 预序列化的静态配置（模块加载时生成一次） ==========
+
+_VOICES = {
+    "edge": _voice_list(EDGE_VOICES),
+    "volcengine": _voice_list(VOLC_VOICES),
+}
+
+_MODEL_OPTIONS = _model_options()
+_IMAGE_PROVIDER_OPTIONS = _provider_options(IMAGE_PROVIDERS)
+_TTS_PROVIDER_OPTIONS = _provider_options(TTS_PROVIDERS)
+
+_MODELS_JSON = orjson.dumps({"models": _MODEL_OPTIONS})
+_IMAGE_PROVIDERS_JSON = orjson.dumps({"providers": _IMAGE_PROVIDER_OPTIONS})
+_TTS_PROVIDERS_JSON = orjson.dumps({"providers": _TTS_PROVIDER_OPTIONS})
+_VOICES_JSON = orjson.dumps(_VOICES)
+_VOICES_BY_PROVIDER_JSON = {
+    provider: orjson.dumps({"voices": voices})
+    for provider, voices in _VOICES.items()
+}
+_EMPTY_VOICES_JSON = orjson.dumps({"voices": []})
+
+
+# ========== 人设库（随 personas.json 变化，序列化结果按文件版本缓存） ==========
+
+# (人设库对象, /personas 响应体, /bootstrap 响应体)；load_personas 在文件未修改时返回同一个对象
+_persona_payload: Optional[Tuple[Mapping, bytes, bytes]] = None
+_persona_lock = threading.Lock()
+
+
+def _get_persona_payload() -> Tuple[bytes, bytes]:
+    """获取 /personas 与 /bootstrap 的序列化结果（personas.json 修改后才重新构建）"""
+    global _persona_payload
+    personas = load_personas()
+    with _persona_lock:
+        if _persona_payload is None or _persona_payload[0] is not personas:
+            categories = _persona_categories(personas)
+            _persona_payload = (
+                personas,
+                orjson.dumps({"categories": categories}),
+                orjson.dumps({
+                    "models": _MODEL_OPTIONS,
+                    "image_providers": _IMAGE_PROVIDER_OPTIONS,
+                    "tts_providers": _TTS_PROVIDER_OPTIONS,
+                    "voices": _VOICES,
+                    "categories": categories,
+                }),
+            )
+        return _persona_payload[1], _persona_payload[2]
+
+
+@router.get("/bootstrap")
+async def get_bootstrap():
+    """
+    一次性获取前端初始化所需的全部配置
+    
+    合并 models / image-providers / tts-providers / voices / personas，
+    页面加载只需一次请求；响应体预先序列化，只在人设库修改后重新生成
+    """
+    return _json_response(_get_persona_payload()[1])
+
+
 @router.get("/models")
 async def get_models():
     """获取可用的 LLM 模型列表"""
-    return {
-        "models": [
-            ModelOption(label=label, value=value)
-            for label, value in AVAILABLE_MODELS.items()
-        ]
-    }
+    return _json_response(_MODELS_JSON)
 
 
 @router.get("/image-providers")
 async def get_image_providers():
     """获取生图服务列表"""
-    return {
-        "providers": [
-            {"label": label, "value": value}
-            for value, label in IMAGE_PROVIDERS.items()
-        ]
-    }
+    return _json_response(_IMAGE_PROVIDERS_JSON)
 
 
 @router.get("/tts-providers")
 async def get_tts_providers():
     """获取 TTS 服务列表"""
-    return {
-        "providers": [
-            {"label": label, "value": value}
-            for value, label in TTS_PROVIDERS.items()
-        ]
-    }
+    return _json_response(_TTS_PROVIDERS_JSON)
 
 
 @router.get("/voices")
 async def get_voices():
     """获取所有可用语音角色"""
-    return {
-        "edge": [
-            VoiceOption(label=label, value=value)
-            for label, value in EDGE_VOICES.items()
-        ],
-        "volcengine": [
-            VoiceOption(label=label, value=value)
-            for label, value in VOLC_VOICES.items()
-        ],
-    }
+    return _json_response(_VOICES_JSON)
 
 
 @router.get("/voices/{provider}")
 async def get_voices_by_provider(provider: str):
     """获取指定 TTS 服务的语音角色"""
-    if provider == "edge":
-        voices = EDGE_VOICES
-    elif provider == "volcengine":
-        voices = VOLC_VOICES
-    else:
-        return {"voices": []}
-    
-    return {
-        "voices": [
-            VoiceOption(label=label, value=value)
-            for label, value in voices.items()
-        ]
-    }
+    return _json_response(_VOICES_BY_PROVIDER_JSON.get(provider, _EMPTY_VOICES_JSON))
 
 
 @router.get("/personas")
 async def get_personas():
     """获取所有人设分类和人设"""
-    categories = get_categories()
-    
-    result = []
-    for cat in categories:
-        personas = get_personas_by_category(cat)
-        result.append(PersonaCategory(
-            category=cat,
-            personas=[
-                PersonaItem(name=p["name"], prompt=p.get("prompt", ""))
-                for p in personas
-            ],
-        ))
-    
-    return {"categories": result}
+    return _json_response(_get_persona_payload()[0])
 
 
 @router.get("/personas/{category}")
 async def get_personas_in_category(category: str):
     """获取指定分类下的人设"""
-    personas = get_personas_by_category(category)
-    return {
-        "personas": [
-            PersonaItem(name=p["name"], prompt=p.get("prompt", ""))
-            for p in personas
-        ]
-    }
-
+    return _json_response(orjson.dumps({"personas": _persona_items(get_personas_by_category(category))}))
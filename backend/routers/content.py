@@ -1,23 +1,43 @@
 """
 内容生成 API
 """
+import asyncio
+
+import orjson
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+from typing import List, Optional, Dict, Any, Awaitable, Callable
 
+from backend.routers._singleflight import request_key, singleflight
+from backend.routers._sse import sse_frame, sse_response
 from modules.writer import (
     generate_note_package_with_retry,
+    iter_note_package,
     generate_outline_step,
     generate_content_step,
     generate_visuals_step
 )
 from modules.crawler import fetch_note_content
 from modules.md_exporter import export_note
+from modules.semantic_cache import SemanticCache
 
 router = APIRouter()
 
+# 相近选题的生成结果缓存（按 mode + 模型 + 人设 隔离）
+_semantic_cache = SemanticCache()
+
+async def _singleflight(endpoint: str, req: BaseModel, handler: Callable[[Any], Awaitable[Any]]):
+    """合并并发的重复请求：同一端点 + 同一请求体只执行一次 handler"""
+    return await singleflight(request_key(endpoint, req), lambda: handler(req), label=endpoint)
+
 
-class ImageDesign(BaseModel):
+class _FrozenModel(BaseModel):
+    """不可变模型：忽略未知字段，实例构造后不可修改（可在并发请求间安全共享）"""
+    model_config = ConfigDict(extra="ignore", frozen=True, protected_namespaces=())
+
+
+class ImageDesign(_FrozenModel):
     index: int = 0
     description: str = ""
     prompt: str = ""
@@ -25,7 +45,7 @@ class ImageDesign(BaseModel):
     cover_text: Optional[str] = None  # 主图文字（仅第一张图需要）
 
 
-class VisualScene(BaseModel):
+class VisualScene(_FrozenModel):
     scene_index: int = 0
     narration: str = ""
     description: str = ""
@@ -33,7 +53,7 @@ class VisualScene(BaseModel):
     prompt: str = ""
 
 
-class Diagram(BaseModel):
+class Diagram(_FrozenModel):
     index: int = 0
     title: str = ""
     description: str = ""
@@ -41,7 +61,18 @@ class Diagram(BaseModel):
     prompt: str = ""
 
 
-class GenerateRequest(BaseModel):
+# 列表批量校验器（模块加载时编译一次）
+IMAGE_DESIGNS_ADAPTER = TypeAdapter(List[ImageDesign])
+VISUAL_SCENES_ADAPTER = TypeAdapter(List[VisualScene])
+DIAGRAMS_ADAPTER = TypeAdapter(List[Diagram])
+
+
+def _with_index(items: List[dict], key: str = "index") -> List[dict]:
+    """为缺少序号的条目补上从 1 开始的序号"""
+    return [{key: i + 1, **item} for i, item in enumerate(items)]
+
+
+class GenerateRequest(_FrozenModel):
     topic: str
     persona: Optional[str] = None
     reference_url: Optional[str] = None
@@ -49,11 +80,9 @@ class GenerateRequest(BaseModel):
     llm_model: str = "deepseek/deepseek-chat"
     search_data: Optional[Dict[str, Any]] = None  # websearch 返回的完整热点数据
     temperature: float = 0.8  # LLM 温度参数，控制创意度 vs 稳定性
-    
-    model_config = {"protected_namespaces": ()}
 
 
-class GenerateResponse(BaseModel):
+class GenerateResponse(_FrozenModel):
     titles: List[str] = []
     content: str = ""
     image_designs: Optional[List[ImageDesign]] = None
@@ -65,18 +94,18 @@ class GenerateResponse(BaseModel):
 # 分步生成 API Request/Response Models
 # ============================================================================
 
-class OutlineRequest(BaseModel):
+class OutlineRequest(_FrozenModel):
     topic: str
     persona: Optional[str] = None
     search_data: Optional[Dict[str, Any]] = None
     model_name: str = "deepseek/deepseek-chat"
     temperature: float = 0.7
 
-class OutlineResponse(BaseModel):
+class OutlineResponse(_FrozenModel):
     titles: List[str]
     outline: List[str]
 
-class ContentRequest(BaseModel):
+class ContentRequest(_FrozenModel):
     topic: str
     outline: List[str]
     titles: List[str]
@@ -86,20 +115,29 @@ class ContentRequest(BaseModel):
     model_name: str = "deepseek/deepseek-chat"
     temperature: float = 0.8
 
-class ContentResponse(BaseModel):
+class ContentResponse(_FrozenModel):
     content: str
 
-class VisualsRequest(BaseModel):
+class VisualsRequest(_FrozenModel):
     topic: str
     content: str
     model_name: str = "deepseek/deepseek-chat"
     temperature: float = 0.7
     global_style: Optional[str] = None
 
-class VisualsResponse(BaseModel):
+class VisualsResponse(_FrozenModel):
     image_designs: List[ImageDesign]
     global_style: Optional[str] = None
 
+class PipelineRequest(_FrozenModel):
+    topic: str
+    persona: Optional[str] = None
+    search_data: Optional[Dict[str, Any]] = None
+    reference_url: Optional[str] = None
+    model_name: str = "deepseek/deepseek-chat"
+    temperature: float = 0.8
+    global_style: Optional[str] = None
+
 
 # ============================================================================
 # Endpoints
@@ -108,11 +146,16 @@ class VisualsResponse(BaseModel):
 @router.post("/step/outline", response_model=OutlineResponse)
 async def create_outline(req: OutlineRequest):
     """【Step 1】生成大纲和标题"""
+    return await _singleflight("step/outline", req, _create_outline)
+
+
+async def _create_outline(req: OutlineRequest) -> OutlineResponse:
     if not req.topic:
         raise HTTPException(status_code=400, detail="选题不能为空")
     
     try:
-        result = generate_outline_step(
+        result = await asyncio.to_thread(
+            generate_outline_step,
             topic=req.topic,
             search_data=req.search_data,
             persona=req.persona,
@@ -130,15 +173,20 @@ async def create_outline(req: OutlineRequest):
 @router.post("/step/content", response_model=ContentResponse)
 async def create_content_step(req: ContentRequest):
     """【Step 2】生成正文"""
+    return await _singleflight("step/content", req, _create_content_step)
+
+
+async def _create_content_step(req: ContentRequest) -> ContentResponse:
     try:
         # 抓取参考内容
         reference_text = None
         if req.reference_url:
-            ref_data = fetch_note_content(req.reference_url)
+            ref_data = await asyncio.to_thread(fetch_note_content, req.reference_url)
             if ref_data:
                 reference_text = f"标题：{ref_data.get('title', '')}\n\n{ref_data.get('content', '')}"
 
-        result = generate_content_step(
+        result = await asyncio.to_thread(
+            generate_content_step,
             topic=req.topic,
             outline=req.outline,
             titles=req.titles,
@@ -156,8 +204,13 @@ async def create_content_step(req: ContentRequest):
 @router.post("/step/visuals", response_model=VisualsResponse)
 async def create_visuals(req: VisualsRequest):
     """【Step 3】生成配图设计"""
+    return await _singleflight("step/visuals", req, _create_visuals)
+
+
+async def _create_visuals(req: VisualsRequest) -> VisualsResponse:
     try:
-        result = generate_visuals_step(
+        result = await asyncio.to_thread(
+            generate_visuals_step,
             topic=req.topic,
             content=req.content,
             model_name=req.model_name,
@@ -165,17 +218,9 @@ async def create_visuals(req: VisualsRequest):
             global_style=req.global_style
         )
         
-        designs = result.get("image_designs", [])
-        image_designs = [
-            ImageDesign(
-                index=d.get("index", i + 1),
-                description=d.get("description", ""),
-                prompt=d.get("prompt", ""),
-                sentiment=d.get("sentiment", ""),
-                cover_text=d.get("cover_text"),
-            )
-            for i, d in enumerate(designs)
-        ]
+        image_designs = IMAGE_DESIGNS_ADAPTER.validate_python(
+            _with_index(result.get("image_designs", []))
+        )
         
         return VisualsResponse(
             image_designs=image_designs,
@@ -185,27 +230,156 @@ async def create_visuals(req: VisualsRequest):
         raise HTTPException(status_code=500, detail=f"配图设计失败: {str(e)}")
 
 
-@router.post("/generate", response_model=GenerateResponse)
-async def generate_content(req: GenerateRequest):
+def _sse_event(event: str, data: dict) -> bytes:
+    """构造 SSE 事件（data 中同时带 type 字段，兼容只解析 data 行的客户端）"""
+    return sse_frame({"type": event, **data}, event=event)
+
+
+async def _pipeline_stream(req: PipelineRequest):
+    """分步生成 SSE 流：大纲 -> 正文 -> 配图设计，每步完成即推送"""
+    try:
+        outline_result = await asyncio.to_thread(
+            generate_outline_step,
+            topic=req.topic,
+            search_data=req.search_data,
+            persona=req.persona,
+            model_name=req.model_name,
+            temperature=req.temperature
+        )
+        titles = outline_result.get("titles", [])
+        outline = outline_result.get("outline", [])
+        yield _sse_event("outline", {"titles": titles, "outline": outline})
+        
+        reference_text = None
+        if req.reference_url:
+            ref_data = await asyncio.to_thread(fetch_note_content, req.reference_url)
+            if ref_data:
+                reference_text = f"标题：{ref_data.get('title', '')}\n\n{ref_data.get('content', '')}"
+        
+        content_result = await asyncio.to_thread(
+            generate_content_step,
+            topic=req.topic,
+            outline=outline,
+            titles=titles,
+            persona=req.persona,
+            search_data=req.search_data,
+            reference_text=reference_text,
+            model_name=req.model_name,
+            temperature=req.temperature
+        )
+        content = content_result.get("content", "")
+        yield _sse_event("content", {"content": content})
+        
+        visuals_result = await asyncio.to_thread(
+            generate_visuals_step,
+            topic=req.topic,
+            content=content,
+            model_name=req.model_name,
+            temperature=req.temperature,
+            global_style=req.global_style
+        )
+        image_designs = IMAGE_DESIGNS_ADAPTER.dump_python(IMAGE_DESIGNS_ADAPTER.validate_python(
+            _with_index(visuals_result.get("image_designs", []))
+        ))
+        yield _sse_event("visuals", {
+            "image_designs": image_designs,
+            "global_style": visuals_result.get("global_style"),
+        })
+    except Exception as e:
+        yield _sse_event("error", {"error": str(e)})
+    
+    yield _sse_event("done", {})
+
+
+@router.post("/stream")
+async def generate_content_stream(req: PipelineRequest):
+    """
+    分步生成（SSE）
+    
+    服务端依次执行 大纲 -> 正文 -> 配图设计，每步完成后立即推送，
+    省去前端三次往返；三步共用同一个连接池化的 LLM 客户端
+    """
+    if not req.topic or not req.topic.strip():
+        raise HTTPException(status_code=400, detail="选题不能为空")
+    
+    return sse_response(_pipeline_stream(req))
+
+
+def _normalize_designs(items: List[dict]) -> List[dict]:
+    return [
+        {
+            "index": d.get("index", i + 1),
+            "description": d.get("description", ""),
+            "prompt": d.get("prompt", ""),
+            "sentiment": d.get("sentiment", ""),
+            "cover_text": d.get("cover_text"),
+        }
+        for i, d in enumerate(items)
+    ]
+
+
+def _normalize_scenes(items: List[dict]) -> List[dict]:
+    return [
+        {
+            "scene_index": s.get("scene_index", i + 1),
+            "narration": s.get("narration", ""),
+            "description": s.get("description", ""),
+            "sentiment": s.get("sentiment", ""),
+            "prompt": s.get("prompt", ""),
+        }
+        for i, s in enumerate(items)
+    ]
+
+
+def _normalize_diagrams(items: List[dict]) -> List[dict]:
+    return [
+        {
+            "index": d.get("index", i + 1),
+            "title": d.get("title", ""),
+            "description": d.get("description", ""),
+            "diagram_type": d.get("diagram_type", "architecture"),
+            "prompt": d.get("prompt", ""),
+        }
+        for i, d in enumerate(items)
+    ]
+
+
+# response_model=None：响应体直接由 orjson 序列化，不再经过 Pydantic 校验；
+# 文档中的响应结构仍由 GenerateResponse 描述
+@router.post("/generate", response_model=None, responses={200: {"model": GenerateResponse}})
+async def generate_content(req: GenerateRequest) -> ORJSONResponse:
     """
     生成内容（图文/视频模式）
     
     图文模式：返回 titles + content + image_designs
     视频模式：返回 titles + content + visual_scenes
     """
+    return ORJSONResponse(await _singleflight("generate", req, _generate_content))
+
+
+async def _generate_content(req: GenerateRequest) -> dict:
     if not req.topic or not req.topic.strip():
         raise HTTPException(status_code=400, detail="选题不能为空")
     
+    # 语义缓存：有参考链接时结果依赖外部内容，不走缓存
+    cache_namespace = f"{req.mode}|{req.llm_model}|{req.persona or ''}"
+    use_cache = not req.reference_url
+    if use_cache:
+        cached = _semantic_cache.get(cache_namespace, req.topic.strip())
+        if cached is not None:
+            return cached
+    
     try:
         # 抓取参考内容（如有）
         reference_text = None
         if req.reference_url:
-            ref_data = fetch_note_content(req.reference_url)
+            ref_data = await asyncio.to_thread(fetch_note_content, req.reference_url)
             if ref_data:
                 reference_text = f"标题：{ref_data.get('title', '')}\n\n{ref_data.get('content', '')}"
         
-        # 调用写作模块（带质量检测和重试）
-        result = generate_note_package_with_retry(
+        # 调用写作模块（带质量检测和重试），在线程池中执行，避免阻塞事件循环
+        result = await asyncio.to_thread(
+            generate_note_package_with_retry,
             topic=req.topic.strip(),
             persona=req.persona,
             reference_text=reference_text,
@@ -220,50 +394,25 @@ async def generate_content(req: GenerateRequest):
         if not result or not result.get("titles"):
             raise HTTPException(status_code=500, detail="内容生成失败，请重试")
         
-        # 构造响应
-        response = GenerateResponse(
-            titles=result.get("titles", []),
-            content=result.get("content", ""),
-        )
-        
+        # 构造响应（与 GenerateResponse 结构一致的普通 dict）
+        payload = {
+            "titles": result.get("titles", []),
+            "content": result.get("content", ""),
+            "image_designs": None,
+            "visual_scenes": None,
+            "diagrams": None,
+        }
         if req.mode == "video":
-            scenes = result.get("visual_scenes", [])
-            response.visual_scenes = [
-                VisualScene(
-                    scene_index=s.get("scene_index", i + 1),
-                    narration=s.get("narration", ""),
-                    description=s.get("description", ""),
-                    sentiment=s.get("sentiment", ""),
-                    prompt=s.get("prompt", ""),
-                )
-                for i, s in enumerate(scenes)
-            ]
+            payload["visual_scenes"] = _normalize_scenes(result.get("visual_scenes", []))
         elif req.mode == "wechat":
-            diagrams_data = result.get("diagrams", [])
-            response.diagrams = [
-                Diagram(
-                    index=d.get("index", i + 1),
-                    title=d.get("title", ""),
-                    description=d.get("description", ""),
-                    diagram_type=d.get("diagram_type", "architecture"),
-                    prompt=d.get("prompt", ""),
-                )
-                for i, d in enumerate(diagrams_data)
-            ]
+            payload["diagrams"] = _normalize_diagrams(result.get("diagrams", []))
         else:
-            designs = result.get("image_designs", [])
-            response.image_designs = [
-                ImageDesign(
-                    index=d.get("index", i + 1),
-                    description=d.get("description", ""),
-                    prompt=d.get("prompt", ""),
-                    sentiment=d.get("sentiment", ""),
-                    cover_text=d.get("cover_text"),
-                )
-                for i, d in enumerate(designs)
-            ]
+            payload["image_designs"] = _normalize_designs(result.get("image_designs", []))
         
-        return response
+        if use_cache:
+            _semantic_cache.set(cache_namespace, req.topic.strip(), payload)
+        
+        return payload
         
     except HTTPException:
         raise
@@ -271,7 +420,70 @@ async def generate_content(req: GenerateRequest):
         raise HTTPException(status_code=500, detail=f"内容生成失败: {str(e)}")
 
 
-class ExportRequest(BaseModel):
+# 流式输出时列表字段的校验器及序号字段
+_STAGE_ADAPTERS = {
+    "image_designs": (IMAGE_DESIGNS_ADAPTER, "index"),
+    "visual_scenes": (VISUAL_SCENES_ADAPTER, "scene_index"),
+    "diagrams": (DIAGRAMS_ADAPTER, "index"),
+}
+
+
+def _ndjson_stream(req: GenerateRequest, reference_text: Optional[str]):
+    """
+    内容生成 NDJSON 流（同步生成器，由 StreamingResponse 放到线程池中迭代）
+    
+    每行一个事件：{"stage": "titles" | "content" | "image_designs" | ..., "data": ...}，
+    最后以 {"stage": "done"} 或 {"stage": "error", "data": 错误信息} 结束
+    """
+    try:
+        for event in iter_note_package(
+            topic=req.topic.strip(),
+            persona=req.persona,
+            reference_text=reference_text,
+            mode=req.mode,
+            model_name=req.llm_model,
+            search_data=req.search_data,
+            temperature=req.temperature,
+        ):
+            if event["stage"] in _STAGE_ADAPTERS:
+                adapter, index_key = _STAGE_ADAPTERS[event["stage"]]
+                event = {
+                    "stage": event["stage"],
+                    "data": adapter.dump_python(adapter.validate_python(_with_index(event["data"], key=index_key))),
+                }
+            yield orjson.dumps(event) + b"\n"
+    except Exception as e:
+        yield orjson.dumps({"stage": "error", "data": str(e)}) + b"\n"
+        return
+    
+    yield orjson.dumps({"stage": "done"}) + b"\n"
+
+
+@router.post("/generate/stream")
+async def generate_content_ndjson(req: GenerateRequest):
+    """
+    流式生成内容（NDJSON）
+    
+    与 /generate 参数相同，但每完成一个阶段立即推送（标题 → 正文 → 配图/分镜），
+    不做质量重试
+    """
+    if not req.topic or not req.topic.strip():
+        raise HTTPException(status_code=400, detail="选题不能为空")
+    
+    reference_text = None
+    if req.reference_url:
+        ref_data = await asyncio.to_thread(fetch_note_content, req.reference_url)
+        if ref_data:
+            reference_text = f"标题：{ref_data.get('title', '')}\n\n{ref_data.get('content', '')}"
+    
+    return StreamingResponse(
+        _ndjson_stream(req, reference_text),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class ExportRequest(_FrozenModel):
     topic: str
     title: str
     content: str
@@ -279,7 +491,7 @@ class ExportRequest(BaseModel):
     tags: Optional[List[str]] = None
 
 
-class ExportResponse(BaseModel):
+class ExportResponse(_FrozenModel):
     success: bool
     file_path: Optional[str] = None
     error: Optional[str] = None
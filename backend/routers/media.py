@@ -2,26 +2,46 @@
 素材生成 API（图片 + 音频）
 支持 SSE 流式进度推送
 """
-import os
 import asyncio
-import json
+from functools import partial
+from operator import attrgetter
 from pathlib import Path
-from typing import List, Optional
+from typing import Awaitable, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, ConfigDict
+
+from backend.routers._sse import sse_frame, sse_response
+from backend.routers._urls import path_to_url
+from modules.painter import DEFAULT_OUTPUT_DIR as IMAGE_OUTPUT_DIR, generate_single_image, image_cache_params
+from modules.utils import get_unique_dir
+from modules import media_cache
+from modules.audio import (
+    DEFAULT_OUTPUT_DIR as AUDIO_OUTPUT_DIR,
+    EDGE_SEMAPHORE_LIMIT,
+    VOLC_MAX_WORKERS,
+    generate_audio_for_scenes_async,
+    generate_single_audio,
+)
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+router = APIRouter()
 
-from modules.painter import generate_images, generate_single_image
-from modules.audio import generate_audio_for_scenes, generate_single_audio
+# 单个批次内同时进行的生图请求上限（避免触发服务商限流）
+IMAGE_CONCURRENCY = 8
 
-router = APIRouter()
+# SSE 待发送事件队列上限：客户端读取慢时生产者阻塞等待，避免结果在内存中堆积
+SSE_QUEUE_SIZE = 4
+
+_DONE_FRAME = sse_frame({"type": "done"})
 
-# 项目根目录
-ROOT_DIR = Path(__file__).parent.parent.parent
+# SSE 等待结果时检查客户端是否断开的间隔（秒）
+DISCONNECT_POLL_INTERVAL = 1.0
 
 
 class SceneInput(BaseModel):
+    """分镜输入（不可变：同一实例可在图片/音频请求间共享，无需重新校验或复制）"""
+    model_config = ConfigDict(frozen=True)
+    
     prompt: str
     narration: Optional[str] = None
     sentiment: Optional[str] = None
@@ -32,6 +52,7 @@ class ImageRequest(BaseModel):
     provider: str = "replicate"  # "replicate" | "volcengine"
     topic: Optional[str] = None
     use_schnell: bool = False  # True: flux-schnell (快), False: flux-dev (高质量)
+    no_cache: bool = False  # True: 忽略素材缓存，强制重新生成
 
 
 class AudioRequest(BaseModel):
@@ -39,6 +60,7 @@ class AudioRequest(BaseModel):
     provider: str = "edge"  # "edge" | "volcengine"
     voice: Optional[str] = None
     topic: Optional[str] = None
+    no_cache: bool = False
 
 
 class SingleImageRequest(BaseModel):
@@ -47,6 +69,7 @@ class SingleImageRequest(BaseModel):
     provider: str = "replicate"
     topic: Optional[str] = None
     use_schnell: bool = False
+    no_cache: bool = True  # 单张生成多用于「换一张」，默认不读缓存
 
 
 class SingleAudioRequest(BaseModel):
@@ -55,6 +78,7 @@ class SingleAudioRequest(BaseModel):
     provider: str = "edge"
     voice: Optional[str] = None
     topic: Optional[str] = None
+    no_cache: bool = True
 
 
 class MediaResult(BaseModel):
@@ -70,73 +94,181 @@ class BatchMediaResponse(BaseModel):
     total: int
 
 
-def _path_to_url(path: str, media_type: str) -> Optional[str]:
-    """将本地路径转换为静态文件 URL，或直接返回 OSS URL"""
-    if not path:
-        return None
+class MediaAllRequest(BaseModel):
+    """图片 + 音频一次性生成（两批任务并行执行）"""
+    scenes: List[SceneInput]
+    image_provider: str = "replicate"
+    audio_provider: str = "edge"
+    voice: Optional[str] = None
+    topic: Optional[str] = None
+    use_schnell: bool = False
+    no_cache: bool = False
+
+    def image_request(self) -> "ImageRequest":
+        return ImageRequest(
+            scenes=self.scenes,
+            provider=self.image_provider,
+            topic=self.topic,
+            use_schnell=self.use_schnell,
+            no_cache=self.no_cache,
+        )
+
+    def audio_request(self) -> "AudioRequest":
+        return AudioRequest(
+            scenes=self.scenes,
+            provider=self.audio_provider,
+            voice=self.voice,
+            topic=self.topic,
+            no_cache=self.no_cache,
+        )
+
+
+class MediaAllResponse(BaseModel):
+    images: BatchMediaResponse
+    audio: BatchMediaResponse
+
+
+def _audio_cache_params(narration: str, provider: str, voice: Optional[str], topic: Optional[str]) -> dict:
+    """决定 TTS 结果的参数（素材缓存键）"""
+    return {
+        "provider": provider,
+        "voice": voice or "",
+        "narration": narration,
+        "topic": topic or "",
+    }
+
+
+def _image_output_dir(topic: Optional[str]) -> Path:
+    """批量生图的输出目录（有主题时按主题建独立子目录）"""
+    return get_unique_dir(IMAGE_OUTPUT_DIR, topic) if topic else IMAGE_OUTPUT_DIR
+
+
+_image_fields = attrgetter("prompt", "sentiment")
+_narration = attrgetter("narration")
+
+
+def _image_scenes(scenes: List[SceneInput]) -> List[dict]:
+    """分镜 -> 生图模块所需的 {"prompt", "sentiment"}（每个请求只构造一次）"""
+    return [{"prompt": p, "sentiment": s or ""} for p, s in map(_image_fields, scenes)]
+
+
+def _audio_scenes(scenes: List[SceneInput]) -> List[dict]:
+    """分镜 -> 音频模块所需的 {"narration"}"""
+    return [{"narration": n or ""} for n in map(_narration, scenes)]
+
+
+async def _generate_image_result(
+    semaphore: asyncio.Semaphore,
+    req: ImageRequest,
+    index: int,
+    scene: dict,
+    output_dir: Path,
+) -> MediaResult:
+    """在线程池中生成单张图片，并发数由 semaphore 限制"""
+    async with semaphore:
+        try:
+            path, error = await asyncio.to_thread(
+                media_cache.get_or_compute,
+                "images",
+                image_cache_params(scene, req.provider, req.use_schnell, req.topic),
+                partial(
+                    generate_single_image,
+                    scene=scene,
+                    index=index,
+                    provider=req.provider,
+                    output_dir=output_dir,
+                    topic=req.topic,
+                    use_schnell=req.use_schnell,
+                ),
+                req.no_cache,
+            )
+        except Exception as e:
+            path, error = None, str(e)
     
-    # 如果已经是 URL（OSS 链接），直接返回
-    if path.startswith("http://") or path.startswith("https://"):
-        return path
+    return MediaResult(
+        index=index,
+        path=path,
+        url=path_to_url(path, "images", check_exists=False) if path else None,
+        error=None if path else (error or "生成失败"),
+    )
+
+
+def _batch_response(results: List[MediaResult]) -> BatchMediaResponse:
+    """汇总批量生成结果"""
+    return BatchMediaResponse(
+        results=results,
+        success_count=sum(1 for r in results if r.path),
+        total=len(results),
+    )
+
+
+def _audio_output_dir(topic: Optional[str]) -> Path:
+    """逐段配音的输出目录（有主题时按主题建独立子目录）"""
+    return get_unique_dir(AUDIO_OUTPUT_DIR, topic) if topic else AUDIO_OUTPUT_DIR
+
+
+def _audio_concurrency(provider: str) -> int:
+    """逐段配音的并发上限，与音频模块的批量并发限制保持一致"""
+    return EDGE_SEMAPHORE_LIMIT if provider == "edge" else VOLC_MAX_WORKERS
+
+
+async def _generate_audio_result(
+    semaphore: asyncio.Semaphore,
+    req: AudioRequest,
+    index: int,
+    scene: dict,
+    output_dir: Path,
+) -> MediaResult:
+    """在线程池中合成单段音频，并发数由 semaphore 限制"""
+    async with semaphore:
+        try:
+            path, error = await asyncio.to_thread(
+                media_cache.get_or_compute,
+                "audio",
+                _audio_cache_params(scene["narration"], req.provider, req.voice, req.topic),
+                partial(
+                    generate_single_audio,
+                    scene=scene,
+                    index=index,
+                    provider=req.provider,
+                    voice=req.voice,
+                    output_dir=output_dir,
+                    topic=req.topic,
+                ),
+                req.no_cache,
+            )
+        except Exception as e:
+            path, error = None, str(e)
     
-    # 本地路径：检查文件是否存在
-    if not os.path.exists(path):
-        return None
+    return MediaResult(
+        index=index,
+        path=path,
+        url=path_to_url(path, "audio", check_exists=False) if path else None,
+        error=None if path else (error or "生成失败"),
+    )
+
+
+async def _run_images(req: ImageRequest) -> List[MediaResult]:
+    """所有分镜并发生图（并发数受 IMAGE_CONCURRENCY 限制），按分镜顺序返回结果"""
+    output_dir = await asyncio.to_thread(_image_output_dir, req.topic)
+    semaphore = asyncio.Semaphore(IMAGE_CONCURRENCY)
     
-    # 获取相对于 output 目录的路径
-    output_dir = ROOT_DIR / "output" / media_type
-    try:
-        # 将两个路径都转为绝对路径再比较
-        abs_path = Path(path).resolve()
-        abs_output_dir = output_dir.resolve()
-        rel_path = abs_path.relative_to(abs_output_dir)
-        return f"/static/{media_type}/{rel_path}"
-    except ValueError:
-        # 如果不在预期目录下，返回文件名
-        return f"/static/{media_type}/{Path(path).name}"
+    return await asyncio.gather(*[
+        _generate_image_result(semaphore, req, i, scene, output_dir)
+        for i, scene in enumerate(_image_scenes(req.scenes))
+    ])
 
 
 @router.post("/images", response_model=BatchMediaResponse)
 async def generate_images_batch(req: ImageRequest):
     """
-    批量生成图片（使用 FLUX 模型）
+    批量生成图片（使用 FLUX 模型，所有分镜并发生成）
     """
     if not req.scenes:
         raise HTTPException(status_code=400, detail="分镜列表不能为空")
     
     try:
-        # 转换为 modules 需要的格式
-        scenes = [
-            {"prompt": s.prompt, "sentiment": s.sentiment or ""}
-            for s in req.scenes
-        ]
-        
-        # 统一使用 FLUX 生图
-        paths = generate_images(
-            scenes=scenes,
-            provider=req.provider,
-            topic=req.topic,
-            use_schnell=req.use_schnell,
-        )
-        
-        # 构造结果
-        results = []
-        for i, path in enumerate(paths):
-            results.append(MediaResult(
-                index=i,
-                path=path,
-                url=_path_to_url(path, "images") if path else None,
-                error=None if path else "生成失败",
-            ))
-        
-        success_count = sum(1 for r in results if r.path)
-        
-        return BatchMediaResponse(
-            results=results,
-            success_count=success_count,
-            total=len(req.scenes),
-        )
-        
+        return _batch_response(await _run_images(req))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"图片生成失败: {str(e)}")
 
@@ -147,20 +279,27 @@ async def generate_image_single(req: SingleImageRequest):
     生成单张图片（用于重试）
     """
     try:
-        scene = {"prompt": req.scene.prompt, "sentiment": req.scene.sentiment or ""}
+        scene, = _image_scenes([req.scene])
         
-        path, error = generate_single_image(
-            scene=scene,
-            index=req.index,
-            provider=req.provider,
-            topic=req.topic,
-            use_schnell=req.use_schnell,
+        path, error = await asyncio.to_thread(
+            media_cache.get_or_compute,
+            "images",
+            image_cache_params(scene, req.provider, req.use_schnell, req.topic),
+            partial(
+                generate_single_image,
+                scene=scene,
+                index=req.index,
+                provider=req.provider,
+                topic=req.topic,
+                use_schnell=req.use_schnell,
+            ),
+            req.no_cache,
         )
         
         return MediaResult(
             index=req.index,
             path=path,
-            url=_path_to_url(path, "images") if path else None,
+            url=path_to_url(path, "images", check_exists=False) if path else None,
             error=error,
         )
         
@@ -168,44 +307,61 @@ async def generate_image_single(req: SingleImageRequest):
         return MediaResult(index=req.index, error=str(e))
 
 
-@router.post("/audio", response_model=BatchMediaResponse)
-async def generate_audio_batch(req: AudioRequest):
-    """
-    批量生成音频
-    """
-    if not req.scenes:
-        raise HTTPException(status_code=400, detail="分镜列表不能为空")
+async def _run_audio(req: AudioRequest) -> List[MediaResult]:
+    """批量生成音频（先查素材缓存，未命中的分镜并发 TTS），按分镜顺序返回结果"""
+    narrations = [n or "" for n in map(_narration, req.scenes)]
+    cache_keys = [
+        media_cache.make_key(**_audio_cache_params(text, req.provider, req.voice, req.topic))
+        for text in narrations
+    ]
     
-    try:
-        # 转换格式
-        scenes = [{"narration": s.narration or ""} for s in req.scenes]
+    # 先查素材缓存，命中的分镜不再调用 TTS
+    if req.no_cache:
+        cached = [None] * len(narrations)
+    else:
+        cached = await asyncio.to_thread(
+            lambda: [media_cache.lookup("audio", key) for key in cache_keys]
+        )
+    
+    paths = list(cached)
+    if not all(cached):
+        # 已命中的分镜传空文本（音频模块会直接跳过），保持分镜序号与文件命名不变
+        scenes = [{"narration": "" if hit else text} for text, hit in zip(narrations, cached)]
         
-        # 调用音频模块
-        paths = generate_audio_for_scenes(
+        # 调用音频模块（异步并发，不阻塞事件循环）
+        generated = await generate_audio_for_scenes_async(
             scenes=scenes,
             provider=req.provider,
             voice=req.voice,
             topic=req.topic,
         )
         
-        # 构造结果
-        results = []
-        for i, path in enumerate(paths):
-            results.append(MediaResult(
-                index=i,
-                path=path,
-                url=_path_to_url(path, "audio") if path else None,
-                error=None if path else "生成失败",
-            ))
-        
-        success_count = sum(1 for r in results if r.path)
-        
-        return BatchMediaResponse(
-            results=results,
-            success_count=success_count,
-            total=len(req.scenes),
+        for i, path in enumerate(generated):
+            if path and not cached[i]:
+                paths[i] = path
+                await asyncio.to_thread(media_cache.store, "audio", cache_keys[i], path)
+    
+    return [
+        MediaResult(
+            index=i,
+            path=path,
+            url=path_to_url(path, "audio", check_exists=False) if path else None,
+            error=None if path else "生成失败",
         )
-        
+        for i, path in enumerate(paths)
+    ]
+
+
+@router.post("/audio", response_model=BatchMediaResponse)
+async def generate_audio_batch(req: AudioRequest):
+    """
+    批量生成音频
+    """
+    if not req.scenes:
+        raise HTTPException(status_code=400, detail="分镜列表不能为空")
+    
+    try:
+        return _batch_response(await _run_audio(req))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"音频生成失败: {str(e)}")
 
@@ -216,20 +372,27 @@ async def generate_audio_single(req: SingleAudioRequest):
     生成单段音频（用于重试）
     """
     try:
-        scene = {"narration": req.scene.narration or ""}
+        scene, = _audio_scenes([req.scene])
         
-        path, error = generate_single_audio(
-            scene=scene,
-            index=req.index,
-            provider=req.provider,
-            voice=req.voice,
-            topic=req.topic,
+        path, error = await asyncio.to_thread(
+            media_cache.get_or_compute,
+            "audio",
+            _audio_cache_params(scene["narration"], req.provider, req.voice, req.topic),
+            partial(
+                generate_single_audio,
+                scene=scene,
+                index=req.index,
+                provider=req.provider,
+                voice=req.voice,
+                topic=req.topic,
+            ),
+            req.no_cache,
         )
         
         return MediaResult(
             index=req.index,
             path=path,
-            url=_path_to_url(path, "audio") if path else None,
+            url=path_to_url(path, "audio", check_exists=False) if path else None,
             error=error,
         )
         
@@ -239,54 +402,166 @@ async def generate_audio_single(req: SingleAudioRequest):
 
 # ========== SSE 流式进度 ==========
 
-async def _generate_images_stream(req: ImageRequest):
-    """图片生成 SSE 流"""
-    scenes = [
-        {"prompt": s.prompt, "sentiment": s.sentiment or ""}
-        for s in req.scenes
-    ]
+async def _stream_results(request: Request, jobs: List[Tuple[str, Awaitable[MediaResult]]]):
+    """
+    并发执行生成任务，按完成顺序产出 SSE 事件
     
-    for i, scene in enumerate(scenes):
-        yield f"data: {json.dumps({'type': 'progress', 'index': i, 'total': len(scenes), 'status': 'generating'})}\n\n"
-        
-        try:
-            path, error = generate_single_image(
-                scene=scene,
-                index=i,
-                provider=req.provider,
-                topic=req.topic,
-                use_schnell=req.use_schnell,
-            )
-            
-            result = {
-                "type": "result",
-                "index": i,
-                "path": path,
-                "url": _path_to_url(path, "images") if path else None,
-                "error": error,
-            }
-            yield f"data: {json.dumps(result)}\n\n"
-            
-        except Exception as e:
-            yield f"data: {json.dumps({'type': 'result', 'index': i, 'error': str(e)})}\n\n"
-        
-        await asyncio.sleep(0.1)  # 小延迟让前端有时间处理
+    每个任务完成后把 {"type": 事件类型, **结果} 放入有界队列，
+    客户端读取慢时生产者阻塞等待，自动限速。
+    等待结果期间定期检查客户端是否已断开，断开后立即取消未完成的任务（避免浪费付费接口调用）
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+    
+    async def _produce(event_type: str, job: Awaitable[MediaResult]):
+        result = await job
+        await queue.put({"type": event_type, **result.model_dump()})
+    
+    tasks = [asyncio.create_task(_produce(event_type, job)) for event_type, job in jobs]
+    
+    try:
+        remaining = len(tasks)
+        while remaining:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=DISCONNECT_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    print(f"[Media] 客户端已断开，取消剩余 {remaining} 个生成任务")
+                    return
+                continue
+            remaining -= 1
+            yield sse_frame(event)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _generate_images_stream(request: Request, req: ImageRequest):
+    """
+    图片生成 SSE 流
+    
+    所有分镜并发生成（并发数受 IMAGE_CONCURRENCY 限制），哪张先完成就先推送哪张，
+    结果带 index，前端按索引归位
+    """
+    total = len(req.scenes)
+    output_dir = await asyncio.to_thread(_image_output_dir, req.topic)
+    semaphore = asyncio.Semaphore(IMAGE_CONCURRENCY)
+    
+    for i in range(total):
+        yield sse_frame({"type": "progress", "index": i, "total": total, "status": "generating"})
     
-    yield f"data: {json.dumps({'type': 'done'})}\n\n"
+    async for event in _stream_results(request, [
+        ("result", _generate_image_result(semaphore, req, i, scene, output_dir))
+        for i, scene in enumerate(_image_scenes(req.scenes))
+    ]):
+        yield event
+    
+    yield _DONE_FRAME
 
 
 @router.post("/images/stream")
-async def generate_images_stream(req: ImageRequest):
+async def generate_images_stream(request: Request, req: ImageRequest):
     """
     流式生成图片（SSE）
     
     实时推送每张图片的生成进度和结果
     """
-    return StreamingResponse(
-        _generate_images_stream(req),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-        },
+    return sse_response(_generate_images_stream(request, req))
+
+
+async def _generate_audio_stream(request: Request, req: AudioRequest):
+    """
+    音频生成 SSE 流
+    
+    逐个分镜并发合成（并发数按服务商限制），哪段先完成就先推送哪段
+    """
+    total = len(req.scenes)
+    output_dir = await asyncio.to_thread(_audio_output_dir, req.topic)
+    semaphore = asyncio.Semaphore(_audio_concurrency(req.provider))
+    
+    for i in range(total):
+        yield sse_frame({"type": "progress", "index": i, "total": total, "status": "generating"})
+    
+    async for event in _stream_results(request, [
+        ("result", _generate_audio_result(semaphore, req, i, scene, output_dir))
+        for i, scene in enumerate(_audio_scenes(req.scenes))
+    ]):
+        yield event
+    
+    yield _DONE_FRAME
+
+
+@router.post("/audio/stream")
+async def generate_audio_stream(request: Request, req: AudioRequest):
+    """
+    流式生成音频（SSE）
+    
+    实时推送每段音频的生成进度和结果
+    """
+    if not req.scenes:
+        raise HTTPException(status_code=400, detail="分镜列表不能为空")
+    
+    return sse_response(_generate_audio_stream(request, req))
+
+
+# ========== 图片 + 音频并行生成 ==========
+
+@router.post("/all", response_model=MediaAllResponse)
+async def generate_all_media(req: MediaAllRequest):
+    """
+    同时生成图片和音频
+    
+    两批任务互不依赖，并行执行：总耗时约为 max(生图, 配音) 而不是两者之和
+    """
+    if not req.scenes:
+        raise HTTPException(status_code=400, detail="分镜列表不能为空")
+    
+    try:
+        images, audio = await asyncio.gather(
+            _run_images(req.image_request()),
+            _run_audio(req.audio_request()),
+        )
+        return MediaAllResponse(images=_batch_response(images), audio=_batch_response(audio))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"素材生成失败: {str(e)}")
+
+
+async def _generate_all_stream(request: Request, req: MediaAllRequest):
+    """
+    图片 + 音频 SSE 流
+    
+    两类任务一起调度，事件按完成顺序推送（image_result / audio_result）
+    """
+    image_req = req.image_request()
+    audio_req = req.audio_request()
+    total = len(req.scenes)
+    image_dir, audio_dir = await asyncio.gather(
+        asyncio.to_thread(_image_output_dir, req.topic),
+        asyncio.to_thread(_audio_output_dir, req.topic),
     )
+    image_semaphore = asyncio.Semaphore(IMAGE_CONCURRENCY)
+    audio_semaphore = asyncio.Semaphore(_audio_concurrency(audio_req.provider))
+    
+    yield sse_frame({"type": "progress", "total": total, "status": "generating"})
+    
+    jobs = [
+        ("image_result", _generate_image_result(image_semaphore, image_req, i, scene, image_dir))
+        for i, scene in enumerate(_image_scenes(req.scenes))
+    ] + [
+        ("audio_result", _generate_audio_result(audio_semaphore, audio_req, i, scene, audio_dir))
+        for i, scene in enumerate(_audio_scenes(req.scenes))
+    ]
+    async for event in _stream_results(request, jobs):
+        yield event
+    
+    yield _DONE_FRAME
+
+
+@router.post("/all/stream")
+async def generate_all_media_stream(request: Request, req: MediaAllRequest):
+    """
+    流式同时生成图片和音频（SSE）
+    """
+    if not req.scenes:
+        raise HTTPException(status_code=400, detail="分镜列表不能为空")
+    
+    return sse_response(_generate_all_stream(request, req))
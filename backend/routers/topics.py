@@ -1,17 +1,55 @@
 """
 选题分析 API
 """
+import asyncio
+import os
+import threading
+
+from cachetools import TTLCache
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List, Optional, Dict
-from datetime import datetime, timedelta
+from typing import List, Optional
 
+from backend.routers._singleflight import singleflight
 from modules.trend import analyze_trends
 
 router = APIRouter()
 
-# 简单内存缓存（生产环境建议用 Redis）
-_topics_cache: Dict[str, dict] = {}
+# 选题缓存：6 小时过期
+# 设置 REDIS_URL 时使用 Redis（多 worker / 重启后共享），否则或 Redis 不可用时使用进程内存缓存
+TOPICS_CACHE_TTL = 6 * 3600
+REDIS_URL = os.getenv("REDIS_URL", "")
+_topics_cache: TTLCache = TTLCache(maxsize=1024, ttl=TOPICS_CACHE_TTL)
+_topics_cache_lock = threading.Lock()
+
+_redis = None
+# Redis 初始化失败（未安装 / REDIS_URL 无效）后不再重试，避免每次请求都重复告警
+_redis_unavailable = False
+
+
+def _get_redis():
+    """获取 Redis 客户端（懒加载，未配置、未安装 redis 或 REDIS_URL 无效时返回 None）"""
+    global _redis, _redis_unavailable
+    if _redis is None and REDIS_URL and not _redis_unavailable:
+        try:
+            import redis.asyncio as aioredis
+            _redis = aioredis.from_url(REDIS_URL, decode_responses=False)
+            print("[Topics Cache] 使用 Redis 缓存")
+        except ImportError:
+            _redis_unavailable = True
+            print("[Topics Cache Warning] 未安装 redis，使用内存缓存")
+        except Exception as e:
+            _redis_unavailable = True
+            print(f"[Topics Cache Warning] Redis 初始化失败，使用内存缓存: {e}")
+    return _redis
+
+
+async def close_topics_cache():
+    """关闭 Redis 连接（应用关闭时调用）"""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
 
 
 class TopicItem(BaseModel):
@@ -32,6 +70,34 @@ class AnalyzeResponse(BaseModel):
     source: str  # "websearch" | "fallback" | "error"
 
 
+async def _cache_get(keyword: str) -> Optional[AnalyzeResponse]:
+    """读取选题缓存（Redis 出错时回退到内存缓存）"""
+    client = _get_redis()
+    if client is not None:
+        try:
+            raw = await client.get(f"topics:{keyword}")
+            return AnalyzeResponse.model_validate_json(raw) if raw else None
+        except Exception as e:
+            print(f"[Topics Cache Warning] Redis 读取失败，回退内存缓存: {e}")
+    
+    with _topics_cache_lock:
+        return _topics_cache.get(keyword)
+
+
+async def _cache_set(keyword: str, response: AnalyzeResponse):
+    """写入选题缓存（Redis 出错时回退到内存缓存）"""
+    client = _get_redis()
+    if client is not None:
+        try:
+            await client.set(f"topics:{keyword}", response.model_dump_json(), ex=TOPICS_CACHE_TTL)
+            return
+        except Exception as e:
+            print(f"[Topics Cache Warning] Redis 写入失败，回退内存缓存: {e}")
+    
+    with _topics_cache_lock:
+        _topics_cache[keyword] = response
+
+
 @router.post("/analyze", response_model=AnalyzeResponse)
 async def analyze_topic(req: AnalyzeRequest):
     """
@@ -46,10 +112,19 @@ async def analyze_topic(req: AnalyzeRequest):
     # 统一关键词格式（小写，避免大小写重复）
     keyword = req.keyword.strip().lower()
     
+    # 相同关键词的并发请求共享同一次搜索
+    return await singleflight(
+        f"topics:{req.mode}:{keyword}",
+        lambda: _analyze_topic(req, keyword),
+        label=f"topics/{keyword}",
+    )
+
+
+async def _analyze_topic(req: AnalyzeRequest, keyword: str) -> AnalyzeResponse:
     # 快速模式：直接用 LLM 推荐（不联网搜索）
     if req.mode == "llm":
         print(f"[Topics LLM Mode] 快速推荐: {keyword}")
-        topics_raw, source = analyze_trends(req.keyword.strip(), force_fallback=True)
+        topics_raw, source = await asyncio.to_thread(analyze_trends, req.keyword.strip(), force_fallback=True)
         
         topics = []
         for t in topics_raw:
@@ -66,28 +141,20 @@ async def analyze_topic(req: AnalyzeRequest):
         
         return AnalyzeResponse(topics=topics, source="llm")
     
-    # 检查缓存（仅 websearch 模式）
-    if keyword in _topics_cache:
-        cached = _topics_cache[keyword]
-        cached_time = datetime.fromisoformat(cached['timestamp'])
-        
-        # 6小时内有效
-        if datetime.now() - cached_time < timedelta(hours=6):
-            print(f"[Topics Cache Hit] 使用缓存数据: {keyword}")
-            return AnalyzeResponse(
-                topics=cached['topics'],
-                source=cached['source'] + "_cached"
-            )
-        else:
-            # 缓存过期，删除
-            print(f"[Topics Cache Expired] 缓存已过期: {keyword}")
-            del _topics_cache[keyword]
+    # 检查缓存（仅 websearch 模式，过期条目自动淘汰）
+    cached = await _cache_get(keyword)
+    if cached is not None:
+        print(f"[Topics Cache Hit] 使用缓存数据: {keyword}")
+        return AnalyzeResponse(
+            topics=cached.topics,
+            source=cached.source + "_cached"
+        )
     
     # 缓存未命中，执行实际搜索
     print(f"[Topics Cache Miss] 执行实际搜索: {keyword}")
     
     try:
-        topics_raw, source = analyze_trends(req.keyword.strip())
+        topics_raw, source = await asyncio.to_thread(analyze_trends, req.keyword.strip())
         
         # 标准化数据格式
         topics = []
@@ -106,12 +173,8 @@ async def analyze_topic(req: AnalyzeRequest):
         
         # 只缓存成功的搜索结果（source == "websearch"）
         if source == "websearch" and topics:
-            _topics_cache[keyword] = {
-                'topics': [t.dict() for t in topics],
-                'source': source,
-                'timestamp': datetime.now().isoformat()
-            }
-            print(f"[Topics Cache Saved] 缓存已保存: {keyword}, 过期时间: {datetime.now() + timedelta(hours=6)}")
+            await _cache_set(keyword, AnalyzeResponse(topics=topics, source=source))
+            print(f"[Topics Cache Saved] 缓存已保存: {keyword}, 有效期 {TOPICS_CACHE_TTL // 3600} 小时")
         else:
             print(f"[Topics Cache Skip] 跳过缓存（source={source}，仅缓存成功的websearch结果）")
         
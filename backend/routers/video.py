@@ -1,18 +1,21 @@
 """
 视频合成 API
 """
+import asyncio
 import os
-from pathlib import Path
+from functools import lru_cache
 from typing import List, Optional
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
+from backend.routers._urls import ROOT_DIR, path_to_url
 from modules.editor import create_video, get_total_duration, generate_srt
 
 router = APIRouter()
 
-ROOT_DIR = Path(__file__).parent.parent.parent
+# 支持的 BGM 格式
+BGM_EXTENSIONS = {".mp3", ".wav", ".m4a"}
 
 
 class SceneForVideo(BaseModel):
@@ -45,20 +48,9 @@ class DurationResponse(BaseModel):
     total_duration: float
 
 
-def _path_to_url(path: str, media_type: str) -> Optional[str]:
-    """将本地路径转换为静态文件 URL"""
-    if not path or not os.path.exists(path):
-        return None
-    
-    output_dir = ROOT_DIR / "output" / media_type
-    try:
-        # 将两个路径都转为绝对路径再比较
-        abs_path = Path(path).resolve()
-        abs_output_dir = output_dir.resolve()
-        rel_path = abs_path.relative_to(abs_output_dir)
-        return f"/static/{media_type}/{rel_path}"
-    except ValueError:
-        return f"/static/{media_type}/{Path(path).name}"
+def _missing_paths(paths: List[str]) -> List[str]:
+    """返回不存在的路径（在线程中整批 stat，不阻塞事件循环）"""
+    return [p for p in paths if not os.path.exists(p)]
 
 
 @router.post("/create", response_model=VideoResponse)
@@ -72,9 +64,11 @@ async def create_video_endpoint(req: CreateVideoRequest):
     if len(req.image_paths) != len(req.audio_paths):
         raise HTTPException(status_code=400, detail="图片和音频数量必须一致")
     
-    # 验证文件存在
-    missing_images = [p for p in req.image_paths if not os.path.exists(p)]
-    missing_audio = [p for p in req.audio_paths if not os.path.exists(p)]
+    # 验证文件存在（图片和音频并行检查）
+    missing_images, missing_audio = await asyncio.gather(
+        asyncio.to_thread(_missing_paths, req.image_paths),
+        asyncio.to_thread(_missing_paths, req.audio_paths),
+    )
     
     if missing_images:
         raise HTTPException(status_code=400, detail=f"图片文件不存在: {missing_images}")
@@ -88,7 +82,8 @@ async def create_video_endpoint(req: CreateVideoRequest):
             scenes = [{"narration": s.narration} for s in req.scenes]
         
         # 调用视频合成
-        video_path = create_video(
+        video_path = await asyncio.to_thread(
+            create_video,
             image_paths=req.image_paths,
             audio_paths=req.audio_paths,
             bgm_path=req.bgm_path,
@@ -97,21 +92,26 @@ async def create_video_endpoint(req: CreateVideoRequest):
             topic=req.topic,
         )
         
-        if not video_path or not os.path.exists(video_path):
+        if not video_path:
             return VideoResponse(error="视频合成失败")
         
-        # 获取时长
-        duration = get_total_duration(req.audio_paths)
-        
         # SRT 路径
         srt_path = video_path.rsplit(".", 1)[0] + ".srt"
-        srt_exists = os.path.exists(srt_path)
+        
+        # 输出文件检查与时长计算一起放到线程中
+        missing_outputs, duration = await asyncio.gather(
+            asyncio.to_thread(_missing_paths, [video_path, srt_path]),
+            asyncio.to_thread(get_total_duration, req.audio_paths),
+        )
+        if video_path in missing_outputs:
+            return VideoResponse(error="视频合成失败")
+        srt_exists = srt_path not in missing_outputs
         
         return VideoResponse(
             video_path=video_path,
-            video_url=_path_to_url(video_path, "video"),
+            video_url=path_to_url(video_path, "video", check_exists=False),
             srt_path=srt_path if srt_exists else None,
-            srt_url=_path_to_url(srt_path, "video") if srt_exists else None,
+            srt_url=path_to_url(srt_path, "video", check_exists=False) if srt_exists else None,
             duration=duration,
         )
         
@@ -125,33 +125,41 @@ async def get_duration(req: DurationRequest):
     计算音频总时长
     """
     try:
-        duration = get_total_duration(req.audio_paths)
+        duration = await asyncio.to_thread(get_total_duration, req.audio_paths)
         return DurationResponse(total_duration=duration)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"计算时长失败: {str(e)}")
 
 
+@lru_cache(maxsize=1)
+def _scan_bgm(mtime_ns: int) -> tuple:
+    """扫描 BGM 目录（以目录 mtime 为缓存键，目录内容变化后自动失效）"""
+    bgm_dir = ROOT_DIR / "assets/bgm"
+    with os.scandir(bgm_dir) as it:
+        entries = [
+            entry for entry in it
+            if entry.is_file() and os.path.splitext(entry.name)[1].lower() in BGM_EXTENSIONS
+        ]
+    entries.sort(key=lambda entry: entry.name)
+    return tuple(
+        {
+            "name": os.path.splitext(entry.name)[0],
+            "filename": entry.name,
+            "path": str(bgm_dir / entry.name),
+        }
+        for entry in entries
+    )
+
+
 @router.get("/bgm")
 async def list_bgm():
     """
     获取可用的 BGM 列表
     """
     bgm_dir = ROOT_DIR / "assets/bgm"
-    if not bgm_dir.exists():
+    try:
+        mtime_ns = bgm_dir.stat().st_mtime_ns
+    except OSError:
         return {"bgm_list": []}
     
-    bgm_files = []
-    for ext in ["*.mp3", "*.wav", "*.m4a"]:
-        bgm_files.extend(bgm_dir.glob(ext))
-    
-    return {
-        "bgm_list": [
-            {
-                "name": f.stem,
-                "filename": f.name,
-                "path": str(f),
-            }
-            for f in sorted(bgm_files)
-        ]
-    }
-
+    return {"bgm_list": list(_scan_bgm(mtime_ns))}
@@ -4,7 +4,7 @@ import { useState, useEffect } from "react";
 import { Sidebar, Header } from "@/components/layout";
 import { CreatorStudio, TopicRadar } from "@/components/blocks";
 import { useWorkflowStore } from "@/store/workflow";
-import { checkHealth, getModels, getVoices, getPersonas } from "@/lib/api";
+import { checkHealth, getConfigBootstrap } from "@/lib/api";
 import { toast } from "sonner";
 import {
   Dialog,
@@ -39,16 +39,16 @@ export default function Home() {
           toast.warning("OpenRouter API 未配置，写作功能可能受限");
         }
 
-        // Load models, voices, personas
-        const [modelsRes, voicesRes, personasRes] = await Promise.all([
-          getModels().catch(() => ({ models: [] })),
-          getVoices().catch(() => ({ edge: [], volcengine: [] })),
-          getPersonas().catch(() => ({ categories: [] })),
-        ]);
+        // Load models, voices, personas in a single request
+        const config = await getConfigBootstrap().catch(() => ({
+          models: [],
+          voices: { edge: [], volcengine: [] },
+          categories: [],
+        }));
 
-        setAvailableModels(modelsRes.models);
-        setAvailableVoices(voicesRes);
-        setAvailablePersonas(personasRes.categories);
+        setAvailableModels(config.models);
+        setAvailableVoices(config.voices);
+        setAvailablePersonas(config.categories);
       } catch (error) {
         console.error("Failed to load config:", error);
         toast.error("后端连接失败，请确保服务已启动");
@@ -255,6 +255,21 @@ export async function generateSingleAudio(params: {
   });
 }
 
+// Images + Audio (并行生成)
+export async function generateAllMedia(params: {
+  scenes: Array<{ prompt: string; narration?: string; sentiment?: string }>;
+  image_provider?: string;
+  audio_provider?: string;
+  voice?: string;
+  topic?: string;
+  use_schnell?: boolean;
+}): Promise<{ images: BatchMediaResponse; audio: BatchMediaResponse }> {
+  return fetchAPI<{ images: BatchMediaResponse; audio: BatchMediaResponse }>("/api/media/all", {
+    method: "POST",
+    body: JSON.stringify(params),
+  });
+}
+
 // Video
 export async function createVideo(params: {
   image_paths: string[];
@@ -284,6 +299,16 @@ export async function getBgmList(): Promise<{
 }
 
 // Config
+export async function getConfigBootstrap(): Promise<{
+  models: ModelOption[];
+  image_providers: Array<{ label: string; value: string }>;
+  tts_providers: Array<{ label: string; value: string }>;
+  voices: { edge: VoiceOption[]; volcengine: VoiceOption[] };
+  categories: PersonaCategory[];
+}> {
+  return fetchAPI("/api/config/bootstrap");
+}
+
 export async function getModels(): Promise<{ models: ModelOption[] }> {
   return fetchAPI("/api/config/models");
 }
@@ -299,6 +324,17 @@ export async function getPersonas(): Promise<{ categories: PersonaCategory[] }>
   return fetchAPI("/api/config/personas");
 }
 
+// SSE stream progress event
+export interface MediaStreamEvent {
+  type: "progress" | "result" | "done";
+  index?: number;
+  total?: number;
+  status?: string;
+  path?: string;
+  url?: string;
+  error?: string;
+}
+
 // SSE Stream for images
 export function streamImages(
   params: {
@@ -307,19 +343,32 @@ export function streamImages(
     topic?: string;
     use_schnell?: boolean;
   },
-  onProgress: (data: {
-    type: "progress" | "result" | "done";
-    index?: number;
-    total?: number;
-    status?: string;
-    path?: string;
-    url?: string;
-    error?: string;
-  }) => void
+  onProgress: (data: MediaStreamEvent) => void
+): () => void {
+  return streamSSE("/api/media/images/stream", params, onProgress);
+}
+
+// SSE Stream for audio
+export function streamAudio(
+  params: {
+    scenes: Array<{ narration: string }>;
+    provider?: string;
+    voice?: string;
+    topic?: string;
+  },
+  onProgress: (data: MediaStreamEvent) => void
+): () => void {
+  return streamSSE("/api/media/audio/stream", params, onProgress);
+}
+
+function streamSSE(
+  path: string,
+  params: object,
+  onProgress: (data: MediaStreamEvent) => void
 ): () => void {
   const controller = new AbortController();
 
-  fetch(`${API_BASE}/api/media/images/stream`, {
+  fetch(`${API_BASE}${path}`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify(params),
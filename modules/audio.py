@@ -8,12 +8,26 @@ import asyncio
 import uuid
 import json
 import base64
+import shutil
+import threading
+import time
 from pathlib import Path
 from typing import Optional, Tuple, List
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from modules import media_cache
 from modules.utils import sanitize_filename, get_unique_dir
-from modules.storage import upload_file_to_oss_by_topic
+from modules.storage_async import get_oss_writer
+
+# 可选依赖：只使用火山引擎时可以不安装 edge-tts
+try:
+    import edge_tts
+except ImportError:
+    edge_tts = None
 
 load_dotenv()
 
@@ -22,12 +36,267 @@ DEFAULT_OUTPUT_DIR = Path("output/audio")
 DEFAULT_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 
+# ========== Edge TTS 后台事件循环 ==========
+
+# 同步调用方（Streamlit、线程池）共用一个常驻事件循环，
+# 避免每次 asyncio.run() 都新建/销毁事件循环
+_edge_loop: Optional[asyncio.AbstractEventLoop] = None
+_edge_loop_lock = threading.Lock()
+
+
+def _get_edge_loop() -> asyncio.AbstractEventLoop:
+    """获取 Edge TTS 后台事件循环（懒加载，运行在守护线程中）"""
+    global _edge_loop
+    if _edge_loop is None:
+        with _edge_loop_lock:
+            if _edge_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="edge-tts-loop", daemon=True).start()
+                _edge_loop = loop
+    return _edge_loop
+
+
+def _run_on_edge_loop(coro):
+    """在后台事件循环中执行协程，阻塞等待结果（不可在该循环内部调用）"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_edge_loop()).result()
+
+
+# 相邻两次 Edge TTS 请求的最小间隔（秒）：微软按请求频率限流，单靠并发上限挡不住突发
+EDGE_MIN_INTERVAL = 0.25
+
+
+class _LeakyBucket:
+    """
+    漏桶限速：按固定间隔依次发放请求时间槽
+    
+    锁内只预约时间槽、不等待，HTTP 请求在锁外进行；
+    使用线程锁，可同时服务于多个事件循环（FastAPI 主循环、后台循环）
+    """
+    
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+    
+    def _reserve(self) -> float:
+        """预约下一个时间槽，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+            return slot - now
+    
+    async def wait(self):
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_edge_rate_limiter = _LeakyBucket(EDGE_MIN_INTERVAL)
+
+
+# ========== 火山引擎 HTTP 连接池 ==========
+
+VOLC_TTS_API_URL = "https://openspeech.bytedance.com/api/v1/tts"
+
+_volc_session = None
+_volc_session_lock = threading.Lock()
+
+
+def _get_volc_session():
+    """
+    获取火山引擎 TTS 的共享 Session（懒加载）
+    
+    连接池大小与线程池一致，各工作线程复用已建立的 TCP/TLS 连接
+    """
+    global _volc_session
+    if _volc_session is None:
+        with _volc_session_lock:
+            if _volc_session is None:
+                session = requests.Session()
+                session.headers["Connection"] = "keep-alive"
+                session.mount("https://", HTTPAdapter(
+                    pool_connections=VOLC_MAX_WORKERS,
+                    pool_maxsize=VOLC_MAX_WORKERS,
+                    max_retries=Retry(total=2, backoff_factor=0.3),
+                ))
+                _volc_session = session
+    return _volc_session
+
+
+def close_volc_session():
+    """关闭火山引擎 TTS 的共享 Session（应用关闭时调用）"""
+    global _volc_session
+    with _volc_session_lock:
+        if _volc_session is not None:
+            _volc_session.close()
+            _volc_session = None
+
+
+# ========== 火山引擎 WebSocket 二进制协议 ==========
+
+VOLC_TTS_WS_URL = "wss://openspeech.bytedance.com/api/v1/tts/ws_binary"
+# 设置 VOLC_TTS_TRANSPORT=http 可关闭 WebSocket，始终使用 HTTP 接口
+_volc_ws_enabled = os.getenv("VOLC_TTS_TRANSPORT", "ws").lower() != "http"
+
+# WebSocket 失败后的冷却时间（秒）：冷却期内直接走 HTTP，过期后重新尝试 WebSocket
+VOLC_WS_COOLDOWN = 60
+_volc_ws_retry_at = 0.0
+
+
+def _volc_ws_available() -> bool:
+    """WebSocket 是否可用（未被配置关闭，且不在失败冷却期内）"""
+    return _volc_ws_enabled and time.monotonic() >= _volc_ws_retry_at
+
+# 协议头：版本 1 / 头长 4 字节，完整客户端请求，JSON 序列化 + gzip 压缩
+_VOLC_WS_REQUEST_HEADER = bytes([0x11, 0x10, 0x11, 0x00])
+
+
+def _volc_fetch_ws(request_json: dict, token: str, file_path: str) -> int:
+    """
+    通过 WebSocket 二进制协议合成音频，服务端分片推送原始 MP3 数据，边收边写入文件
+    （相比 HTTP 接口省去 JSON + Base64 封装）
+    
+    Returns:
+        写入的字节数
+    
+    Raises:
+        异常时由调用方回退到 HTTP 接口
+    """
+    import gzip
+    from websockets.sync.client import connect
+    
+    payload = gzip.compress(json.dumps({
+        **request_json,
+        "request": {**request_json["request"], "operation": "submit"},
+    }).encode("utf-8"))
+    message = _VOLC_WS_REQUEST_HEADER + len(payload).to_bytes(4, "big") + payload
+    
+    written = 0
+    with connect(VOLC_TTS_WS_URL, additional_headers={"Authorization": f"Bearer; {token}"}, open_timeout=10) as ws, \
+            open(file_path, "wb") as f:
+        ws.send(message)
+        while True:
+            frame = ws.recv(timeout=60)
+            header_size = (frame[0] & 0x0F) * 4
+            message_type = frame[1] >> 4
+            flags = frame[1] & 0x0F
+            body = frame[header_size:]
+            
+            if message_type == 0xF:
+                # 错误消息：错误码 + 消息长度 + 消息体（可能经过 gzip 压缩）
+                code = int.from_bytes(body[:4], "big")
+                error = body[8:]
+                if frame[2] & 0x0F == 1:
+                    error = gzip.decompress(error)
+                raise RuntimeError(f"WebSocket 错误 {code}: {error.decode('utf-8', errors='ignore')}")
+            
+            if message_type != 0xB:
+                # 其他消息（如前端控制信息）忽略
+                continue
+            
+            if flags == 0:
+                # 无序号的确认帧，不含音频
+                continue
+            
+            sequence = int.from_bytes(body[:4], "big", signed=True)
+            size = int.from_bytes(body[4:8], "big")
+            written += f.write(body[8:8 + size])
+            if sequence < 0:
+                # 负序号表示最后一个分片
+                return written
+
+
+def _save_base64_audio(audio_base64: str, file_path: str, chunk_size: int = 64 * 1024) -> int:
+    """
+    分块解码 Base64 音频并写入文件，不在内存中构造完整的解码结果
+    
+    Args:
+        audio_base64: Base64 编码的音频（不含换行）
+        file_path: 输出文件路径
+        chunk_size: 每块的 Base64 字符数（必须是 4 的倍数）
+    
+    Returns:
+        写入的字节数
+    """
+    written = 0
+    with open(file_path, "wb") as f:
+        for start in range(0, len(audio_base64), chunk_size):
+            written += f.write(base64.b64decode(audio_base64[start:start + chunk_size]))
+    return written
+
+
+# ========== 旁白音频缓存 ==========
+
+# 相同 (服务商, 音色, 语速, 旁白) 的音频只合成一次，重新生成视频时直接复用；
+# 存放在素材缓存（media_cache）中，与其他素材共用过期时间和容量上限
+
+EDGE_RATE = "+50%"  # Edge TTS 语速（1.5 倍速）
+VOLC_SPEED_RATIO = 1.5  # 火山引擎语速
+
+
+def _audio_cache_key(provider: str, voice: str, rate, text: str) -> str:
+    """旁白音频的素材缓存键"""
+    return media_cache.make_key(provider=provider, voice=voice, rate=rate, narration=text)
+
+
+def _link_or_copy(src, dst):
+    """硬链接（零拷贝），跨文件系统等不支持时回退为复制"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def _prepare_output(file_path: str):
+    """
+    写入前先删除目标文件：目标可能是缓存文件的硬链接，
+    直接以 "wb" 打开会截断共享的 inode，把缓存一起清空
+    """
+    try:
+        os.unlink(file_path)
+    except FileNotFoundError:
+        pass
+
+
+def _restore_cached_audio(cache_key: str, file_path: str) -> bool:
+    """缓存命中时把音频链接到 file_path，返回是否命中（空文件视为未命中）"""
+    cached = media_cache.lookup("audio", cache_key)
+    if not cached:
+        return False
+    try:
+        if os.path.getsize(cached) == 0:
+            return False
+        _prepare_output(file_path)
+        _link_or_copy(cached, file_path)
+        return True
+    except OSError:
+        return False
+
+
+def _store_cached_audio(cache_key: str, file_path: str):
+    """合成成功后把音频写入素材缓存（空文件不缓存）"""
+    if _has_audio(file_path):
+        media_cache.store("audio", cache_key, file_path)
+
+
+def _has_audio(file_path: str) -> bool:
+    """文件存在且非空（TTS 偶尔会写出 0 字节文件）"""
+    try:
+        return os.path.getsize(file_path) > 0
+    except OSError:
+        return False
+
+
 # ========== 单段音频生成（核心函数） ==========
 
-def _generate_single_edge(text: str, voice: str, index: int) -> Tuple[Optional[str], Optional[str]]:
+def _generate_single_edge(text: str, voice: str, index: int, file_path: str = None) -> Tuple[Optional[str], Optional[str]]:
     """
     使用 Edge TTS 生成单段音频
     
+    Args:
+        file_path: 输出路径（直接写入最终位置），为空时写入默认目录
+    
     Returns:
         (文件路径, 错误信息) - 成功时错误为 None
     """
@@ -35,18 +304,27 @@ def _generate_single_edge(text: str, voice: str, index: int) -> Tuple[Optional[s
         if not text:
             return None, "文本为空"
         
-        import edge_tts
+        if edge_tts is None:
+            return None, "未安装 edge-tts"
         
-        file_path = str(DEFAULT_OUTPUT_DIR / f"scene_{index+1:02d}.mp3")
+        file_path = file_path or str(DEFAULT_OUTPUT_DIR / f"scene_{index+1:02d}.mp3")
+        
+        cache_key = _audio_cache_key("edge", voice, EDGE_RATE, text)
+        if _restore_cached_audio(cache_key, file_path):
+            print(f"[Edge TTS] 场景 {index+1} 命中缓存: {file_path}")
+            return file_path, None
         
         async def _run():
+            await _edge_rate_limiter.wait()
             # rate="+50%" 实现 1.5 倍速
-            communicate = edge_tts.Communicate(text, voice, rate="+50%")
+            communicate = edge_tts.Communicate(text, voice, rate=EDGE_RATE)
             await communicate.save(file_path)
         
-        asyncio.run(_run())
+        _prepare_output(file_path)
+        _run_on_edge_loop(_run())
         
-        if os.path.exists(file_path):
+        if _has_audio(file_path):
+            _store_cached_audio(cache_key, file_path)
             print(f"[Edge TTS] 场景 {index+1} 完成: {file_path}")
             return file_path, None
         else:
@@ -58,15 +336,16 @@ def _generate_single_edge(text: str, voice: str, index: int) -> Tuple[Optional[s
         return None, error_msg
 
 
-def _generate_single_volc(text: str, voice: str, index: int) -> Tuple[Optional[str], Optional[str]]:
+def _generate_single_volc(text: str, voice: str, index: int, file_path: str = None) -> Tuple[Optional[str], Optional[str]]:
     """
     使用火山引擎 TTS 生成单段音频
     
+    Args:
+        file_path: 输出路径（直接写入最终位置），为空时写入默认目录
+    
     Returns:
         (文件路径, 错误信息)
     """
-    import requests
-    
     try:
         if not text:
             return None, "文本为空"
@@ -80,14 +359,13 @@ def _generate_single_volc(text: str, voice: str, index: int) -> Tuple[Optional[s
         if not appid or not token:
             return None, "缺少 VOLC_TTS_APPID 或 VOLC_TTS_TOKEN"
         
-        file_path = str(DEFAULT_OUTPUT_DIR / f"scene_{index+1:02d}.mp3")
+        file_path = file_path or str(DEFAULT_OUTPUT_DIR / f"scene_{index+1:02d}.mp3")
         
-        api_url = "https://openspeech.bytedance.com/api/v1/tts"
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer;{token}",
-        }
+        cache_key = _audio_cache_key("volc", voice, VOLC_SPEED_RATIO, text)
+        if _restore_cached_audio(cache_key, file_path):
+            print(f"[Volc TTS] 场景 {index+1} 命中缓存: {file_path}")
+            return file_path, None
+        _prepare_output(file_path)
         
         request_json = {
             "app": {"appid": appid, "token": token, "cluster": cluster},
@@ -95,7 +373,7 @@ def _generate_single_volc(text: str, voice: str, index: int) -> Tuple[Optional[s
             "audio": {
                 "voice_type": voice,
                 "encoding": "mp3",
-                "speed_ratio": 1.5,  # 1.5 倍速
+                "speed_ratio": VOLC_SPEED_RATIO,  # 1.5 倍速
                 "volume_ratio": 1.0,
                 "pitch_ratio": 1.0,
                 "extra_param": json.dumps({"aigc_watermark": False})
@@ -107,29 +385,48 @@ def _generate_single_volc(text: str, voice: str, index: int) -> Tuple[Optional[s
             }
         }
         
-        resp = requests.post(api_url, headers=headers, json=request_json, timeout=60)
+        # 优先走 WebSocket 二进制流；失败时本次回退到 HTTP 接口，冷却期内的后续请求也直接走 HTTP
+        global _volc_ws_retry_at
+        if _volc_ws_available():
+            try:
+                size = _volc_fetch_ws(request_json, token, file_path)
+                if size:
+                    _store_cached_audio(cache_key, file_path)
+                    print(f"[Volc TTS] 场景 {index+1} 完成: {file_path} ({size} bytes, ws)")
+                    return file_path, None
+                print(f"[Volc TTS Warning] WebSocket 未返回音频，回退到 HTTP 接口")
+            except Exception as e:
+                print(f"[Volc TTS Warning] WebSocket 合成失败，回退到 HTTP 接口: {e}")
+            _volc_ws_retry_at = time.monotonic() + VOLC_WS_COOLDOWN
+        
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer;{token}",
+        }
+        
+        resp = _get_volc_session().post(VOLC_TTS_API_URL, headers=headers, json=request_json, timeout=60)
         
         if resp.status_code != 200:
             return None, f"HTTP {resp.status_code}"
         
-        # 解析 JSON 响应
+        # 解析 JSON 响应（解析后释放原始响应体）
         result = resp.json()
+        del resp
         
         # 检查返回码 (3000 = 成功)
         if result.get("code") != 3000:
             return None, f"API错误: {result.get('message', 'Unknown')}"
         
-        # Base64 解码音频数据
-        audio_base64 = result.get("data", "")
+        # Base64 解码音频数据（取出后释放响应字典，分块解码写入文件）
+        audio_base64 = result.pop("data", "")
+        del result
         if not audio_base64:
             return None, "返回的音频数据为空"
         
-        audio_data = base64.b64decode(audio_base64)
-        
-        with open(file_path, "wb") as f:
-            f.write(audio_data)
+        size = _save_base64_audio(audio_base64, file_path)
+        _store_cached_audio(cache_key, file_path)
         
-        print(f"[Volc TTS] 场景 {index+1} 完成: {file_path} ({len(audio_data)} bytes)")
+        print(f"[Volc TTS] 场景 {index+1} 完成: {file_path} ({size} bytes)")
         return file_path, None
         
     except Exception as e:
@@ -145,14 +442,18 @@ def generate_edge_audio(text: str, voice: str = "zh-CN-XiaoxiaoNeural", file_pat
     if not file_path:
         file_path = str(DEFAULT_OUTPUT_DIR / f"edge_{uuid.uuid4().hex[:8]}.mp3")
     
+    if edge_tts is None:
+        print("[Edge TTS Error] 未安装 edge-tts")
+        return None
+    
     try:
-        import edge_tts
-        
         async def _run():
+            await _edge_rate_limiter.wait()
             communicate = edge_tts.Communicate(text, voice)
             await communicate.save(file_path)
         
-        asyncio.run(_run())
+        _prepare_output(file_path)
+        _run_on_edge_loop(_run())
         
         if os.path.exists(file_path):
             print(f"[Edge TTS] 生成成功: {file_path}")
@@ -165,8 +466,6 @@ def generate_edge_audio(text: str, voice: str = "zh-CN-XiaoxiaoNeural", file_pat
 
 def generate_volc_audio(text: str, voice_type: str = "zh_female_meilinvyou_moon_bigtts", file_path: str = None) -> str:
     """使用火山引擎 TTS 生成音频（兼容旧接口）"""
-    import requests
-    
     appid = os.getenv("VOLC_TTS_APPID")
     token = os.getenv("VOLC_TTS_TOKEN")
     cluster = os.getenv("VOLC_TTS_CLUSTER", "volcano_tts")
@@ -180,8 +479,6 @@ def generate_volc_audio(text: str, voice_type: str = "zh_female_meilinvyou_moon_
     if not file_path:
         file_path = str(DEFAULT_OUTPUT_DIR / f"volc_{uuid.uuid4().hex[:8]}.mp3")
     
-    api_url = "https://openspeech.bytedance.com/api/v1/tts"
-    
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer;{token}",
@@ -205,32 +502,32 @@ def generate_volc_audio(text: str, voice_type: str = "zh_female_meilinvyou_moon_
     }
     
     try:
-        resp = requests.post(api_url, headers=headers, json=request_json, timeout=60)
+        resp = _get_volc_session().post(VOLC_TTS_API_URL, headers=headers, json=request_json, timeout=60)
         
         if resp.status_code != 200:
             print(f"[Volc TTS Error] HTTP {resp.status_code}: {resp.text[:200]}")
             return None
         
-        # 解析 JSON 响应
+        # 解析 JSON 响应（解析后释放原始响应体）
         result = resp.json()
+        del resp
         
         # 检查返回码 (3000 = 成功)
         if result.get("code") != 3000:
             print(f"[Volc TTS Error] API错误: {result.get('message', 'Unknown')}")
             return None
         
-        # Base64 解码音频数据
-        audio_base64 = result.get("data", "")
+        # Base64 解码音频数据（取出后释放响应字典，分块解码写入文件）
+        audio_base64 = result.pop("data", "")
+        del result
         if not audio_base64:
             print("[Volc TTS Error] 返回的音频数据为空")
             return None
         
-        audio_data = base64.b64decode(audio_base64)
-        
-        with open(file_path, "wb") as f:
-            f.write(audio_data)
+        _prepare_output(file_path)
+        size = _save_base64_audio(audio_base64, file_path)
         
-        print(f"[Volc TTS] 生成成功: {file_path} ({len(audio_data)} bytes)")
+        print(f"[Volc TTS] 生成成功: {file_path} ({size} bytes)")
         return file_path
         
     except Exception as e:
@@ -254,116 +551,194 @@ def generate_audio(text: str, provider: str = "edge", voice: str = None, output_
 
 
 # 并发配置
-EDGE_SEMAPHORE_LIMIT = 3  # EdgeTTS 并发限制（防止被微软封 IP）
+EDGE_SEMAPHORE_LIMIT = 3  # EdgeTTS 并发限制（请求频率另由 EDGE_MIN_INTERVAL 漏桶限制）
 VOLC_MAX_WORKERS = 5  # 火山引擎线程池大小
 
 
-async def _generate_edge_async(text: str, voice: str, index: int, semaphore: asyncio.Semaphore, output_dir: Path = None, topic: str = None) -> Tuple[int, Optional[str]]:
-    """异步生成单段 Edge TTS 音频（带信号量限制）"""
+def _submit_upload(file_path: str, topic: Optional[str]) -> Optional[Future]:
+    """有主题时把音频交给后台线程上传 OSS（按主题分类），不阻塞后续分镜的生成"""
+    return get_oss_writer().submit(file_path, topic, "audio") if topic else None
+
+
+def _apply_uploads(audio_paths: list, uploads: list) -> list:
+    """等待后台上传完成，上传成功的分镜用 OSS URL 替换本地路径"""
+    for i, upload in enumerate(uploads):
+        if upload is None:
+            continue
+        try:
+            audio_paths[i] = upload.result() or audio_paths[i]
+        except Exception as e:
+            print(f"[Audio Warning] 场景 {i+1} 上传 OSS 失败: {e}")
+    return audio_paths
+
+
+async def _apply_uploads_async(audio_paths: list, uploads: list) -> list:
+    """_apply_uploads 的异步版本（等待期间不阻塞事件循环）"""
+    pending = [asyncio.wrap_future(upload) for upload in uploads if upload is not None]
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+    return _apply_uploads(audio_paths, uploads)
+
+
+async def _generate_edge_async(text: str, voice: str, index: int, semaphore: asyncio.Semaphore, output_dir: Path = None, topic: str = None) -> Tuple[int, Optional[str], Optional[Future]]:
+    """异步生成单段 Edge TTS 音频（带信号量限制），返回 (索引, 本地路径, OSS 上传 Future)"""
     output_dir = output_dir or DEFAULT_OUTPUT_DIR
     
     async with semaphore:
         try:
             if not text:
-                return index, None
+                return index, None, None
             
-            import edge_tts
+            if edge_tts is None:
+                print(f"[Edge TTS Error] 场景 {index+1} 失败: 未安装 edge-tts")
+                return index, None, None
             
             # 文件命名：主题_scene_01.mp3
             safe_topic = sanitize_filename(topic) if topic else ""
             filename = f"{safe_topic}_scene_{index+1:02d}.mp3" if safe_topic else f"scene_{index+1:02d}.mp3"
             file_path = str(output_dir / filename)
             
+            cache_key = _audio_cache_key("edge", voice, EDGE_RATE, text)
+            if _restore_cached_audio(cache_key, file_path):
+                print(f"[Edge TTS] 场景 {index+1} 命中缓存")
+                return index, file_path, _submit_upload(file_path, topic)
+            
+            # 限速：按 EDGE_MIN_INTERVAL 错开请求，避免并发槽位同时发起请求触发封禁
+            await _edge_rate_limiter.wait()
+            
             # rate="+50%" 实现 1.5 倍速
-            communicate = edge_tts.Communicate(text, voice, rate="+50%")
+            communicate = edge_tts.Communicate(text, voice, rate=EDGE_RATE)
+            _prepare_output(file_path)
             await communicate.save(file_path)
             
-            if os.path.exists(file_path):
+            if _has_audio(file_path):
+                _store_cached_audio(cache_key, file_path)
                 print(f"[Edge TTS] 场景 {index+1} 完成")
-                # 上传到 OSS（按主题分类）
-                oss_url = None
-                if topic:
-                    oss_url = upload_file_to_oss_by_topic(file_path, topic, "audio")
-                return index, oss_url or file_path
+                return index, file_path, _submit_upload(file_path, topic)
             else:
-                return index, None
+                return index, None, None
                 
         except Exception as e:
             print(f"[Edge TTS Error] 场景 {index+1} 失败: {e}")
-            return index, None
+            return index, None, None
 
 
-def _generate_edge_concurrent(scenes: list, voice: str, output_dir: Path = None, topic: str = None) -> list:
-    """EdgeTTS 异步并发生成"""
+async def _generate_edge_batch_async(scenes: list, voice: str, output_dir: Path = None, topic: str = None) -> Tuple[list, list]:
+    """EdgeTTS 异步并发生成（在当前事件循环中运行），返回 (本地路径列表, 上传 Future 列表)"""
     output_dir = output_dir or DEFAULT_OUTPUT_DIR
+    semaphore = asyncio.Semaphore(EDGE_SEMAPHORE_LIMIT)
     
-    async def _run_all():
-        semaphore = asyncio.Semaphore(EDGE_SEMAPHORE_LIMIT)
-        tasks = []
-        
-        for i, scene in enumerate(scenes):
-            narration = scene.get("narration", "")
-            task = _generate_edge_async(narration, voice, i, semaphore, output_dir, topic)
-            tasks.append(task)
-        
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        return results
-    
-    # 运行异步任务
-    raw_results = asyncio.run(_run_all())
+    tasks = [
+        _generate_edge_async(scene.get("narration", ""), voice, i, semaphore, output_dir, topic)
+        for i, scene in enumerate(scenes)
+    ]
+    raw_results = await asyncio.gather(*tasks, return_exceptions=True)
     
     # 整理结果（保持顺序）
     audio_paths = [None] * len(scenes)
+    uploads = [None] * len(scenes)
     for result in raw_results:
         if isinstance(result, Exception):
             continue
-        index, path = result
-        audio_paths[index] = path
+        index, audio_paths[index], uploads[index] = result
     
-    return audio_paths
+    return audio_paths, uploads
+
+
+def _generate_edge_concurrent(scenes: list, voice: str, output_dir: Path = None, topic: str = None) -> Tuple[list, list]:
+    """EdgeTTS 异步并发生成（同步调用入口，在后台事件循环中执行）"""
+    return _run_on_edge_loop(_generate_edge_batch_async(scenes, voice, output_dir, topic))
+
+
+def _generate_volc_scene(index: int, scene: dict, voice: str, output_dir: Path, topic: str = None) -> Tuple[int, Optional[str], Optional[Future]]:
+    """火山引擎生成单个分镜的音频，返回 (索引, 本地路径, OSS 上传 Future)"""
+    narration = scene.get("narration", "")
+    if not narration:
+        return index, None, None
+    
+    # 文件命名：主题_scene_01.mp3
+    safe_topic = sanitize_filename(topic) if topic else ""
+    filename = f"{safe_topic}_scene_{index+1:02d}.mp3" if safe_topic else f"scene_{index+1:02d}.mp3"
+    file_path = str(output_dir / filename)
+    
+    # 直接写入最终路径（不经默认目录中转，并发任务之间也不会互相覆盖）
+    path, _ = _generate_single_volc(narration, voice, index, file_path)
+    if path:
+        return index, path, _submit_upload(path, topic)
+    return index, None, None
+
+
+async def _generate_volc_batch_async(scenes: list, voice: str, output_dir: Path = None, topic: str = None) -> Tuple[list, list]:
+    """火山引擎并发生成（异步入口：同步 HTTP 请求放到线程池，并发数与线程池版本一致）"""
+    output_dir = output_dir or DEFAULT_OUTPUT_DIR
+    semaphore = asyncio.Semaphore(VOLC_MAX_WORKERS)
+    
+    async def _one(index: int, scene: dict):
+        async with semaphore:
+            return await asyncio.to_thread(_generate_volc_scene, index, scene, voice, output_dir, topic)
+    
+    raw_results = await asyncio.gather(
+        *[_one(i, scene) for i, scene in enumerate(scenes)],
+        return_exceptions=True
+    )
+    
+    audio_paths = [None] * len(scenes)
+    uploads = [None] * len(scenes)
+    for i, result in enumerate(raw_results):
+        if isinstance(result, Exception):
+            print(f"[Volc TTS Error] 场景 {i+1} 异常: {result}")
+            continue
+        index, audio_paths[index], uploads[index] = result
+    
+    return audio_paths, uploads
 
 
-def _generate_volc_concurrent(scenes: list, voice: str, output_dir: Path = None, topic: str = None) -> list:
+def _generate_volc_concurrent(scenes: list, voice: str, output_dir: Path = None, topic: str = None) -> Tuple[list, list]:
     """火山引擎 ThreadPoolExecutor 并发生成"""
     output_dir = output_dir or DEFAULT_OUTPUT_DIR
     
     def _generate_one(args):
         index, scene = args
-        narration = scene.get("narration", "")
-        if not narration:
-            return index, None
-        
-        # 文件命名：主题_scene_01.mp3
-        safe_topic = sanitize_filename(topic) if topic else ""
-        filename = f"{safe_topic}_scene_{index+1:02d}.mp3" if safe_topic else f"scene_{index+1:02d}.mp3"
-        file_path = str(output_dir / filename)
-        
-        path, _ = _generate_single_volc(narration, voice, index)
-        # 如果成功，重命名到正确位置
-        if path and os.path.exists(path):
-            import shutil
-            shutil.move(path, file_path)
-            # 上传到 OSS（按主题分类）
-            oss_url = None
-            if topic:
-                oss_url = upload_file_to_oss_by_topic(file_path, topic, "audio")
-            return index, oss_url or file_path
-        return index, None
+        # executor.map 遇到异常会中断整个迭代，这里就地兜底，保证单个分镜失败不影响其他分镜
+        try:
+            return _generate_volc_scene(index, scene, voice, output_dir, topic)
+        except Exception as e:
+            print(f"[Volc TTS Error] 场景 {index+1} 异常: {e}")
+            return index, None, None
     
     audio_paths = [None] * len(scenes)
+    uploads = [None] * len(scenes)
     
     with ThreadPoolExecutor(max_workers=VOLC_MAX_WORKERS) as executor:
-        futures = {executor.submit(_generate_one, (i, scene)): i for i, scene in enumerate(scenes)}
-        
-        for future in as_completed(futures):
-            try:
-                index, path = future.result()
-                audio_paths[index] = path
-            except Exception as e:
-                index = futures[future]
-                print(f"[Volc TTS Error] 场景 {index+1} Future 异常: {e}")
+        for index, path, upload in executor.map(_generate_one, enumerate(scenes)):
+            audio_paths[index] = path
+            uploads[index] = upload
     
-    return audio_paths
+    return audio_paths, uploads
+
+
+def _dedupe_narrations(scenes: list) -> Tuple[list, list]:
+    """
+    批次内相同的旁白只合成一次
+    
+    Returns:
+        (待合成的分镜列表：重复项的旁白置空，音频模块会直接跳过,
+         每个分镜对应的首次出现索引)
+    """
+    first_seen = {}
+    sources = []
+    unique_scenes = []
+    for i, scene in enumerate(scenes):
+        narration = scene.get("narration", "")
+        source = first_seen.setdefault(narration, i) if narration else i
+        sources.append(source)
+        unique_scenes.append(scene if source == i else {**scene, "narration": ""})
+    return unique_scenes, sources
+
+
+def _fill_duplicates(audio_paths: list, sources: list) -> list:
+    """重复旁白的分镜复用首次出现的音频"""
+    return [audio_paths[source] for source in sources]
 
 
 def generate_audio_for_scenes(scenes: list, provider: str = "edge", voice: str = None, topic: str = None) -> list:
@@ -395,10 +770,50 @@ def generate_audio_for_scenes(scenes: list, provider: str = "edge", voice: str =
     
     print(f"[Audio] 开始并发生成 {len(scenes)} 段音频 ({provider})...")
     
+    unique_scenes, sources = _dedupe_narrations(scenes)
+    if provider == "edge":
+        audio_paths, uploads = _generate_edge_concurrent(unique_scenes, voice, output_dir, topic)
+    else:
+        audio_paths, uploads = _generate_volc_concurrent(unique_scenes, voice, output_dir, topic)
+    
+    # 生成期间 OSS 上传已在后台进行，这里只等待尚未完成的部分
+    audio_paths = _fill_duplicates(_apply_uploads(audio_paths, uploads), sources)
+    
+    success_count = sum(1 for p in audio_paths if p is not None)
+    print(f"[Audio] 并发生成完成: {success_count}/{len(scenes)} 成功")
+    
+    return audio_paths
+
+
+async def generate_audio_for_scenes_async(scenes: list, provider: str = "edge", voice: str = None, topic: str = None) -> list:
+    """
+    批量为分镜生成音频（异步版本，供 FastAPI 等已有事件循环的调用方使用）
+    
+    EdgeTTS 直接在当前事件循环中并发执行；火山引擎的同步请求放到线程池并发执行。
+    参数和返回值同 generate_audio_for_scenes。
+    """
+    if not scenes:
+        return []
+    
+    voice = voice or ("zh-CN-XiaoxiaoNeural" if provider == "edge" else "zh_female_meilinvyou_moon_bigtts")
+    
+    # 创建主题目录
+    if topic:
+        output_dir = await asyncio.to_thread(get_unique_dir, DEFAULT_OUTPUT_DIR, topic)
+        print(f"[Audio] 输出目录: {output_dir}")
+    else:
+        output_dir = DEFAULT_OUTPUT_DIR
+    
+    print(f"[Audio] 开始并发生成 {len(scenes)} 段音频 ({provider})...")
+    
+    unique_scenes, sources = _dedupe_narrations(scenes)
     if provider == "edge":
-        audio_paths = _generate_edge_concurrent(scenes, voice, output_dir, topic)
+        audio_paths, uploads = await _generate_edge_batch_async(unique_scenes, voice, output_dir, topic)
     else:
-        audio_paths = _generate_volc_concurrent(scenes, voice, output_dir, topic)
+        audio_paths, uploads = await _generate_volc_batch_async(unique_scenes, voice, output_dir, topic)
+    
+    # 生成期间 OSS 上传已在后台进行，这里只等待尚未完成的部分
+    audio_paths = _fill_duplicates(await _apply_uploads_async(audio_paths, uploads), sources)
     
     success_count = sum(1 for p in audio_paths if p is not None)
     print(f"[Audio] 并发生成完成: {success_count}/{len(scenes)} 成功")
@@ -431,21 +846,10 @@ def generate_single_audio(scene: dict, index: int, provider: str = "edge", voice
     
     if provider == "edge":
         voice = voice or "zh-CN-XiaoxiaoNeural"
-        path, error = _generate_single_edge(narration, voice, index)
-        # 移动到正确位置
-        if path and os.path.exists(path) and path != file_path:
-            import shutil
-            shutil.move(path, file_path)
-            return file_path, None
-        return path, error
+        return _generate_single_edge(narration, voice, index, file_path)
     elif provider == "volcengine":
         voice = voice or "zh_female_meilinvyou_moon_bigtts"
-        path, error = _generate_single_volc(narration, voice, index)
-        if path and os.path.exists(path) and path != file_path:
-            import shutil
-            shutil.move(path, file_path)
-            return file_path, None
-        return path, error
+        return _generate_single_volc(narration, voice, index, file_path)
     else:
         return None, f"未知的 provider: {provider}"
 
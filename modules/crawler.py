@@ -1,12 +1,84 @@
 """
 DrissionPage 爬虫模块
 """
+import atexit
+import hashlib
+import json
+import threading
+import time
+from typing import Optional
+
 from DrissionPage import ChromiumPage
 
+from modules.utils import CACHE_DIR
+
+# 抓取结果磁盘缓存（同一链接 24 小时内不重复抓取）
+CRAWL_CACHE_DIR = CACHE_DIR / "crawler"
+CRAWL_CACHE_TTL = 24 * 3600
+
+
+# 常驻浏览器：各次抓取复用同一个 Chromium 进程，不再每次启动/退出浏览器
+_browser: Optional[ChromiumPage] = None
+# 同一标签页同一时刻只能打开一个链接，抓取串行执行
+_browser_lock = threading.Lock()
+
+
+def _get_browser() -> ChromiumPage:
+    """获取常驻浏览器（懒加载，调用方需持有 _browser_lock）"""
+    global _browser
+    if _browser is None:
+        _browser = ChromiumPage()
+    return _browser
+
+
+def _reset_browser():
+    """关闭常驻浏览器（抓取出错后浏览器状态未知，下次重新启动）"""
+    global _browser
+    if _browser is not None:
+        try:
+            _browser.quit()
+        except Exception:
+            pass
+        _browser = None
+
+
+def close_browser():
+    """进程退出时关闭浏览器"""
+    with _browser_lock:
+        _reset_browser()
+
+
+atexit.register(close_browser)
+
+
+def _cache_path(url: str):
+    return CRAWL_CACHE_DIR / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+
+def _load_cached(url: str) -> dict:
+    """读取未过期的抓取缓存，不存在或已过期返回空 dict"""
+    try:
+        with open(_cache_path(url), "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if time.time() - cached.get("ts", 0) < CRAWL_CACHE_TTL:
+            return cached.get("data") or {}
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def _save_cached(url: str, data: dict):
+    try:
+        CRAWL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(_cache_path(url), "w", encoding="utf-8") as f:
+            json.dump({"ts": time.time(), "url": url, "data": data}, f, ensure_ascii=False)
+    except OSError as e:
+        print(f"[Crawler Warning] 写入缓存失败: {e}")
+
 
 def fetch_note_content(url: str) -> dict:
     """
-    抓取小红书笔记内容
+    抓取小红书笔记内容（带 24 小时磁盘缓存）
     
     Args:
         url: 小红书笔记 URL
@@ -14,26 +86,31 @@ def fetch_note_content(url: str) -> dict:
     Returns:
         {'title': '...', 'content': '...'} 或失败时返回空 dict
     """
-    page = None
-    try:
-        page = ChromiumPage()
-        page.get(url)
-        page.wait.load_start()
-        
-        # 提取标题 (h1 标签)
-        title_el = page.ele('tag:h1')
-        title = title_el.text if title_el else ''
-        
-        # 提取正文内容 (小红书笔记正文通常在 desc 区域)
-        desc_el = page.ele('.note-content') or page.ele('#detail-desc') or page.ele('tag:article')
-        content = desc_el.text if desc_el else ''
-        
-        return {'title': title, 'content': content}
+    cached = _load_cached(url)
+    if cached:
+        print(f"[Crawler] 命中缓存: {url}")
+        return cached
     
-    except Exception as e:
-        print(f"[Crawler Error] 抓取失败: {e}")
-        return {}
+    with _browser_lock:
+        try:
+            page = _get_browser()
+            page.get(url)
+            page.wait.load_start()
+            
+            # 提取标题 (h1 标签)
+            title_el = page.ele('tag:h1')
+            title = title_el.text if title_el else ''
+            
+            # 提取正文内容 (小红书笔记正文通常在 desc 区域)
+            desc_el = page.ele('.note-content') or page.ele('#detail-desc') or page.ele('tag:article')
+            content = desc_el.text if desc_el else ''
+        
+        except Exception as e:
+            print(f"[Crawler Error] 抓取失败: {e}")
+            _reset_browser()
+            return {}
     
-    finally:
-        if page:
-            page.quit()
+    result = {'title': title, 'content': content}
+    if title or content:
+        _save_cached(url, result)
+    return result
@@ -4,9 +4,32 @@
 支持主题命名：视频和字幕按主题组织
 """
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from io import StringIO
 from pathlib import Path
 from typing import Optional
+
+import numpy as np
 from dotenv import load_dotenv
+from moviepy import (
+    AudioFileClip,
+    CompositeAudioClip,
+    ImageClip,
+    VideoClip,
+    concatenate_videoclips,
+    vfx,
+)
+from moviepy import audio as afx
+from moviepy.config import FFMPEG_BINARY
+from PIL import Image
+
+# 可选依赖：安装 opencv-python 后图片缩放改用 cv2
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
 from modules.utils import sanitize_filename, get_unique_dir
 from modules.storage import upload_file_to_oss_by_topic
 
@@ -20,6 +43,12 @@ DEFAULT_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 TARGET_WIDTH = 1080
 TARGET_HEIGHT = 1920
 
+# Ken Burns 动画预留的放大空间
+IMAGE_ZOOM_BUFFER = 1.2
+
+# 分镜转场（淡入淡出）时长（秒）
+CROSSFADE_DURATION = 0.3
+
 
 def _apply_ken_burns(image_clip, duration: float, zoom_ratio: float = 0.15):
     """
@@ -37,8 +66,6 @@ def _apply_ken_burns(image_clip, duration: float, zoom_ratio: float = 0.15):
     Returns:
         带 Ken Burns 效果的 clip
     """
-    from moviepy import vfx
-    
     # 获取原始尺寸
     w, h = image_clip.size
     
@@ -84,28 +111,39 @@ def _apply_ken_burns(image_clip, duration: float, zoom_ratio: float = 0.15):
     return zoomed
 
 
-def _prepare_image_clip(img_path: str, duration: float, apply_zoom: bool = True) -> Optional[any]:
+def _prep_image_array(img_path: str, zoom_buffer: float):
     """
-    准备单个图片 clip：调整尺寸 + Ken Burns 效果
+    图片预处理：解码 + 缩放 + 居中裁切，返回 RGB numpy 数组
+    
+    纯 CPU 计算且不依赖 MoviePy 对象，可在子进程中并行执行。
+    安装了 opencv-python 时使用 cv2 解码和缩放（SIMD 加速且释放 GIL），否则回退到 PIL
     
     Args:
         img_path: 图片路径
-        duration: 片段时长
-        apply_zoom: 是否应用 Ken Burns 效果
-    
-    Returns:
-        处理后的 ImageClip
+        zoom_buffer: 目标尺寸的放大倍数（为 Ken Burns 动画预留空间）
     """
-    from moviepy import ImageClip
-    from PIL import Image
-    import numpy as np
+    crop_w = int(TARGET_WIDTH * zoom_buffer)
+    crop_h = int(TARGET_HEIGHT * zoom_buffer)
+    
+    if cv2 is not None:
+        arr = cv2.imread(img_path, cv2.IMREAD_COLOR)
+        if arr is not None:
+            img_h, img_w = arr.shape[:2]
+            scale = max(crop_w / img_w, crop_h / img_h)
+            new_w = int(img_w * scale)
+            new_h = int(img_h * scale)
+            arr = cv2.resize(arr, (new_w, new_h), interpolation=cv2.INTER_LANCZOS4)
+            left = (new_w - crop_w) // 2
+            top = (new_h - crop_h) // 2
+            # 先裁切再转换颜色空间，只转换需要的区域
+            return cv2.cvtColor(arr[top:top + crop_h, left:left + crop_w], cv2.COLOR_BGR2RGB)
+        # cv2 无法解码的格式（如部分 WebP/GIF）交给 PIL 处理
     
     # 加载并调整图片尺寸
     img = Image.open(img_path)
     img_w, img_h = img.size
     
     # 计算缩放比例，确保覆盖目标尺寸（用于 Ken Burns 动画空间）
-    zoom_buffer = 1.2 if apply_zoom else 1.0  # 预留 20% 空间给动画
     scale = max(TARGET_WIDTH * zoom_buffer / img_w, TARGET_HEIGHT * zoom_buffer / img_h)
     
     new_w = int(img_w * scale)
@@ -113,35 +151,256 @@ def _prepare_image_clip(img_path: str, duration: float, apply_zoom: bool = True)
     img = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
     
     # 居中裁切到目标尺寸（带缓冲）
-    crop_w = int(TARGET_WIDTH * zoom_buffer)
-    crop_h = int(TARGET_HEIGHT * zoom_buffer)
     left = (new_w - crop_w) // 2
     top = (new_h - crop_h) // 2
     img = img.crop((left, top, left + crop_w, top + crop_h))
     
     # 转换为 numpy array
-    img_array = np.array(img.convert('RGB'))
+    return np.array(img.convert('RGB'))
+
+
+def _submit_image_prep(executor, img_path: str):
+    """提交图片预处理到进程池，进程池不可用时返回 None（回退到当前进程处理）"""
+    if executor is None:
+        return None
+    try:
+        return executor.submit(_prep_image_array, img_path, IMAGE_ZOOM_BUFFER)
+    except Exception as e:
+        print(f"[Editor Warning] 图片预处理进程池不可用: {e}")
+        return None
+
+
+def _worker_init():
+    """图片预处理子进程初始化：预先加载解码插件，不在第一张图片上付出加载开销"""
+    Image.init()
+
+
+def _prepare_image_clip(img_path: str, duration: float, apply_zoom: bool = True, img_array=None) -> Optional[any]:
+    """
+    准备单个图片 clip：调整尺寸 + Ken Burns 效果
     
-    # 创建 ImageClip
-    clip = ImageClip(img_array, duration=duration)
+    Args:
+        img_path: 图片路径
+        duration: 片段时长
+        apply_zoom: 是否应用 Ken Burns 效果
+        img_array: 已预处理的图片数组（为空时在当前进程中处理）
     
-    if apply_zoom:
-        # 应用 Ken Burns 效果
-        def zoom_func(t):
-            progress = t / duration if duration > 0 else 0
-            return 1.0 / (1 + 0.15 * progress)  # 从 1.0 缩小到 ~0.87，实现 zoom in 效果
+    Returns:
+        处理后的 clip
+    """
+    if img_array is None:
+        # 预留 20% 空间给动画
+        img_array = _prep_image_array(img_path, IMAGE_ZOOM_BUFFER if apply_zoom else 1.0)
+    
+    if not apply_zoom:
+        # 无动画：预处理结果已是目标尺寸，直接居中裁切
+        clip = ImageClip(img_array, duration=duration)
+        return clip.cropped(
+            x_center=clip.w / 2,
+            y_center=clip.h / 2,
+            width=TARGET_WIDTH,
+            height=TARGET_HEIGHT
+        )
+    
+    # Ken Burns 效果：每帧直接在原图上计算居中取景框，再缩放到目标尺寸
+    # （一次裁切 + 一次缩放，不再先整图 resize 再 crop）
+    src_h, src_w = img_array.shape[:2]
+    
+    def make_frame(t):
+        progress = t / duration if duration > 0 else 0
+        # 取景框从目标尺寸逐渐扩大 15%（画面缓慢拉远）
+        factor = 1 + 0.15 * progress
+        crop_w = min(src_w, int(TARGET_WIDTH * factor))
+        crop_h = min(src_h, int(TARGET_HEIGHT * factor))
+        x1 = (src_w - crop_w) // 2
+        y1 = (src_h - crop_h) // 2
+        window = img_array[y1:y1 + crop_h, x1:x1 + crop_w]
+        if (crop_w, crop_h) == (TARGET_WIDTH, TARGET_HEIGHT):
+            return window
+        return np.asarray(Image.fromarray(window).resize((TARGET_WIDTH, TARGET_HEIGHT), Image.Resampling.BILINEAR))
+    
+    return VideoClip(make_frame, duration=duration)
+
+
+def _export_with_moviepy(clips: list, audio_paths: list, output_path: str, bgm_path: str = None, bgm_volume: float = 0.12) -> float:
+    """
+    MoviePy 合成导出：CrossFade 转场 + compose 拼接 + BGM 混音
+    
+    Args:
+        clips: 各分镜的画面 clip（不含音频）
+        audio_paths: 各分镜的人声音频路径（导出时才打开，导出后立即关闭）
+    
+    Returns:
+        视频总时长（秒）
+    """
+    voice_clips = [AudioFileClip(path) for path in audio_paths]
+    try:
+        return _compose_and_write(
+            [clip.with_audio(voice) for clip, voice in zip(clips, voice_clips)],
+            output_path, bgm_path, bgm_volume,
+        )
+    finally:
+        for voice in voice_clips:
+            voice.close()
+
+
+def _compose_and_write(clips: list, output_path: str, bgm_path: str = None, bgm_volume: float = 0.12) -> float:
+    """拼接已绑定音频的分镜并导出，返回视频总时长（秒）"""
+    # 为分镜添加淡入淡出过渡效果
+    if len(clips) > 1:
+        print(f"[Editor] 正在添加分镜过渡效果 ({CROSSFADE_DURATION}s crossfade)...")
         
-        clip = clip.resized(zoom_func)
-    
-    # 最终裁切到精确的目标尺寸
-    clip = clip.cropped(
-        x_center=clip.w / 2,
-        y_center=clip.h / 2,
-        width=TARGET_WIDTH,
-        height=TARGET_HEIGHT
+        processed_clips = []
+        for i, clip in enumerate(clips):
+            # 第一个片段只加淡出
+            if i == 0:
+                clip = clip.with_effects([vfx.CrossFadeOut(CROSSFADE_DURATION)])
+            # 最后一个片段只加淡入
+            elif i == len(clips) - 1:
+                clip = clip.with_effects([vfx.CrossFadeIn(CROSSFADE_DURATION)])
+            # 中间片段加淡入淡出
+            else:
+                clip = clip.with_effects([
+                    vfx.CrossFadeIn(CROSSFADE_DURATION),
+                    vfx.CrossFadeOut(CROSSFADE_DURATION)
+                ])
+            processed_clips.append(clip)
+        clips = processed_clips
+    
+    # 拼接所有片段（使用 compose 方法支持过渡）
+    print(f"[Editor] 正在拼接 {len(clips)} 个片段...")
+    final_clip = concatenate_videoclips(clips, method="compose", padding=-CROSSFADE_DURATION if len(clips) > 1 else 0)
+    total_duration = final_clip.duration
+    
+    # BGM 混音
+    if bgm_path and os.path.exists(bgm_path):
+        print(f"[Editor] 正在混入 BGM: {bgm_path}")
+        try:
+            bgm_clip = AudioFileClip(bgm_path)
+            
+            # 循环或截取 BGM 到视频长度
+            if bgm_clip.duration < total_duration:
+                # BGM 比视频短，循环播放
+                loops_needed = int(total_duration / bgm_clip.duration) + 1
+                bgm_clip = afx.audio_loop(bgm_clip, nloops=loops_needed)
+            
+            # 截取到视频长度
+            bgm_clip = bgm_clip.subclipped(0, total_duration)
+            
+            # 调整 BGM 音量
+            bgm_clip = bgm_clip.with_volume_scaled(bgm_volume)
+            
+            # 合成人声（音量保持 1.0）和 BGM
+            original_audio = final_clip.audio
+            mixed_audio = CompositeAudioClip([original_audio, bgm_clip])
+            final_clip = final_clip.with_audio(mixed_audio)
+            
+            print(f"[Editor] BGM 混音完成 (音量: {bgm_volume})")
+        except Exception as e:
+            print(f"[Editor Warning] BGM 混音失败: {e}，继续无 BGM 导出")
+    
+    # 导出视频
+    print(f"[Editor] 正在导出视频: {output_path}")
+    final_clip.write_videofile(
+        output_path,
+        codec="libx264",
+        audio_codec="aac",
+        fps=24,
+        preset="medium",
+        threads=4,
+        logger=None  # 减少日志输出
     )
+    final_clip.close()
+    return total_duration
+
+
+def _export_with_xfade(clips: list, audio_paths: list, output_path: str, bgm_path: str = None, bgm_volume: float = 0.12) -> Optional[float]:
+    """
+    ffmpeg 转场导出：各分镜先编码为独立片段（不做逐帧混合），
+    再由一条 ffmpeg xfade / acrossfade 滤镜链完成转场拼接和 BGM 混音
+    
+    转场混合在 ffmpeg 原生代码中完成，不再由 MoviePy 在 Python 中逐帧合成。
+    各分镜的人声音频在编码该片段时才打开，同一时刻只持有一个音频读取进程
     
-    return clip
+    Returns:
+        视频总时长（秒），失败返回 None（调用方回退到 MoviePy 导出）
+    """
+    import shutil
+    import subprocess
+    import tempfile
+    
+    durations = [clip.duration for clip in clips]
+    # xfade 要求每个片段都长于转场时长
+    if min(durations) <= CROSSFADE_DURATION:
+        return None
+    
+    tmp_dir = tempfile.mkdtemp(prefix="xfade_", dir=str(Path(output_path).parent))
+    try:
+        print(f"[Editor] 正在编码 {len(clips)} 个分镜片段...")
+        segments = []
+        for i, (clip, audio_path) in enumerate(zip(clips, audio_paths)):
+            segment_path = os.path.join(tmp_dir, f"segment_{i:03d}.mp4")
+            voice = AudioFileClip(audio_path)
+            try:
+                clip.with_audio(voice).write_videofile(
+                    segment_path,
+                    codec="libx264",
+                    audio_codec="aac",
+                    fps=24,
+                    preset="ultrafast",
+                    ffmpeg_params=["-crf", "16"],  # 中间片段保持高画质，最终再统一压缩
+                    threads=4,
+                    logger=None
+                )
+            finally:
+                voice.close()
+            segments.append(segment_path)
+        
+        cmd = [FFMPEG_BINARY, "-y"]
+        for segment_path in segments:
+            cmd += ["-i", segment_path]
+        
+        # 转场链：第 i 段在累计时长减去转场时长处开始淡入
+        filters = []
+        video_label, audio_label = "[0:v]", "[0:a]"
+        offset = 0.0
+        for i in range(1, len(segments)):
+            offset += durations[i - 1] - CROSSFADE_DURATION
+            filters.append(f"{video_label}[{i}:v]xfade=transition=fade:duration={CROSSFADE_DURATION}:offset={offset:.3f}[v{i}]")
+            filters.append(f"{audio_label}[{i}:a]acrossfade=d={CROSSFADE_DURATION}[a{i}]")
+            video_label, audio_label = f"[v{i}]", f"[a{i}]"
+        total_duration = sum(durations) - CROSSFADE_DURATION * (len(segments) - 1)
+        
+        # BGM：循环输入，调整音量并截取到视频长度后与人声混合
+        if bgm_path and os.path.exists(bgm_path):
+            print(f"[Editor] 正在混入 BGM: {bgm_path}")
+            bgm_index = len(segments)
+            cmd += ["-stream_loop", "-1", "-i", bgm_path]
+            filters.append(f"[{bgm_index}:a]volume={bgm_volume},atrim=0:{total_duration:.3f}[bgm]")
+            filters.append(f"{audio_label}[bgm]amix=inputs=2:duration=first:normalize=0[aout]")
+            audio_label = "[aout]"
+        
+        cmd += [
+            "-filter_complex", ";".join(filters),
+            "-map", video_label, "-map", audio_label,
+            "-c:v", "libx264", "-preset", "medium", "-pix_fmt", "yuv420p", "-r", "24",
+            "-c:a", "aac",
+            output_path,
+        ]
+        
+        print(f"[Editor] 正在导出视频 (ffmpeg xfade): {output_path}")
+        subprocess.run(cmd, check=True, capture_output=True)
+        return total_duration
+        
+    except subprocess.CalledProcessError as e:
+        stderr = (e.stderr or b"").decode("utf-8", errors="ignore")[-500:]
+        print(f"[Editor Warning] ffmpeg 转场导出失败，回退到 MoviePy: {stderr}")
+        return None
+    except Exception as e:
+        print(f"[Editor Warning] ffmpeg 转场导出失败，回退到 MoviePy: {e}")
+        return None
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
 
 
 def create_video(
@@ -176,9 +435,6 @@ def create_video(
         final_video = concat(clips) + BGM 混音
         同时生成 .srt 字幕文件（与视频同名）
     """
-    from moviepy import ImageClip, AudioFileClip, concatenate_videoclips, CompositeAudioClip
-    from moviepy import audio as afx
-    
     if len(image_paths) != len(audio_paths):
         print(f"[Editor Error] 图片数量({len(image_paths)})与音频数量({len(audio_paths)})不匹配")
         return None
@@ -193,139 +449,108 @@ def create_video(
         else:
             output_path = str(DEFAULT_OUTPUT_DIR / "output.mp4")
     
-    clips = []
-    voice_clips = []  # 收集所有人声音频
+    clips = []  # 各分镜的画面 clip（不含音频）
+    clip_audio_paths = []  # 对应的人声音频路径（导出时才打开，避免同时持有大量 ffmpeg 读取进程）
+    durations = [None] * len(audio_paths)  # 各段音频时长（供字幕复用）
     
+    # 跳过缺失的素材
+    valid_scenes = []
     for i, (img_path, aud_path) in enumerate(zip(image_paths, audio_paths)):
-        # 跳过缺失的素材
         if not img_path or not os.path.exists(img_path):
             print(f"[Editor Warning] 场景 {i+1} 图片不存在，跳过")
             continue
         if not aud_path or not os.path.exists(aud_path):
             print(f"[Editor Warning] 场景 {i+1} 音频不存在，跳过")
             continue
-        
+        valid_scenes.append((i, img_path, aud_path))
+    
+    # 图片解码/缩放/裁切是 CPU 密集型且互相独立：先全部提交到进程池，
+    # 主进程同时加载音频，用到时再取结果
+    executor = None
+    if len(valid_scenes) > 1:
         try:
-            # 1. 加载音频
-            audio_clip = AudioFileClip(aud_path)
-            duration = audio_clip.duration
-            voice_clips.append(audio_clip)
+            executor = ProcessPoolExecutor(
+                max_workers=min(len(valid_scenes), os.cpu_count() or 1),
+                initializer=_worker_init,
+            )
+        except Exception as e:
+            print(f"[Editor Warning] 无法创建图片预处理进程池: {e}")
+    prep_futures = [_submit_image_prep(executor, img_path) for _, img_path, _ in valid_scenes]
+    
+    for (i, img_path, aud_path), prep_future in zip(valid_scenes, prep_futures):
+        try:
+            # 1. 读取音频时长（读取后立即关闭文件）
+            duration = get_audio_duration(aud_path)
+            if not duration:
+                print(f"[Editor Warning] 场景 {i+1} 音频无法读取，跳过")
+                continue
+            durations[i] = duration
             
             # 2. 加载图片 + Ken Burns 效果
-            image_clip = _prepare_image_clip(img_path, duration, apply_zoom=True)
+            img_array = None
+            if prep_future is not None:
+                try:
+                    img_array = prep_future.result()
+                except Exception as e:
+                    print(f"[Editor Warning] 场景 {i+1} 并行预处理失败，改为当前进程处理: {e}")
+            image_clip = _prepare_image_clip(img_path, duration, apply_zoom=True, img_array=img_array)
             
             if image_clip is None:
                 print(f"[Editor Warning] 场景 {i+1} 图片处理失败，使用原始方式")
                 image_clip = ImageClip(img_path, duration=duration)
             
-            # 3. 设置帧率
-            image_clip = image_clip.with_fps(24)
-            
-            # 4. 绑定音频
-            video_clip = image_clip.with_audio(audio_clip)
-            
-            clips.append(video_clip)
+            # 3. 设置帧率（音频在导出时再绑定）
+            clips.append(image_clip.with_fps(24))
+            clip_audio_paths.append(aud_path)
             print(f"[Editor] 场景 {i+1} 处理完成 (时长: {duration:.2f}s, Ken Burns: ✓)")
             
         except Exception as e:
             print(f"[Editor Error] 场景 {i+1} 处理失败: {e}")
             continue
     
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+    
     if not clips:
         print("[Editor Error] 没有可用的视频片段")
         return None
     
     try:
-        # 为分镜添加淡入淡出过渡效果
-        CROSSFADE_DURATION = 0.3  # 过渡时长（秒）
-        
-        if len(clips) > 1:
-            print(f"[Editor] 正在添加分镜过渡效果 ({CROSSFADE_DURATION}s crossfade)...")
-            from moviepy import vfx
+        with ThreadPoolExecutor(max_workers=2) as tail_pool:
+            # 自动生成 SRT 字幕文件：只依赖各段时长，与视频编码并行
+            srt_future = None
+            if scenes:
+                srt_future = tail_pool.submit(
+                    generate_srt, scenes, audio_paths,
+                    output_path.rsplit('.', 1)[0] + '.srt', durations=durations,
+                )
             
-            processed_clips = []
-            for i, clip in enumerate(clips):
-                # 第一个片段只加淡出
-                if i == 0:
-                    clip = clip.with_effects([vfx.CrossFadeOut(CROSSFADE_DURATION)])
-                # 最后一个片段只加淡入
-                elif i == len(clips) - 1:
-                    clip = clip.with_effects([vfx.CrossFadeIn(CROSSFADE_DURATION)])
-                # 中间片段加淡入淡出
-                else:
-                    clip = clip.with_effects([
-                        vfx.CrossFadeIn(CROSSFADE_DURATION),
-                        vfx.CrossFadeOut(CROSSFADE_DURATION)
-                    ])
-                processed_clips.append(clip)
-            clips = processed_clips
-        
-        # 拼接所有片段（使用 compose 方法支持过渡）
-        print(f"[Editor] 正在拼接 {len(clips)} 个片段...")
-        final_clip = concatenate_videoclips(clips, method="compose", padding=-CROSSFADE_DURATION if len(clips) > 1 else 0)
-        total_duration = final_clip.duration
-        
-        # BGM 混音
-        if bgm_path and os.path.exists(bgm_path):
-            print(f"[Editor] 正在混入 BGM: {bgm_path}")
-            try:
-                bgm_clip = AudioFileClip(bgm_path)
-                
-                # 循环或截取 BGM 到视频长度
-                if bgm_clip.duration < total_duration:
-                    # BGM 比视频短，循环播放
-                    loops_needed = int(total_duration / bgm_clip.duration) + 1
-                    bgm_clip = afx.audio_loop(bgm_clip, nloops=loops_needed)
-                
-                # 截取到视频长度
-                bgm_clip = bgm_clip.subclipped(0, total_duration)
-                
-                # 调整 BGM 音量
-                bgm_clip = bgm_clip.with_volume_scaled(bgm_volume)
-                
-                # 合成人声（音量保持 1.0）和 BGM
-                original_audio = final_clip.audio
-                mixed_audio = CompositeAudioClip([original_audio, bgm_clip])
-                final_clip = final_clip.with_audio(mixed_audio)
+            # 导出视频：多个分镜优先用 ffmpeg xfade 做转场，失败时回退到 MoviePy 合成
+            total_duration = None
+            if len(clips) > 1:
+                total_duration = _export_with_xfade(clips, clip_audio_paths, output_path, bgm_path, bgm_volume)
+            if total_duration is None:
+                total_duration = _export_with_moviepy(clips, clip_audio_paths, output_path, bgm_path, bgm_volume)
+            
+            # 清理资源
+            for clip in clips:
+                clip.close()
+            
+            print(f"[Editor] 视频导出成功: {output_path} (总时长: {total_duration:.2f}s)")
+            
+            srt_path = srt_future.result() if srt_future else None
+            
+            # 上传到 OSS（按主题分类，视频和字幕同时上传）
+            video_url = output_path
+            srt_url = srt_path
+            if topic:
+                video_upload = tail_pool.submit(upload_file_to_oss_by_topic, output_path, topic, "video")
+                srt_upload = tail_pool.submit(upload_file_to_oss_by_topic, srt_path, topic, "video") if srt_path else None
                 
-                print(f"[Editor] BGM 混音完成 (音量: {bgm_volume})")
-            except Exception as e:
-                print(f"[Editor Warning] BGM 混音失败: {e}，继续无 BGM 导出")
-        
-        # 导出视频
-        print(f"[Editor] 正在导出视频: {output_path}")
-        final_clip.write_videofile(
-            output_path,
-            codec="libx264",
-            audio_codec="aac",
-            fps=24,
-            preset="medium",
-            threads=4,
-            logger=None  # 减少日志输出
-        )
-        
-        # 清理资源
-        final_clip.close()
-        for clip in clips:
-            clip.close()
-        
-        print(f"[Editor] 视频导出成功: {output_path} (总时长: {total_duration:.2f}s)")
-        
-        # 自动生成 SRT 字幕文件
-        srt_path = None
-        if scenes:
-            srt_path = output_path.rsplit('.', 1)[0] + '.srt'
-            generate_srt(scenes, audio_paths, srt_path)
-        
-        # 上传到 OSS（按主题分类）
-        video_url = output_path
-        srt_url = srt_path
-        if topic:
-            oss_video_url = upload_file_to_oss_by_topic(output_path, topic, "video")
-            if oss_video_url:
-                video_url = oss_video_url
-            if srt_path and os.path.exists(srt_path):
-                oss_srt_url = upload_file_to_oss_by_topic(srt_path, topic, "video")
+                oss_video_url = video_upload.result()
+                if oss_video_url:
+                    video_url = oss_video_url
+                oss_srt_url = srt_upload.result() if srt_upload else None
                 if oss_srt_url:
                     srt_url = oss_srt_url
         
@@ -336,39 +561,119 @@ def create_video(
         return None
 
 
+@lru_cache(maxsize=512)
+def _cached_duration(audio_path: str, mtime_ns: int) -> float:
+    """读取音频时长（以路径 + 修改时间为缓存键，文件被覆盖后自动失效）"""
+    audio = AudioFileClip(audio_path)
+    try:
+        return audio.duration
+    finally:
+        audio.close()
+
+
 def get_audio_duration(audio_path: str) -> float:
     """获取音频时长（秒）"""
-    from moviepy import AudioFileClip
-    
     try:
-        audio = AudioFileClip(audio_path)
-        duration = audio.duration
-        audio.close()
-        return duration
+        return _cached_duration(audio_path, os.stat(audio_path).st_mtime_ns)
     except Exception as e:
         print(f"[Editor Error] 获取音频时长失败: {e}")
         return 0.0
 
 
+# MP3 (Layer III) 帧头查找表
+_MP3_BITRATES = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),  # MPEG-1
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),      # MPEG-2
+    0: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),      # MPEG-2.5
+}
+_MP3_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    0: (11025, 12000, 8000),
+}
+
+
+def _mp3_header_duration(audio_path: str) -> Optional[float]:
+    """
+    从 MP3 帧头估算时长（纯 Python 读取文件头部，不启动 ffmpeg 子进程）
+    
+    VBR 文件读取 Xing/Info/VBRI 头中的总帧数；CBR 文件按 (文件大小 × 8 / 码率) 计算。
+    TTS 输出均为 CBR MP3，估算误差在一帧（几十毫秒）以内
+    
+    Returns:
+        时长（秒），无法解析（非 MP3 或非 Layer III）时返回 None
+    """
+    try:
+        file_size = os.path.getsize(audio_path)
+        with open(audio_path, "rb") as f:
+            head = f.read(10)
+            offset = 0
+            # 跳过 ID3v2 标签（大小为 syncsafe 整数）
+            if head[:3] == b"ID3" and len(head) == 10:
+                offset = 10 + ((head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9])
+                if head[5] & 0x10:
+                    offset += 10
+            f.seek(offset)
+            data = f.read(4096)
+    except OSError:
+        return None
+    
+    # 查找第一个合法帧头
+    for i in range(len(data) - 4):
+        if data[i] != 0xFF or (data[i + 1] & 0xE0) != 0xE0:
+            continue
+        version = (data[i + 1] >> 3) & 0x03
+        layer = (data[i + 1] >> 1) & 0x03
+        bitrate_index = data[i + 2] >> 4
+        sample_rate_index = (data[i + 2] >> 2) & 0x03
+        if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+            continue
+        
+        bitrate = _MP3_BITRATES[version][bitrate_index] * 1000
+        sample_rate = _MP3_SAMPLE_RATES[version][sample_rate_index]
+        samples_per_frame = 1152 if version == 3 else 576
+        mono = (data[i + 3] >> 6) == 3
+        
+        # VBR 头：Xing/Info 位于边信息之后，VBRI 固定在帧头后 32 字节
+        side_info = (17 if mono else 32) if version == 3 else (9 if mono else 17)
+        xing = i + 4 + side_info
+        if data[xing:xing + 4] in (b"Xing", b"Info") and int.from_bytes(data[xing + 4:xing + 8], "big") & 0x01:
+            frames = int.from_bytes(data[xing + 8:xing + 12], "big")
+            return frames * samples_per_frame / sample_rate
+        if data[i + 36:i + 40] == b"VBRI":
+            frames = int.from_bytes(data[i + 50:i + 54], "big")
+            return frames * samples_per_frame / sample_rate
+        
+        return (file_size - offset - i) * 8 / bitrate
+    return None
+
+
 def get_total_duration(audio_paths: list) -> float:
-    """计算所有音频的总时长"""
+    """
+    计算所有音频的总时长
+    
+    优先从 MP3 帧头读取（无子进程），无法解析时回退到 MoviePy；文件不存在的路径计为 0
+    """
     total = 0.0
     for path in audio_paths:
-        if path and os.path.exists(path):
-            total += get_audio_duration(path)
+        if not path:
+            continue
+        duration = _mp3_header_duration(path)
+        if duration is None:
+            duration = get_audio_duration(path) if os.path.exists(path) else 0.0
+        total += duration
     return total
 
 
 def _format_srt_time(seconds: float) -> str:
     """将秒数转换为 SRT 时间格式 (HH:MM:SS,mmm)"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    millis = int((seconds % 1) * 1000)
+    hours, rem = divmod(int(seconds * 1000), 3_600_000)
+    minutes, rem = divmod(rem, 60_000)
+    secs, millis = divmod(rem, 1000)
     return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
 
 
-def generate_srt(scenes: list, audio_paths: list, output_path: str = None, topic: str = None) -> Optional[str]:
+def generate_srt(scenes: list, audio_paths: list, output_path: str = None, topic: str = None, durations: list = None) -> Optional[str]:
     """
     根据分镜和音频时长生成 SRT 字幕文件
     
@@ -377,6 +682,7 @@ def generate_srt(scenes: list, audio_paths: list, output_path: str = None, topic
         audio_paths: 音频路径列表（用于计算时间轴）
         output_path: 输出路径，为空则自动生成
         topic: 主题名称（用于文件命名）
+        durations: 已知的各段音频时长（与 audio_paths 对齐，None 项重新读取），避免重复打开音频
     
     Returns:
         SRT 文件路径，失败返回 None
@@ -393,13 +699,15 @@ def generate_srt(scenes: list, audio_paths: list, output_path: str = None, topic
         else:
             output_path = str(DEFAULT_OUTPUT_DIR / "output.srt")
     
-    srt_lines = []
+    buf = StringIO()
     current_time = 0.0
     subtitle_index = 1
     
     for i, (scene, aud_path) in enumerate(zip(scenes, audio_paths)):
         # 获取该段音频时长
-        if aud_path and os.path.exists(aud_path):
+        if durations and i < len(durations) and durations[i] is not None:
+            duration = durations[i]
+        elif aud_path and os.path.exists(aud_path):
             duration = get_audio_duration(aud_path)
         else:
             duration = 3.0  # 默认 3 秒
@@ -414,22 +722,19 @@ def generate_srt(scenes: list, audio_paths: list, output_path: str = None, topic
         start_time = current_time
         end_time = current_time + duration
         
-        # 写入 SRT 格式
-        srt_lines.append(str(subtitle_index))
-        srt_lines.append(f"{_format_srt_time(start_time)} --> {_format_srt_time(end_time)}")
-        srt_lines.append(narration)
-        srt_lines.append("")  # 空行分隔
+        # 写入 SRT 格式（序号、时间轴、字幕文本、空行分隔）
+        buf.write(f"{subtitle_index}\n{_format_srt_time(start_time)} --> {_format_srt_time(end_time)}\n{narration}\n\n")
         
         subtitle_index += 1
         current_time = end_time
     
-    if not srt_lines:
+    if subtitle_index == 1:
         print("[SRT] 无有效字幕内容")
         return None
     
     try:
         with open(output_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(srt_lines))
+            f.write(buf.getvalue())
         print(f"[SRT] 字幕文件生成成功: {output_path}")
         return output_path
     except Exception as e:
@@ -3,6 +3,7 @@ Obsidian MD 文件导出模块
 将生成的笔记导出为 Markdown 文件，保存到本地 Obsidian 目录
 """
 import os
+from io import StringIO
 from pathlib import Path
 from datetime import datetime
 from typing import Optional, List
@@ -43,52 +44,47 @@ def export_note(
         export_dir = Path(OBSIDIAN_EXPORT_PATH)
         export_dir.mkdir(parents=True, exist_ok=True)
         
-        # 生成文件名
+        # 生成文件名（文件名时间戳与 frontmatter 的创建时间共用同一个时刻）
+        now = datetime.now()
         safe_topic = sanitize_filename(topic) if topic else "untitled"
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         filename = f"{safe_topic}_{timestamp}.md"
         file_path = export_dir / filename
         
         # 构建 MD 内容
-        md_lines = []
+        buf = StringIO()
         
         # Frontmatter (YAML 元数据)
-        md_lines.append("---")
-        md_lines.append(f"title: {title}")
-        md_lines.append(f"topic: {topic}")
-        md_lines.append(f"created: {datetime.now().isoformat()}")
+        buf.write("---\n")
+        buf.write(f"title: {title}\n")
+        buf.write(f"topic: {topic}\n")
+        buf.write(f"created: {now.isoformat()}\n")
         if tags:
-            md_lines.append(f"tags: [{', '.join(tags)}]")
+            buf.write(f"tags: [{', '.join(tags)}]\n")
         else:
-            md_lines.append("tags: [小红书, 自动生成]")
-        md_lines.append("---")
-        md_lines.append("")
+            buf.write("tags: [小红书, 自动生成]\n")
+        buf.write("---\n\n")
         
         # 标题
-        md_lines.append(f"# {title}")
-        md_lines.append("")
+        buf.write(f"# {title}\n\n")
         
         # 正文
-        # 处理换行符（\n -> 实际换行）
-        formatted_content = content.replace("\\n", "\n")
-        md_lines.append(formatted_content)
-        md_lines.append("")
+        # 处理换行符（\n -> 实际换行）；正文通常已是真实换行，先判断再替换
+        if "\\n" in content:
+            content = content.replace("\\n", "\n")
+        buf.write(content)
+        buf.write("\n")
         
         # 配图
         if image_urls:
-            md_lines.append("---")
-            md_lines.append("")
-            md_lines.append("## 配图")
-            md_lines.append("")
+            buf.write("\n---\n\n## 配图\n")
             for i, url in enumerate(image_urls):
                 if url:
-                    md_lines.append(f"### 图片 {i+1}")
-                    md_lines.append(f"![{topic}_image_{i+1}]({url})")
-                    md_lines.append("")
+                    buf.write(f"\n### 图片 {i+1}\n")
+                    buf.write(f"![{topic}_image_{i+1}]({url})\n")
         
-        # 写入文件
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(md_lines))
+        # 写入文件：整体编码后一次写入（大于缓冲区的 bytes 直接落到单次 write 系统调用）
+        file_path.write_bytes(buf.getvalue().encode("utf-8"))
         
         print(f"[MD Export] 笔记导出成功: {file_path}")
         return str(file_path)
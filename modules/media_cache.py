@@ -0,0 +1,163 @@
+"""
+素材缓存模块
+按生成参数（prompt / provider / voice ...）的哈希缓存已生成的图片和音频，
+相同参数重复生成（重试、重新生成）时直接复用，不再调用付费接口
+
+缓存结构: output/{kind}/cache/{key[:2]}/{key}{ext}
+- 本地文件结果：复制到缓存目录（不用硬链接：原文件之后可能被同名覆盖写入），
+  先写临时文件再原子替换：读取方可以放心硬链接缓存文件，不会读到半个文件
+- OSS URL 结果：保存为 {key}.url 文本文件
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple
+
+# 缓存根目录（与各模块的默认输出目录一致）
+CACHE_ROOTS = {
+    "images": Path("output/images/cache"),
+    "audio": Path("output/audio/cache"),
+}
+
+# 缓存有效期（秒），过期条目视为未命中
+MEDIA_CACHE_TTL = int(os.getenv("MEDIA_CACHE_TTL", str(7 * 24 * 3600)))
+# 每类素材的缓存容量上限（MB），超出后按最近使用时间淘汰
+MEDIA_CACHE_MAX_MB = int(os.getenv("MEDIA_CACHE_MAX_MB", "512"))
+
+_evict_lock = threading.Lock()
+
+
+def make_key(**params: Any) -> str:
+    """根据生成参数计算缓存键（参数顺序无关）"""
+    payload = json.dumps(params, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _bucket_dir(kind: str, key: str) -> Path:
+    return CACHE_ROOTS[kind] / key[:2]
+
+
+def lookup(kind: str, key: str) -> Optional[str]:
+    """
+    查找缓存
+
+    Args:
+        kind: "images" 或 "audio"
+        key: make_key 生成的缓存键
+
+    Returns:
+        命中时返回缓存文件路径或 OSS URL，否则返回 None
+    """
+    bucket = _bucket_dir(kind, key)
+    if not bucket.is_dir():
+        return None
+
+    now = time.time()
+    for entry in bucket.glob(f"{key}.*"):
+        try:
+            if now - entry.stat().st_mtime > MEDIA_CACHE_TTL:
+                entry.unlink(missing_ok=True)
+                return None
+            # 更新修改时间，作为 LRU 的「最近使用」时间
+            os.utime(entry)
+            if entry.suffix == ".url":
+                return entry.read_text(encoding="utf-8").strip() or None
+            return str(entry)
+        except OSError:
+            return None
+    return None
+
+
+def store(kind: str, key: str, result: str):
+    """
+    写入缓存
+
+    Args:
+        kind: "images" 或 "audio"
+        key: 缓存键
+        result: 生成结果（本地文件路径或 OSS URL）
+    """
+    if not result:
+        return
+
+    bucket = _bucket_dir(kind, key)
+    try:
+        bucket.mkdir(parents=True, exist_ok=True)
+        if result.startswith("http://") or result.startswith("https://"):
+            (bucket / f"{key}.url").write_text(result, encoding="utf-8")
+        elif os.path.exists(result):
+            target = bucket / f"{key}{Path(result).suffix}"
+            tmp_path = bucket / f".{key}.{uuid.uuid4().hex}.tmp"
+            shutil.copyfile(result, tmp_path)
+            os.replace(tmp_path, target)
+        else:
+            return
+    except OSError as e:
+        print(f"[Media Cache Warning] 写入缓存失败: {e}")
+        return
+
+    _evict(kind)
+
+
+def _evict(kind: str):
+    """缓存总大小超出上限时，按最近使用时间从旧到新删除"""
+    root = CACHE_ROOTS[kind]
+    budget = MEDIA_CACHE_MAX_MB * 1024 * 1024
+
+    with _evict_lock:
+        entries = []
+        total = 0
+        for path in root.glob("*/*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total <= budget:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= budget:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        print(f"[Media Cache] {kind} 缓存已淘汰至 {total / 1024 / 1024:.1f}MB")
+
+
+def get_or_compute(
+    kind: str,
+    params: dict,
+    compute_fn: Callable[[], Tuple[Optional[str], Optional[str]]],
+    no_cache: bool = False,
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    带缓存地生成素材
+
+    Args:
+        kind: "images" 或 "audio"
+        params: 决定生成结果的参数（用于计算缓存键）
+        compute_fn: 未命中时调用的生成函数，返回 (路径, 错误信息)
+        no_cache: True 时跳过缓存读取（结果仍会写入缓存）
+
+    Returns:
+        (路径或 URL, 错误信息)
+    """
+    key = make_key(**params)
+    if not no_cache:
+        cached = lookup(kind, key)
+        if cached:
+            print(f"[Media Cache Hit] {kind}: {key[:12]}")
+            return cached, None
+
+    path, error = compute_fn()
+    if path:
+        store(kind, key, path)
+    return path, error
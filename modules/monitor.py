@@ -1,30 +1,63 @@
 """
 监控模块 - 数据采集与存储
 """
+import atexit
 import os
+import queue
 import sqlite3
+import threading
 import uuid
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from typing import Optional
 
 # 数据库路径
 DB_PATH = Path(__file__).parent.parent / "data" / "monitor.db"
 
+# 连接的语句缓存容量：高频写入的 SQL 文本固定，命中缓存即可复用已编译的语句
+STATEMENT_CACHE_SIZE = 256
 
-def _get_conn():
-    """获取数据库连接"""
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    return conn
+# 高频写入语句（模块常量，保证每次传给 sqlite3 的是同一 SQL 文本）
+_INS_API = "INSERT INTO api_calls (model, tokens_in, tokens_out) VALUES (?, ?, ?)"
+_INS_ACCESS = "INSERT INTO access_logs (session_id, ip_address) VALUES (?, ?)"
+_INS_GENERATION = "INSERT INTO generation_history (topic, persona, titles, content_preview) VALUES (?, ?, ?, ?)"
+_INS_GEN_TITLE = "INSERT INTO generation_titles (gen_id, title) VALUES (?, ?)"
+
+
+# 进程内共用一个连接（WAL 模式 + 自动提交），不再每次读写都打开/关闭数据库文件；
+# 同一连接不能被多个线程同时使用，所有读写都在 _db_lock 内进行
+_conn: Optional[sqlite3.Connection] = None
+_db_lock = threading.RLock()
+
+
+def _get_conn() -> sqlite3.Connection:
+    """获取共享数据库连接（懒加载，调用方需持有 _db_lock）"""
+    global _conn
+    if _conn is None:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(
+            str(DB_PATH),
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA busy_timeout=5000")
+        _conn = conn
+    return _conn
 
 
 def init_db():
     """初始化数据库表"""
-    conn = _get_conn()
-    cursor = conn.cursor()
-    
+    with _db_lock:
+        _create_tables(_get_conn().cursor())
+
+
+def _create_tables(cursor: sqlite3.Cursor):
+    """建表（已存在时跳过）"""
     # API 调用记录
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS api_calls (
@@ -58,25 +91,135 @@ def init_db():
         )
     """)
     
-    conn.commit()
-    conn.close()
+    # 时间索引：按时间倒序分页和按日期范围统计都走索引，不再全表扫描
+    for table in ("api_calls", "access_logs", "generation_history"):
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_created ON {table}(created_at)")
+    
+    # 生成历史的标题（每个标题一行，可按标题建索引检索）
+    has_titles_table = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'generation_titles'"
+    ).fetchone()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS generation_titles (
+            gen_id INTEGER NOT NULL REFERENCES generation_history(id),
+            title TEXT NOT NULL COLLATE NOCASE
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_gen_titles_title ON generation_titles(title COLLATE NOCASE)")
+    
+    if not has_titles_table:
+        # 首次建表：从已有记录的 titles 字段（" | " 拼接）回填
+        rows = cursor.execute("SELECT id, titles FROM generation_history WHERE titles != ''").fetchall()
+        cursor.executemany(
+            _INS_GEN_TITLE,
+            [(gen_id, title) for gen_id, titles in rows for title in titles.split(" | ") if title]
+        )
 
 
 # 初始化数据库
 init_db()
 
 
+def _day_range(day: date) -> tuple:
+    """
+    某一天的半开区间 [当天, 次日)
+    
+    用范围条件代替 DATE(created_at) = ?，SQLite 才能使用 created_at 索引
+    （created_at 以 "YYYY-MM-DD HH:MM:SS" 文本存储，可直接按字符串比较）
+    """
+    return day.isoformat(), (day + timedelta(days=1)).isoformat()
+
+
+# 列表查询的最大返回条数（避免一次把整张表读入内存）
+MAX_QUERY_LIMIT = 500
+
+
+def _cap_limit(limit: int) -> int:
+    return max(1, min(int(limit), MAX_QUERY_LIMIT))
+
+
+# ========== 批量写入 ==========
+
+# 日志写入先进入内存队列，由后台线程每 FLUSH_INTERVAL 秒（或积攒 FLUSH_BATCH_SIZE 条）
+# 在一个事务内批量提交，调用方不做任何磁盘 I/O
+FLUSH_INTERVAL = 0.5
+FLUSH_BATCH_SIZE = 100
+
+_pending: "queue.Queue[tuple]" = queue.Queue()
+_flush_event = threading.Event()
+_flusher: Optional[threading.Thread] = None
+_flusher_lock = threading.Lock()
+
+
+def _flush():
+    """
+    把队列中的日志写入数据库（同一事务，按 SQL 分组 executemany）
+    
+    队列元素为 (sql, params)；sql 也可以是函数 fn(conn, *params)，用于需要多条关联写入的记录
+    """
+    batch = []
+    while True:
+        try:
+            batch.append(_pending.get_nowait())
+        except queue.Empty:
+            break
+    if not batch:
+        return
+    
+    grouped = {}
+    jobs = []
+    for sql, params in batch:
+        if callable(sql):
+            jobs.append((sql, params))
+        else:
+            grouped.setdefault(sql, []).append(params)
+    
+    with _db_lock:
+        conn = _get_conn()
+        try:
+            conn.execute("BEGIN")
+            for sql, rows in grouped.items():
+                conn.executemany(sql, rows)
+            for fn, params in jobs:
+                fn(conn, *params)
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            print(f"[Monitor] 批量写入失败（丢弃 {len(batch)} 条）: {e}")
+
+
+def _flush_loop():
+    while True:
+        _flush_event.wait(FLUSH_INTERVAL)
+        _flush_event.clear()
+        try:
+            _flush()
+        except Exception as e:
+            print(f"[Monitor] 后台写入异常: {e}")
+
+
+def _enqueue(sql, params: tuple):
+    """日志入队（首次调用时启动后台写入线程）"""
+    global _flusher
+    if _flusher is None:
+        with _flusher_lock:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_flush_loop, name="monitor-flusher", daemon=True)
+                _flusher.start()
+    _pending.put((sql, params))
+    if _pending.qsize() >= FLUSH_BATCH_SIZE:
+        _flush_event.set()
+
+
+# 进程退出前写完剩余日志
+atexit.register(_flush)
+
+
 def log_api_call(model: str, tokens_in: int = 0, tokens_out: int = 0):
     """记录 API 调用"""
     try:
-        conn = _get_conn()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO api_calls (model, tokens_in, tokens_out) VALUES (?, ?, ?)",
-            (model, tokens_in, tokens_out)
-        )
-        conn.commit()
-        conn.close()
+        _enqueue(_INS_API, (model, tokens_in, tokens_out))
     except Exception as e:
         print(f"[Monitor] API 日志记录失败: {e}")
 
@@ -84,153 +227,142 @@ def log_api_call(model: str, tokens_in: int = 0, tokens_out: int = 0):
 def log_access(session_id: Optional[str] = None, ip_address: Optional[str] = None):
     """记录访问日志"""
     try:
-        conn = _get_conn()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO access_logs (session_id, ip_address) VALUES (?, ?)",
-            (session_id or str(uuid.uuid4())[:8], ip_address)
-        )
-        conn.commit()
-        conn.close()
+        _enqueue(_INS_ACCESS, (session_id or str(uuid.uuid4())[:8], ip_address))
     except Exception as e:
         print(f"[Monitor] 访问日志记录失败: {e}")
 
 
+def _insert_generation(conn: sqlite3.Connection, topic: str, persona: str, titles: list, content_preview: str):
+    """写入一条生成历史及其标题（在 _flush 的事务内执行）"""
+    gen_id = conn.execute(
+        _INS_GENERATION,
+        (topic, persona, " | ".join(titles), content_preview)
+    ).lastrowid
+    if titles:
+        conn.executemany(
+            _INS_GEN_TITLE,
+            [(gen_id, title) for title in titles]
+        )
+
+
 def log_generation(topic: str, persona: str, titles: list, content_preview: str):
     """记录生成历史"""
     try:
-        conn = _get_conn()
-        cursor = conn.cursor()
-        titles_str = " | ".join(titles) if titles else ""
-        cursor.execute(
-            "INSERT INTO generation_history (topic, persona, titles, content_preview) VALUES (?, ?, ?, ?)",
-            (topic, persona, titles_str, content_preview[:500])
-        )
-        conn.commit()
-        conn.close()
+        _enqueue(_insert_generation, (topic, persona, [t for t in titles or [] if t], content_preview[:500]))
     except Exception as e:
         print(f"[Monitor] 生成历史记录失败: {e}")
 
 
 def get_stats() -> dict:
     """获取统计数据"""
-    conn = _get_conn()
-    cursor = conn.cursor()
-    
-    # 总调用次数
-    cursor.execute("SELECT COUNT(*) as cnt FROM api_calls")
-    total_calls = cursor.fetchone()['cnt']
-    
-    # 总 Token 消耗
-    cursor.execute("SELECT COALESCE(SUM(tokens_in), 0) as t_in, COALESCE(SUM(tokens_out), 0) as t_out FROM api_calls")
-    token_row = cursor.fetchone()
-    total_tokens_in = token_row['t_in']
-    total_tokens_out = token_row['t_out']
-    
-    # 今日调用
-    today = datetime.now().strftime("%Y-%m-%d")
-    cursor.execute("SELECT COUNT(*) as cnt FROM api_calls WHERE DATE(created_at) = ?", (today,))
-    today_calls = cursor.fetchone()['cnt']
+    _flush()  # 先写入队列中的日志，保证读到最新数据
+    # 今日范围只计算一次：[今天, 明天)
+    today_start, today_end = _day_range(datetime.now().date())
+    with _db_lock:
+        # 一次查询完成全部统计：api_calls 用条件聚合，另外两张表用标量子查询
+        row = _get_conn().execute(
+            """
+            SELECT
+                COUNT(*) AS total_calls,
+                COALESCE(SUM(tokens_in), 0) AS total_tokens_in,
+                COALESCE(SUM(tokens_out), 0) AS total_tokens_out,
+                COALESCE(SUM(CASE WHEN created_at >= :start AND created_at < :end THEN 1 ELSE 0 END), 0) AS today_calls,
+                COALESCE(SUM(CASE WHEN created_at >= :start AND created_at < :end THEN tokens_in ELSE 0 END), 0) AS today_tokens_in,
+                COALESCE(SUM(CASE WHEN created_at >= :start AND created_at < :end THEN tokens_out ELSE 0 END), 0) AS today_tokens_out,
+                (SELECT COUNT(*) FROM access_logs) AS total_access,
+                (SELECT COUNT(*) FROM generation_history) AS total_generations
+            FROM api_calls
+            """,
+            {"start": today_start, "end": today_end}
+        ).fetchone()
     
-    # 今日 Token
-    cursor.execute(
-        "SELECT COALESCE(SUM(tokens_in), 0) as t_in, COALESCE(SUM(tokens_out), 0) as t_out FROM api_calls WHERE DATE(created_at) = ?",
-        (today,)
-    )
-    today_token_row = cursor.fetchone()
-    today_tokens_in = today_token_row['t_in']
-    today_tokens_out = today_token_row['t_out']
-    
-    # 总访问次数
-    cursor.execute("SELECT COUNT(*) as cnt FROM access_logs")
-    total_access = cursor.fetchone()['cnt']
-    
-    # 总生成次数
-    cursor.execute("SELECT COUNT(*) as cnt FROM generation_history")
-    total_generations = cursor.fetchone()['cnt']
-    
-    conn.close()
-    
-    return {
-        "total_calls": total_calls,
-        "total_tokens_in": total_tokens_in,
-        "total_tokens_out": total_tokens_out,
-        "today_calls": today_calls,
-        "today_tokens_in": today_tokens_in,
-        "today_tokens_out": today_tokens_out,
-        "total_access": total_access,
-        "total_generations": total_generations,
-    }
+    return dict(row)
 
 
 def get_api_calls(limit: int = 50) -> list:
     """获取最近 API 调用记录"""
-    conn = _get_conn()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT * FROM api_calls ORDER BY created_at DESC LIMIT ?",
-        (limit,)
-    )
-    rows = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    limit = _cap_limit(limit)
+    _flush()
+    with _db_lock:
+        conn = _get_conn()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM api_calls ORDER BY created_at DESC LIMIT ?",
+            (limit,)
+        )
+        rows = [dict(row) for row in cursor.fetchall()]
     return rows
 
 
 def get_access_logs(limit: int = 50) -> list:
     """获取最近访问日志"""
-    conn = _get_conn()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT * FROM access_logs ORDER BY created_at DESC LIMIT ?",
-        (limit,)
-    )
-    rows = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    limit = _cap_limit(limit)
+    _flush()
+    with _db_lock:
+        conn = _get_conn()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM access_logs ORDER BY created_at DESC LIMIT ?",
+            (limit,)
+        )
+        rows = [dict(row) for row in cursor.fetchall()]
     return rows
 
 
 def get_generation_history(limit: int = 50, search: str = None) -> list:
     """获取生成历史"""
-    conn = _get_conn()
-    cursor = conn.cursor()
-    
-    if search:
-        cursor.execute(
-            "SELECT * FROM generation_history WHERE topic LIKE ? OR titles LIKE ? ORDER BY created_at DESC LIMIT ?",
-            (f"%{search}%", f"%{search}%", limit)
-        )
-    else:
-        cursor.execute(
-            "SELECT * FROM generation_history ORDER BY created_at DESC LIMIT ?",
-            (limit,)
-        )
-    
-    rows = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    limit = _cap_limit(limit)
+    _flush()
+    with _db_lock:
+        conn = _get_conn()
+        cursor = conn.cursor()
+        
+        if search:
+            cursor.execute(
+                "SELECT * FROM generation_history WHERE topic LIKE :q "
+                "OR id IN (SELECT gen_id FROM generation_titles WHERE title LIKE :q) "
+                "ORDER BY created_at DESC LIMIT :limit",
+                {"q": f"%{search}%", "limit": limit}
+            )
+        else:
+            cursor.execute(
+                "SELECT * FROM generation_history ORDER BY created_at DESC LIMIT ?",
+                (limit,)
+            )
+        
+        rows = [dict(row) for row in cursor.fetchall()]
     return rows
 
 
 def get_daily_stats(days: int = 7) -> list:
     """获取每日统计（用于趋势图）"""
-    conn = _get_conn()
-    cursor = conn.cursor()
+    _flush()
     
-    results = []
-    for i in range(days - 1, -1, -1):
-        date = (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d")
+    # 日期列表在持锁前一次算好（只取一次当前时间）
+    today = datetime.now().date()
+    day_list = [(today - timedelta(days=i)).isoformat() for i in range(days - 1, -1, -1)]
+    start = day_list[0] if day_list else today.isoformat()
+    _, end = _day_range(today)
+    
+    with _db_lock:
+        conn = _get_conn()
+        cursor = conn.cursor()
         
+        # 一次查询按天分组（范围条件走索引），没有记录的日期在下面补 0
         cursor.execute(
-            "SELECT COUNT(*) as calls, COALESCE(SUM(tokens_in + tokens_out), 0) as tokens FROM api_calls WHERE DATE(created_at) = ?",
-            (date,)
+            "SELECT DATE(created_at) as day, COUNT(*) as calls, COALESCE(SUM(tokens_in + tokens_out), 0) as tokens "
+            "FROM api_calls WHERE created_at >= ? AND created_at < ? GROUP BY day",
+            (start, end)
         )
-        row = cursor.fetchone()
-        
+        by_day = {row['day']: row for row in cursor.fetchall()}
+    
+    results = []
+    for day in day_list:
+        row = by_day.get(day)
         results.append({
-            "date": date,
-            "calls": row['calls'],
-            "tokens": row['tokens']
+            "date": day,
+            "calls": row['calls'] if row else 0,
+            "tokens": row['tokens'] if row else 0
         })
-    
-    conn.close()
     return results
 
@@ -1,17 +1,28 @@
 """
 生图模块 (FLUX via Replicate)
 专注使用 black-forest-labs/flux-dev 生成高质量图片
-支持并发生成：ThreadPoolExecutor 加速批量处理
+支持并发生成：asyncio 协程并发（Replicate 异步预测 + httpx 异步下载）
 支持主题命名：文件按主题组织
 """
+import asyncio
+import hashlib
 import os
+import random
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
+from collections import OrderedDict
+from types import MappingProxyType
 from typing import Optional, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+import httpx
 import replicate
 import requests
-from modules.storage import upload_to_oss_by_topic
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from modules import media_cache
+from modules.storage import upload_file_to_oss_by_topic
 from modules.utils import sanitize_filename, get_unique_dir
 
 load_dotenv()
@@ -22,7 +33,7 @@ DEFAULT_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 # ========== FLUX 风格库 ==========
 
-FLUX_STYLES = {
+FLUX_STYLES = MappingProxyType({
     # 情感风格映射
     "可爱治愈": "soft pastel colors, dreamy atmosphere, gentle lighting, kawaii aesthetic, warm and cozy vibe, studio ghibli inspired",
     "严肃深度": "cinematic lighting, shallow depth of field, shot on 35mm film, dramatic shadows, moody atmosphere, film grain",
@@ -34,16 +45,469 @@ FLUX_STYLES = {
     "architecture": "technical diagram style, clean minimalist design, dark mode UI, neon accent colors, system architecture visualization, professional infographic",
     "flow": "data flow diagram, glowing connections, dark background, modern tech aesthetic, clean information design",
     "comparison": "side-by-side comparison layout, split view design, contrasting colors, clean infographic style, professional presentation",
-}
+})  # 只读：风格库在模块加载后不再变化，_build_flux_prompt 的缓存才能保持有效
 
 FLUX_BASE_STYLE = "high quality, detailed, professional photography, 4k resolution, sharp focus"
 
+
+@lru_cache(maxsize=256)
+def _build_flux_prompt(base_prompt: str, sentiment: str) -> str:
+    """组装 FLUX prompt：基础描述 + 情感对应的风格修饰符（重试/重新生成时直接复用）"""
+    return f"{base_prompt}, {FLUX_STYLES.get(sentiment, FLUX_BASE_STYLE)}"
+
 # 并发配置
 MAX_WORKERS = 5
 
+# 下载连接池：按 host 缓存的连接池数量，以及每个 host 池内保持的连接数
+HTTP_POOL_CONNECTIONS = 16
+HTTP_POOL_MAXSIZE = 32
+
+# 有主题且已上传 OSS 时是否仍保存本地副本（视频合成需要本地图片，默认保存；
+# 只需要 OSS URL 的部署可设置 PAINTER_SAVE_LOCAL=0 省去磁盘写入）
+PAINTER_SAVE_LOCAL = os.getenv("PAINTER_SAVE_LOCAL", "1") != "0"
+
+# 下载/写盘的分块与缓冲大小
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+# 下载超时：(连接, 读取) 秒，连接失败尽快重试，读取给足大图的传输时间
+DOWNLOAD_TIMEOUT = (5, 60)
+
+# 批量生图是否复用素材缓存（相同 provider / prompt / 风格 / 模型直接返回上次的结果），IMAGE_CACHE=1 开启
+IMAGE_CACHE_ENABLED = os.getenv("IMAGE_CACHE", "0") == "1"
+
+# 异步批量生图的并发上限（协程不占线程，可以比 MAX_WORKERS 高）
+ASYNC_MAX_CONCURRENCY = int(os.getenv("PAINTER_MAX_CONCURRENCY", "16"))
+
+# 安装了 h2 时下载图片启用 HTTP/2（同一 CDN 主机的多个请求复用一条连接）
+try:
+    import h2  # noqa: F401
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+
+# ========== 重试与熔断 ==========
+
+# 429 / 5xx / 网络错误按指数退避（带抖动）重试；连续失败过多时熔断一段时间，不再请求已宕机的服务
+REPLICATE_MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_OPEN_SECONDS = 60
+
+# Replicate 预测的轮询间隔与最长等待时间（秒），超时后取消预测，避免继续计费
+REPLICATE_POLL_INTERVAL = 1.0
+REPLICATE_PREDICTION_TIMEOUT = 300
+_PREDICTION_TERMINAL = ("succeeded", "failed", "canceled")
+
+
+class _CircuitBreaker:
+    """连续失败计数熔断器（线程安全）"""
+    
+    def __init__(self, name: str, threshold: int = CIRCUIT_FAILURE_THRESHOLD, open_seconds: float = CIRCUIT_OPEN_SECONDS):
+        self.name = name
+        self.threshold = threshold
+        self.open_seconds = open_seconds
+        self._failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+    
+    def check(self):
+        """熔断期间直接抛出异常，不发起请求"""
+        remaining = self._open_until - time.monotonic()
+        if remaining > 0:
+            raise RuntimeError(f"{self.name} 连续失败，已暂停请求（{remaining:.0f}s 后恢复）")
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.threshold:
+                self._open_until = time.monotonic() + self.open_seconds
+                self._failures = 0
+                print(f"[Painter Warning] {self.name} 连续失败 {self.threshold} 次，熔断 {self.open_seconds}s")
+
+
+_replicate_circuit = _CircuitBreaker("Replicate")
+
+
+def _is_retryable(e: Exception, transport: bool = True) -> bool:
+    """
+    是否为可重试的临时错误：429 / 5xx，以及 transport=True 时的连接与超时错误（模型本身报错不重试）
+    
+    非幂等的请求（如创建预测）应传 transport=False：超时时请求可能已被服务端受理，重发会重复计费
+    """
+    model_error = getattr(replicate.exceptions, "ModelError", None)
+    if model_error is not None and isinstance(e, model_error):
+        return False
+    status = getattr(e, "status", None)
+    if status is None:
+        response = getattr(e, "response", None)
+        status = getattr(response, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return transport and isinstance(e, (httpx.TransportError, requests.ConnectionError, requests.Timeout))
+
+
+def _retry_delay(attempt: int) -> float:
+    """第 attempt 次重试前的等待时间（指数退避 + 抖动）"""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _call_with_retry(fn, label: str, circuit: Optional[_CircuitBreaker] = None, retry_transport: bool = True):
+    """同步调用 fn()，临时错误时退避重试（retry_transport 含义见 _is_retryable）"""
+    for attempt in range(REPLICATE_MAX_ATTEMPTS):
+        if circuit:
+            circuit.check()
+        try:
+            result = fn()
+        except Exception as e:
+            if not _is_retryable(e, retry_transport):
+                raise
+            if circuit:
+                circuit.record_failure()
+            if attempt == REPLICATE_MAX_ATTEMPTS - 1:
+                raise
+            delay = _retry_delay(attempt)
+            print(f"[Painter Warning] {label} 失败: {e}，{delay:.1f}s 后重试 ({attempt+1}/{REPLICATE_MAX_ATTEMPTS-1})")
+            time.sleep(delay)
+        else:
+            if circuit:
+                circuit.record_success()
+            return result
+
+
+async def _call_with_retry_async(fn, label: str, circuit: Optional[_CircuitBreaker] = None, retry_transport: bool = True):
+    """_call_with_retry 的异步版本（fn 返回协程）"""
+    for attempt in range(REPLICATE_MAX_ATTEMPTS):
+        if circuit:
+            circuit.check()
+        try:
+            result = await fn()
+        except Exception as e:
+            if not _is_retryable(e, retry_transport):
+                raise
+            if circuit:
+                circuit.record_failure()
+            if attempt == REPLICATE_MAX_ATTEMPTS - 1:
+                raise
+            delay = _retry_delay(attempt)
+            print(f"[Painter Warning] {label} 失败: {e}，{delay:.1f}s 后重试 ({attempt+1}/{REPLICATE_MAX_ATTEMPTS-1})")
+            await asyncio.sleep(delay)
+        else:
+            if circuit:
+                circuit.record_success()
+            return result
+
+
+# ========== Replicate 预测 ==========
+# 不用 client.run / async_run 整体重试：超时后重跑会新建一个付费预测，而第一个可能仍在运行。
+# 创建预测只在 429 / 5xx（服务端明确未受理）时重试；之后轮询同一个预测，查询失败就继续轮询
+
+def _prediction_output(prediction, label: str):
+    """预测结束后取输出，失败或取消时抛出异常"""
+    if prediction.status != "succeeded":
+        raise RuntimeError(f"{label} {prediction.status}: {prediction.error}")
+    return prediction.output
+
+
+def _run_prediction(client: replicate.Client, model_id: str, input_params: dict, label: str):
+    """创建 Replicate 预测并轮询到结束，返回输出"""
+    prediction = _call_with_retry(
+        lambda: client.models.predictions.create(model=model_id, input=input_params),
+        label, _replicate_circuit, retry_transport=False,
+    )
+    deadline = time.monotonic() + REPLICATE_PREDICTION_TIMEOUT
+    while prediction.status not in _PREDICTION_TERMINAL:
+        if time.monotonic() > deadline:
+            try:
+                prediction.cancel()
+            except Exception as e:
+                print(f"[Painter Warning] {label} 取消预测失败: {e}")
+            raise TimeoutError(f"{label} 超时（{REPLICATE_PREDICTION_TIMEOUT}s）")
+        time.sleep(REPLICATE_POLL_INTERVAL)
+        try:
+            prediction.reload()
+        except Exception as e:
+            if not _is_retryable(e):
+                raise
+            print(f"[Painter Warning] {label} 查询状态失败: {e}，继续轮询")
+    return _prediction_output(prediction, label)
+
+
+async def _run_prediction_async(client: replicate.Client, model_id: str, input_params: dict, label: str):
+    """_run_prediction 的异步版本"""
+    prediction = await _call_with_retry_async(
+        lambda: client.models.predictions.async_create(model=model_id, input=input_params),
+        label, _replicate_circuit, retry_transport=False,
+    )
+    deadline = time.monotonic() + REPLICATE_PREDICTION_TIMEOUT
+    while prediction.status not in _PREDICTION_TERMINAL:
+        if time.monotonic() > deadline:
+            try:
+                await prediction.async_cancel()
+            except Exception as e:
+                print(f"[Painter Warning] {label} 取消预测失败: {e}")
+            raise TimeoutError(f"{label} 超时（{REPLICATE_PREDICTION_TIMEOUT}s）")
+        await asyncio.sleep(REPLICATE_POLL_INTERVAL)
+        try:
+            await prediction.async_reload()
+        except Exception as e:
+            if not _is_retryable(e):
+                raise
+            print(f"[Painter Warning] {label} 查询状态失败: {e}，继续轮询")
+    return _prediction_output(prediction, label)
+
+
+# ========== 共享客户端（延迟初始化，进程内单例） ==========
+
+# 批量生图时各工作线程复用同一组连接，下载图片不再每张都重新握手 TLS
+_http_session: Optional[requests.Session] = None
+_replicate_client: Optional[replicate.Client] = None
+_ark_client = None
+_clients_lock = threading.Lock()
+
+
+def _get_http_session() -> requests.Session:
+    """获取下载图片用的共享 Session（进程内复用 TCP/TLS 连接，失败自动重试）"""
+    global _http_session
+    if _http_session is None:
+        with _clients_lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                    # 下载是幂等的 GET：CDN 临时错误时透明重试，不必重跑昂贵的生图
+                    max_retries=Retry(
+                        total=4,
+                        backoff_factor=0.5,
+                        status_forcelist=(429, 500, 502, 503, 504),
+                        allowed_methods=("GET", "HEAD"),
+                    ),
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
+
+
+def _get_replicate_client() -> replicate.Client:
+    """获取共享的 Replicate 客户端"""
+    global _replicate_client
+    if _replicate_client is None:
+        with _clients_lock:
+            if _replicate_client is None:
+                _replicate_client = replicate.Client(api_token=os.getenv("REPLICATE_API_TOKEN"))
+    return _replicate_client
+
+
+def _get_ark_client():
+    """获取共享的火山引擎方舟客户端（调用方需先确认 ARK_API_KEY 已配置）"""
+    global _ark_client
+    if _ark_client is None:
+        with _clients_lock:
+            if _ark_client is None:
+                from openai import OpenAI
+                _ark_client = OpenAI(
+                    base_url="https://ark.cn-beijing.volces.com/api/v3",
+                    api_key=os.getenv("ARK_API_KEY"),
+                    max_retries=2,
+                    timeout=60,
+                )
+    return _ark_client
+
+
+# ========== OSS 上传去重 ==========
+
+# 重试/重新生成时 Replicate 可能返回完全相同的图片：按内容哈希记住最近上传的 URL，相同内容不再重复上传
+UPLOAD_CACHE_SIZE = 512
+_upload_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_upload_cache_lock = threading.Lock()
+
+
+def _content_digest():
+    """图片内容摘要（用于上传去重，可边下载边 update）"""
+    return hashlib.blake2b(digest_size=16)
+
+
+def _upload_image_file(local_path: str, digest: str, topic: str, filename: str) -> Optional[str]:
+    """上传已落盘的图片到 OSS（按主题分类，从文件流式读取），同一主题下内容相同的图片直接返回已上传的 URL"""
+    key = (topic, digest)
+    with _upload_cache_lock:
+        oss_url = _upload_cache.get(key)
+        if oss_url:
+            _upload_cache.move_to_end(key)
+    if oss_url:
+        print(f"[Painter] 图片内容未变化，复用已上传的 OSS 地址: {filename}")
+        return oss_url
+    
+    oss_url = upload_file_to_oss_by_topic(local_path, topic, "images")
+    if oss_url:
+        with _upload_cache_lock:
+            _upload_cache[key] = oss_url
+            while len(_upload_cache) > UPLOAD_CACHE_SIZE:
+                _upload_cache.popitem(last=False)
+    return oss_url
+
+
+def _save_image(image_url: str, local_path: str, topic: Optional[str], filename: str) -> str:
+    """
+    下载生成的图片：有主题时上传 OSS（按主题分类），按需保存本地副本
+    
+    Returns:
+        OSS URL（上传成功时）或本地路径
+    """
+    # 边下载边写盘并计算摘要，不在内存中拼出整张图片；上传时 OSS SDK 再从文件流式读取
+    digest = _content_digest()
+    with _get_http_session().get(image_url, timeout=DOWNLOAD_TIMEOUT, stream=True) as resp:
+        resp.raise_for_status()
+        with open(local_path, "wb", buffering=DOWNLOAD_CHUNK_SIZE) as f:
+            for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                digest.update(chunk)
+    
+    if not topic:
+        return local_path
+    
+    oss_url = _upload_image_file(local_path, digest.hexdigest(), topic, filename)
+    if oss_url and not PAINTER_SAVE_LOCAL:
+        Path(local_path).unlink(missing_ok=True)
+        return oss_url
+    
+    # 上传失败时保留本地文件，否则结果丢失
+    return oss_url or local_path
+
+
+async def _save_image_async(client: httpx.AsyncClient, image_url: str, local_path: str, topic: Optional[str], filename: str) -> str:
+    """
+    _save_image 的异步版本：httpx 流式下载，边下载边写盘并计算摘要，
+    上传时 OSS SDK 再从文件流式读取；写盘和上传放到线程池
+    """
+    async def _download() -> str:
+        # 每次重试重新打开文件（截断），整个下载从头开始
+        digest = _content_digest()
+        async with client.stream("GET", image_url) as resp:
+            resp.raise_for_status()
+            f = await asyncio.to_thread(open, local_path, "wb", buffering=DOWNLOAD_CHUNK_SIZE)
+            try:
+                async for chunk in resp.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    await asyncio.to_thread(f.write, chunk)
+                    digest.update(chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+        return digest.hexdigest()
+    
+    digest = await _call_with_retry_async(_download, "下载图片")
+    
+    if not topic:
+        return local_path
+    
+    oss_url = await asyncio.to_thread(_upload_image_file, local_path, digest, topic, filename)
+    if oss_url and not PAINTER_SAVE_LOCAL:
+        await asyncio.to_thread(Path(local_path).unlink, missing_ok=True)
+        return oss_url
+    
+    # 上传失败时保留本地文件，否则结果丢失
+    return oss_url or local_path
+
+
+def _scene_filename(topic: Optional[str], index: int, ext: str) -> str:
+    """文件命名：主题_scene_01.ext"""
+    safe_topic = sanitize_filename(topic) if topic else ""
+    return f"{safe_topic}_scene_{index+1:02d}.{ext}" if safe_topic else f"scene_{index+1:02d}.{ext}"
+
+
+# ========== 素材缓存 ==========
+
+def image_cache_params(scene: dict, provider: str, use_schnell: bool, topic: Optional[str]) -> dict:
+    """决定生图结果的参数（素材缓存键，API 与批量生图共用，保证同一请求命中同一条缓存）"""
+    return {
+        "provider": provider,
+        "prompt": scene.get("prompt", ""),
+        "sentiment": scene.get("sentiment") or "",
+        "use_schnell": use_schnell,
+        "topic": topic or "",
+    }
+
+
+async def _lookup_cached_image(http_client: httpx.AsyncClient, key: str) -> Optional[str]:
+    """查找缓存的生图结果；OSS URL 需 HEAD 确认仍可访问，否则视为未命中"""
+    cached = await asyncio.to_thread(media_cache.lookup, "images", key)
+    if not cached or not cached.startswith(("http://", "https://")):
+        return cached
+    try:
+        resp = await http_client.head(cached)
+    except httpx.HTTPError:
+        return None
+    return cached if resp.status_code == 200 else None
+
 
 # ========== FLUX 单图生成 ==========
 
+def _flux_input(scene: dict, index: int, use_schnell: bool) -> Tuple[str, dict]:
+    """
+    组装 FLUX 调用参数
+    
+    Returns:
+        (model_id, input_params)
+    
+    Raises:
+        ValueError: prompt 为空
+    """
+    base_prompt = scene.get('prompt', '')
+    if not base_prompt:
+        raise ValueError("prompt 为空")
+    
+    # 组装最终 prompt（基础描述 + 风格修饰符）
+    sentiment = scene.get('sentiment', '') or ''
+    final_prompt = _build_flux_prompt(base_prompt, sentiment)
+    
+    model_name = "flux-schnell" if use_schnell else "flux-dev"
+    print(f"[FLUX {model_name}] 场景 {index+1} ({sentiment or '默认'}) 生成中...")
+    print(f"[FLUX] Prompt: {final_prompt[:100]}...")
+    
+    # 调用 Replicate FLUX 模型
+    model_id = "black-forest-labs/flux-schnell" if use_schnell else "black-forest-labs/flux-dev"
+    
+    input_params = {
+        "prompt": final_prompt,
+        "aspect_ratio": "3:4",  # 小红书竖图
+        "output_format": "webp",
+        "output_quality": 90,
+    }
+    
+    # flux-dev 支持 go_fast 参数
+    if not use_schnell:
+        input_params["go_fast"] = True
+    
+    return model_id, input_params
+
+
+def _parse_flux_output(output) -> str:
+    """
+    解析 FLUX 输出（FileOutput 对象或 URL）
+    
+    Raises:
+        ValueError: 未返回图片或无法解析
+    """
+    if not output:
+        raise ValueError("FLUX 未返回图片")
+    
+    if hasattr(output, 'url'):
+        return output.url
+    if isinstance(output, str):
+        return output
+    if isinstance(output, list) and len(output) > 0:
+        first_item = output[0]
+        return first_item.url if hasattr(first_item, 'url') else str(first_item)
+    raise ValueError(f"无法解析 FLUX 返回: {type(output)}")
+
+
 def _generate_single_flux(
     scene: dict, 
     index: int, 
@@ -67,71 +531,44 @@ def _generate_single_flux(
     output_dir = output_dir or DEFAULT_OUTPUT_DIR
     
     try:
-        base_prompt = scene.get('prompt', '')
-        if not base_prompt:
-            return None, "prompt 为空"
-        
-        # 获取风格修饰符
-        sentiment = scene.get('sentiment', '')
-        style_modifier = FLUX_STYLES.get(sentiment, FLUX_BASE_STYLE)
-        
-        # 组装最终 prompt
-        final_prompt = f"{base_prompt}, {style_modifier}"
-        
-        model_name = "flux-schnell" if use_schnell else "flux-dev"
-        print(f"[FLUX {model_name}] 场景 {index+1} ({sentiment or '默认'}) 生成中...")
-        print(f"[FLUX] Prompt: {final_prompt[:100]}...")
-        
-        # 调用 Replicate FLUX 模型
-        model_id = "black-forest-labs/flux-schnell" if use_schnell else "black-forest-labs/flux-dev"
-        
-        input_params = {
-            "prompt": final_prompt,
-            "aspect_ratio": "3:4",  # 小红书竖图
-            "output_format": "webp",
-            "output_quality": 90,
-        }
+        model_id, input_params = _flux_input(scene, index, use_schnell)
+        output = _run_prediction(_get_replicate_client(), model_id, input_params, f"Replicate 场景 {index+1}")
+        image_url = _parse_flux_output(output)
         
-        # flux-dev 支持 go_fast 参数
-        if not use_schnell:
-            input_params["go_fast"] = True
+        filename = _scene_filename(topic, index, "webp")
         
-        output = replicate.run(model_id, input=input_params)
+        # 下载图片 + 上传到 OSS（按主题分类）
+        result = _save_image(image_url, str(output_dir / filename), topic, filename)
         
-        # 处理输出（FileOutput 对象或 URL）
-        if not output:
-            return None, "FLUX 未返回图片"
+        print(f"[FLUX] 场景 {index+1} 完成: {result}")
+        return result, None
         
-        if hasattr(output, 'url'):
-            image_url = output.url
-        elif isinstance(output, str):
-            image_url = output
-        elif isinstance(output, list) and len(output) > 0:
-            first_item = output[0]
-            image_url = first_item.url if hasattr(first_item, 'url') else str(first_item)
-        else:
-            return None, f"无法解析 FLUX 返回: {type(output)}"
-        
-        # 下载图片
-        resp = requests.get(image_url, timeout=60)
-        resp.raise_for_status()
-        image_data = resp.content
-        
-        # 文件命名
-        safe_topic = sanitize_filename(topic) if topic else ""
-        filename = f"{safe_topic}_scene_{index+1:02d}.webp" if safe_topic else f"scene_{index+1:02d}.webp"
-        local_path = str(output_dir / filename)
-        
-        with open(local_path, "wb") as f:
-            f.write(image_data)
+    except Exception as e:
+        error_msg = str(e)
+        print(f"[FLUX Error] 场景 {index+1} 失败: {error_msg}")
+        return None, error_msg
+
+
+async def _generate_single_flux_async(
+    replicate_client: replicate.Client,
+    http_client: httpx.AsyncClient,
+    scene: dict,
+    index: int,
+    output_dir: Path,
+    topic: str = None,
+    use_schnell: bool = False
+) -> Tuple[Optional[str], Optional[str]]:
+    """_generate_single_flux 的异步版本（Replicate 异步预测 + httpx 异步下载）"""
+    try:
+        model_id, input_params = _flux_input(scene, index, use_schnell)
+        output = await _run_prediction_async(replicate_client, model_id, input_params, f"Replicate 场景 {index+1}")
+        image_url = _parse_flux_output(output)
         
-        # 上传到 OSS（按主题分类）
-        oss_url = None
-        if topic:
-            oss_url = upload_to_oss_by_topic(image_data, topic, filename, "images")
+        filename = _scene_filename(topic, index, "webp")
+        result = await _save_image_async(http_client, image_url, str(output_dir / filename), topic, filename)
         
-        print(f"[FLUX] 场景 {index+1} 完成: {local_path}")
-        return oss_url or local_path, None
+        print(f"[FLUX] 场景 {index+1} 完成: {result}")
+        return result, None
         
     except Exception as e:
         error_msg = str(e)
@@ -141,6 +578,18 @@ def _generate_single_flux(
 
 # ========== 火山引擎豆包（备用） ==========
 
+def _volcengine_image_url(prompt: str) -> str:
+    """调用方舟生图接口，返回图片 URL（同步阻塞）"""
+    response = _get_ark_client().images.generate(
+        model="doubao-seedream-4-0-250828",
+        prompt=prompt,
+        size="1024x1344",
+        response_format="url",
+        extra_body={"watermark": False},
+    )
+    return response.data[0].url
+
+
 def _generate_single_volcengine(
     scene: dict, 
     index: int, 
@@ -150,8 +599,6 @@ def _generate_single_volcengine(
     """
     使用火山引擎豆包生成单张图片（中文 Prompt 备用方案）
     """
-    from openai import OpenAI
-    
     output_dir = output_dir or DEFAULT_OUTPUT_DIR
     
     try:
@@ -166,38 +613,50 @@ def _generate_single_volcengine(
         sentiment = scene.get('sentiment', '默认')
         print(f"[Volcengine] 场景 {index+1} ({sentiment}) 生成中...")
         
-        client = OpenAI(
-            base_url="https://ark.cn-beijing.volces.com/api/v3",
-            api_key=ark_api_key,
-        )
+        image_url = _volcengine_image_url(base_prompt)
         
-        response = client.images.generate(
-            model="doubao-seedream-4-0-250828",
-            prompt=base_prompt,
-            size="1024x1344",
-            response_format="url",
-            extra_body={"watermark": False},
-        )
+        filename = _scene_filename(topic, index, "png")
+        result = _save_image(image_url, str(output_dir / filename), topic, filename)
         
-        image_url = response.data[0].url
+        print(f"[Volcengine] 场景 {index+1} 完成: {result}")
+        return result, None
         
-        resp = requests.get(image_url, timeout=60)
-        resp.raise_for_status()
-        image_data = resp.content
+    except Exception as e:
+        error_msg = str(e)
+        print(f"[Volcengine Error] 场景 {index+1} 失败: {error_msg}")
+        return None, error_msg
+
+
+async def _generate_single_volcengine_async(
+    http_client: httpx.AsyncClient,
+    scene: dict,
+    index: int,
+    output_dir: Path,
+    topic: str = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    _generate_single_volcengine 的异步版本
+    
+    方舟 SDK 为同步客户端，只把生图请求放到线程池；下载与 FLUX 共用批次的 httpx 异步连接池
+    """
+    try:
+        if not os.getenv("ARK_API_KEY"):
+            return None, "缺少 ARK_API_KEY"
+        
+        base_prompt = scene.get('prompt', '')
+        if not base_prompt:
+            return None, "prompt 为空"
         
-        safe_topic = sanitize_filename(topic) if topic else ""
-        filename = f"{safe_topic}_scene_{index+1:02d}.png" if safe_topic else f"scene_{index+1:02d}.png"
-        local_path = str(output_dir / filename)
+        sentiment = scene.get('sentiment', '默认')
+        print(f"[Volcengine] 场景 {index+1} ({sentiment}) 生成中...")
         
-        with open(local_path, "wb") as f:
-            f.write(image_data)
+        image_url = await asyncio.to_thread(_volcengine_image_url, base_prompt)
         
-        oss_url = None
-        if topic:
-            oss_url = upload_to_oss_by_topic(image_data, topic, filename, "images")
+        filename = _scene_filename(topic, index, "png")
+        result = await _save_image_async(http_client, image_url, str(output_dir / filename), topic, filename)
         
-        print(f"[Volcengine] 场景 {index+1} 完成: {local_path}")
-        return oss_url or local_path, None
+        print(f"[Volcengine] 场景 {index+1} 完成: {result}")
+        return result, None
         
     except Exception as e:
         error_msg = str(e)
@@ -207,14 +666,17 @@ def _generate_single_volcengine(
 
 # ========== 统一入口 ==========
 
-def generate_images(
+async def generate_images_async(
     scenes: list, 
     provider: str = "replicate", 
     topic: str = None,
     use_schnell: bool = False
 ) -> list:
     """
-    统一生图入口（并发版本）
+    统一生图入口（异步并发版本）
+    
+    生图全程是网络等待（Replicate 推理 + CDN 下载 + OSS 上传），
+    用协程并发代替线程池，同一批次共享一个 httpx 异步连接池
     
     Args:
         scenes: 分镜列表，每个元素需包含 'prompt' 字段，可选 'sentiment'
@@ -235,37 +697,55 @@ def generate_images(
     else:
         output_dir = DEFAULT_OUTPUT_DIR
     
-    print(f"[Painter] 开始并发生成 {len(scenes)} 张图片 (max_workers={MAX_WORKERS})...")
+    if provider not in ("replicate", "volcengine"):
+        print(f"[Painter Error] 未知的 provider: {provider}，回退到 FLUX")
+        provider = "replicate"
     
-    def _generate_one(args):
-        """单张图片生成（带索引）"""
-        index, scene = args
-        try:
-            if provider == "replicate":
-                return index, _generate_single_flux(scene, index, output_dir, topic, use_schnell)[0]
-            elif provider == "volcengine":
-                return index, _generate_single_volcengine(scene, index, output_dir, topic)[0]
-            else:
-                print(f"[Painter Error] 未知的 provider: {provider}，回退到 FLUX")
-                return index, _generate_single_flux(scene, index, output_dir, topic, use_schnell)[0]
-        except Exception as e:
-            print(f"[Painter Error] 场景 {index+1} 异常: {e}")
-            return index, None
+    print(f"[Painter] 开始并发生成 {len(scenes)} 张图片 (max_concurrency={ASYNC_MAX_CONCURRENCY})...")
     
-    # 使用 ThreadPoolExecutor 并发执行
-    results = [None] * len(scenes)
+    semaphore = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
     
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(_generate_one, (i, scene)): i for i, scene in enumerate(scenes)}
+    # 异步客户端绑定当前事件循环，每个批次单独创建（批次内的所有图片共享）
+    async with httpx.AsyncClient(
+        http2=_HTTP2_AVAILABLE,
+        limits=httpx.Limits(max_connections=32),
+        timeout=httpx.Timeout(DOWNLOAD_TIMEOUT[1], connect=DOWNLOAD_TIMEOUT[0]),
+        follow_redirects=True,
+    ) as http_client:
+        replicate_client = replicate.Client(api_token=os.getenv("REPLICATE_API_TOKEN"))
         
-        for future in as_completed(futures):
-            try:
-                index, path = future.result()
-                results[index] = path
-            except Exception as e:
-                index = futures[future]
-                print(f"[Painter Error] 场景 {index+1} Future 异常: {e}")
-                results[index] = None
+        async def _one(index: int, scene: dict) -> Optional[str]:
+            async with semaphore:
+                cache_key = None
+                if IMAGE_CACHE_ENABLED:
+                    cache_key = media_cache.make_key(**image_cache_params(scene, provider, use_schnell, topic))
+                    cached = await _lookup_cached_image(http_client, cache_key)
+                    if cached:
+                        print(f"[Painter] 场景 {index+1} 命中素材缓存: {cached}")
+                        return cached
+                
+                if provider == "volcengine":
+                    path, _ = await _generate_single_volcengine_async(http_client, scene, index, output_dir, topic)
+                else:
+                    path, _ = await _generate_single_flux_async(
+                        replicate_client, http_client, scene, index, output_dir, topic, use_schnell
+                    )
+                
+                if cache_key and path:
+                    await asyncio.to_thread(media_cache.store, "images", cache_key, path)
+                return path
+        
+        raw_results = await asyncio.gather(
+            *[_one(i, scene) for i, scene in enumerate(scenes)],
+            return_exceptions=True
+        )
+    
+    results = []
+    for i, result in enumerate(raw_results):
+        if isinstance(result, Exception):
+            print(f"[Painter Error] 场景 {i+1} 异常: {result}")
+            result = None
+        results.append(result)
     
     success_count = sum(1 for p in results if p is not None)
     print(f"[Painter] 并发生成完成: {success_count}/{len(scenes)} 成功")
@@ -273,6 +753,23 @@ def generate_images(
     return results
 
 
+def generate_images(
+    scenes: list, 
+    provider: str = "replicate", 
+    topic: str = None,
+    use_schnell: bool = False
+) -> list:
+    """
+    统一生图入口（同步调用，兼容旧接口，内部运行 generate_images_async）
+    
+    Returns:
+        图片路径列表（顺序与 scenes 一致，失败项为 None）
+    """
+    if not scenes:
+        return []
+    return asyncio.run(generate_images_async(scenes, provider, topic, use_schnell))
+
+
 def generate_diagrams(diagrams: list, topic: str = None) -> list:
     """
     公众号专用：生成架构图/示意图
@@ -3,14 +3,39 @@
 """
 import os
 import json
+import threading
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
 
 DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'personas.json')
 
+# 人设库缓存：(文件修改时间, 解析结果)，personas.json 被修改后自动重新加载
+_cache: Optional[Tuple[float, Mapping]] = None
+_cache_lock = threading.Lock()
 
-def load_personas() -> dict:
-    """加载人设库"""
-    with open(DATA_PATH, 'r', encoding='utf-8') as f:
-        return json.load(f)
+
+def _freeze(personas: dict) -> Mapping:
+    """转为只读结构：缓存结果在所有调用方之间共享，不能被任何一方修改"""
+    return MappingProxyType({
+        category: tuple(MappingProxyType(p) for p in items)
+        for category, items in personas.items()
+    })
+
+
+def load_personas() -> Mapping:
+    """
+    加载人设库（文件未修改时直接返回内存中的结果）
+    
+    Returns:
+        只读映射 {分类: (人设, ...)}，每个人设也是只读映射
+    """
+    global _cache
+    mtime = os.path.getmtime(DATA_PATH)
+    with _cache_lock:
+        if _cache is None or _cache[0] != mtime:
+            with open(DATA_PATH, 'r', encoding='utf-8') as f:
+                _cache = (mtime, _freeze(json.load(f)))
+        return _cache[1]
 
 
 def get_categories() -> list:
@@ -19,10 +44,10 @@ def get_categories() -> list:
     return list(personas.keys())
 
 
-def get_personas_by_category(category: str) -> list:
-    """获取指定分类下的所有人设"""
+def get_personas_by_category(category: str) -> tuple:
+    """获取指定分类下的所有人设（只读）"""
     personas = load_personas()
-    return personas.get(category, [])
+    return personas.get(category, ())
 
 
 def get_persona_prompt(category: str, name: str) -> str:
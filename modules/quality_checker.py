@@ -4,6 +4,12 @@
 """
 import re
 
+# 可选依赖：安装 pyahocorasick 后情绪词计数改用 Aho-Corasick 自动机
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 
 # AI 套话黑名单
 AI_CLICHES = [
@@ -20,18 +26,74 @@ EMOTION_WORDS = [
     "！", "？", "🔥", "💯", "✨", "❤️", "😭", "🥺"
 ]
 
+# 预编译各检测项的正则。每个模式单独计数：不能合并为一个交替正则，
+# 否则「首先.*?其次.*?最后」这类懒惰匹配会吞掉区间内其他模式的匹配，改变评分
+_AI_CLICHE_RES = [re.compile(p) for p in AI_CLICHES]
+
+# 个人经历标记（"我"、"我朋友"、"我同事"等）
+_PERSONAL_RES = [re.compile(p) for p in (
+    r'我[的是有在]', r'我朋友', r'我同事', r'我见过',
+    r'上次.*?时', r'那天', r'当时',
+)]
+
+_NUMBER_RE = re.compile(r'\d+\.?\d*[万千百十]?[年月日天小时分钟秒次个人块元]|\d+%')
+
+
+def _build_emotion_automaton():
+    """构建情绪词 Aho-Corasick 自动机（未安装 pyahocorasick 时返回 None）"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for word in EMOTION_WORDS:
+        automaton.add_word(word, word)
+    automaton.make_automaton()
+    return automaton
+
+
+_EMOTION_AC = _build_emotion_automaton()
+
 
-def check_content_quality(content: str) -> dict:
+def _count_emotion_words_ac(content: str, automaton) -> int:
+    """
+    用 Aho-Corasick 自动机一次扫描统计情绪词
+
+    自动机会报告所有重叠匹配；同一个词只计不重叠的出现（与 str.count 一致），
+    不同词之间各自计数，保证结果与逐词 str.count 相同
+    """
+    count = 0
+    next_start = {}  # 每个词下一次允许计数的起始位置
+    for end, word in automaton.iter(content):
+        start = end - len(word) + 1
+        if start >= next_start.get(word, 0):
+            count += 1
+            next_start[word] = end + 1
+    return count
+
+
+def _count_emotion_words(content: str) -> int:
+    """统计情绪词出现次数：有自动机时一次扫描匹配全部词，否则逐词 str.count"""
+    if _EMOTION_AC is not None:
+        return _count_emotion_words_ac(content, _EMOTION_AC)
+    return sum(content.count(word) for word in EMOTION_WORDS)
+
+
+# 合格分数线
+PASS_SCORE = 70
+
+
+def check_content_quality(content: str, fast: bool = False) -> dict:
     """
     检测文案质量，返回评分和问题诊断
     
     Args:
         content: 待检测的文案内容
+        fast: True 时先做最便宜的字数和套话检测，已确定不合格就直接返回
+              （details 只包含已检测的项），适合只关心 is_acceptable 的调用方
     
     Returns:
         {
             "score": 0-100,
-            "is_acceptable": bool,  # 分数 >= 70 为合格
+            "is_acceptable": bool,  # 分数 >= PASS_SCORE 为合格
             "issues": ["过于AI", "缺乏具体案例"],
             "suggestions": ["增加个人经历", "添加具体数字"],
             "details": {
@@ -47,20 +109,28 @@ def check_content_quality(content: str) -> dict:
     suggestions = []
     
     # 1. 检测 AI 套话（每出现一次扣 10 分）
-    ai_cliche_count = 0
-    for cliche in AI_CLICHES:
-        matches = re.findall(cliche, content)
-        ai_cliche_count += len(matches)
+    ai_cliche_count = sum(len(p.findall(content)) for p in _AI_CLICHE_RES)
     
     if ai_cliche_count > 0:
         score -= min(ai_cliche_count * 10, 40)  # 最多扣 40 分
         issues.append(f"检测到 {ai_cliche_count} 处 AI 套话")
         suggestions.append("避免使用'众所周知'、'不得不说'等机械表达")
     
+    length = len(content)
+    if fast:
+        score = _check_length(length, score, issues, suggestions)
+        # 扣分只增不减，低于分数线后其余检测不会改变结论
+        if score < PASS_SCORE:
+            return {
+                "score": max(0, score),
+                "is_acceptable": False,
+                "issues": issues,
+                "suggestions": suggestions,
+                "details": {"ai_cliche_count": ai_cliche_count, "length": length},
+            }
+    
     # 2. 检测具体数字（至少应有 2 个）
-    number_pattern = r'\d+\.?\d*[万千百十]?[年月日天小时分钟秒次个人块元]|\d+%'
-    numbers = re.findall(number_pattern, content)
-    number_count = len(numbers)
+    number_count = len(_NUMBER_RE.findall(content))
     
     if number_count < 2:
         score -= 15
@@ -68,11 +138,7 @@ def check_content_quality(content: str) -> dict:
         suggestions.append("增加具体数字：如'涨粉 3000'、'连续 15 天'等")
     
     # 3. 检测个人经历标记（"我"、"我朋友"、"我同事"等）
-    personal_patterns = [
-        r'我[的是有在]', r'我朋友', r'我同事', r'我见过',
-        r'上次.*?时', r'那天', r'当时',
-    ]
-    personal_count = sum(len(re.findall(p, content)) for p in personal_patterns)
+    personal_count = sum(len(p.findall(content)) for p in _PERSONAL_RES)
     
     if personal_count < 1:
         score -= 15
@@ -80,7 +146,7 @@ def check_content_quality(content: str) -> dict:
         suggestions.append("加入个人故事：'我有个朋友...'、'上次我...'")
     
     # 4. 检测强情绪表达（至少 3 处）
-    emotion_count = sum(content.count(word) for word in EMOTION_WORDS)
+    emotion_count = _count_emotion_words(content)
     
     if emotion_count < 3:
         score -= 10
@@ -88,25 +154,23 @@ def check_content_quality(content: str) -> dict:
         suggestions.append("增加强情绪词：'绝了'、'太爱了'、感叹号、emoji 等")
     
     # 5. 检测反问句（至少 1 处）
-    question_count = content.count("？") + content.count("吗？") + content.count("呢？")
+    # "吗？"、"呢？" 都以问号结尾，只数问号（全角 + 半角）即可，避免重复计数
+    question_count = content.count("？") + content.count("?")
     if question_count < 1:
         score -= 10
         issues.append("缺乏互动性反问")
         suggestions.append("加入反问句：'你知道为什么吗？'、'是不是很离谱？'")
     
-    # 6. 检测字数（图文模式要求 800+ 字）
-    length = len(content)
-    if length < 800:
-        score -= 20
-        issues.append(f"字数不足（仅 {length} 字，要求 800+ 字）")
-        suggestions.append("深化内容：每个要点展开至少 150-200 字")
+    # 6. 检测字数（快速模式下已提前检测）
+    if not fast:
+        score = _check_length(length, score, issues, suggestions)
     
     # 确保分数在 0-100 范围内
     score = max(0, min(100, score))
     
     return {
         "score": score,
-        "is_acceptable": score >= 70,
+        "is_acceptable": score >= PASS_SCORE,
         "issues": issues,
         "suggestions": suggestions,
         "details": {
@@ -120,6 +184,15 @@ def check_content_quality(content: str) -> dict:
     }
 
 
+def _check_length(length: int, score: int, issues: list, suggestions: list) -> int:
+    """检测字数（图文模式要求 800+ 字），返回扣分后的分数"""
+    if length < 800:
+        score -= 20
+        issues.append(f"字数不足（仅 {length} 字，要求 800+ 字）")
+        suggestions.append("深化内容：每个要点展开至少 150-200 字")
+    return score
+
+
 def format_quality_report(quality: dict) -> str:
     """格式化质量报告为可读文本"""
     report = f"【质量评分】{quality['score']}/100\n"
@@ -0,0 +1,94 @@
+"""
+语义缓存模块
+同一请求的不同写法（如「爆款选题 A」与「A 选题，爆款」）直接复用最近一次的生成结果
+
+只在归一化后的文本完全相同时命中：大小写、全半角、标点、空白和词序不影响结果。
+不做相似度匹配——中文选题没有空格分词，「学习英语」和「学习日语」这类只差一个关键词的
+选题字符重合度极高，按相似度命中会把别的选题的笔记返回给用户。
+"""
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Optional
+
+# 缓存有效期（秒）
+CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+# 最多保留的条目数（超出后淘汰最久未使用的）
+MAX_ENTRIES = 256
+
+# 分词：按空白和标点切分（NFKC 之后全角标点已转为半角）
+_SPLIT_RE = re.compile(r"[\W_]+")
+
+
+def _normalize(text: str) -> str:
+    """
+    将文本归一化为缓存键
+
+    NFKC（全角转半角）+ 小写 + 按空白/标点切词 + 词排序，
+    只消除写法差异，不改变文本包含的字词
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        归一化后的文本，无有效字符时返回空字符串
+    """
+    tokens = _SPLIT_RE.split(unicodedata.normalize("NFKC", text).lower())
+    return " ".join(sorted(t for t in tokens if t))
+
+
+class SemanticCache:
+    """带 TTL 的有界缓存，按归一化文本精确匹配（线程安全）"""
+
+    def __init__(self, ttl: int = CACHE_TTL, max_entries: int = MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # (namespace, 归一化文本) -> (value, timestamp)
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, text: str) -> Optional[Any]:
+        """
+        查找同一请求的缓存结果
+
+        Args:
+            namespace: 命名空间（只在相同命名空间内匹配，如 mode + 模型 + 人设）
+            text: 用于匹配的文本（如选题）
+
+        Returns:
+            命中时返回缓存值，否则返回 None
+        """
+        key = (namespace, _normalize(text))
+        if not key[1]:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, ts = entry
+            if time.time() - ts > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+
+        print(f"[Semantic Cache Hit] {text}")
+        return value
+
+    def set(self, namespace: str, text: str, value: Any):
+        """写入缓存"""
+        key = (namespace, _normalize(text))
+        if not key[1]:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
@@ -3,6 +3,7 @@
 支持按主题分类存储图片、音频、视频
 """
 import os
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
 import oss2
@@ -16,20 +17,28 @@ OSS_ENDPOINT = os.getenv("OSS_ENDPOINT")
 OSS_BUCKET_NAME = os.getenv("OSS_BUCKET_NAME")
 OSS_URL_PREFIX = os.getenv("OSS_URL_PREFIX")
 
-# 懒加载 bucket 对象
+# 本地文件超过该大小时改用分片并发上传（视频、长音频），小文件仍走单次 PUT
+MULTIPART_THRESHOLD = 2 * 1024 * 1024
+MULTIPART_PART_SIZE = 1024 * 1024
+MULTIPART_THREADS = 4
+
+# 懒加载 bucket 对象（进程内只创建一次，其内部 oss2.Session 的连接池随之复用）
 _bucket = None
+_bucket_lock = threading.Lock()
 
 
 def _get_bucket():
-    """懒加载获取 OSS bucket"""
+    """懒加载获取 OSS bucket（线程安全，多线程并发上传时也不会重复创建）"""
     global _bucket
     if _bucket is None:
-        try:
-            auth = oss2.Auth(OSS_ACCESS_KEY_ID, OSS_ACCESS_KEY_SECRET)
-            _bucket = oss2.Bucket(auth, OSS_ENDPOINT, OSS_BUCKET_NAME)
-        except Exception as e:
-            print(f"[OSS Error] 初始化失败: {e}")
-            return None
+        with _bucket_lock:
+            if _bucket is None:
+                try:
+                    auth = oss2.Auth(OSS_ACCESS_KEY_ID, OSS_ACCESS_KEY_SECRET)
+                    _bucket = oss2.Bucket(auth, OSS_ENDPOINT, OSS_BUCKET_NAME, session=oss2.Session())
+                except Exception as e:
+                    print(f"[OSS Error] 初始化失败: {e}")
+                    return None
     return _bucket
 
 
@@ -63,6 +72,11 @@ def upload_to_oss(image_data: bytes, filename: str) -> str:
         return None
 
 
+def _topic_key(topic: str, filename: str, file_type: str) -> str:
+    """按主题生成 OSS 对象路径: {topic}/{file_type}/{filename}"""
+    return f"{_sanitize_topic(topic)}/{file_type}/{filename}"
+
+
 def upload_to_oss_by_topic(data: bytes, topic: str, filename: str, file_type: str = "images") -> str:
     """
     按主题上传文件到 OSS
@@ -84,8 +98,7 @@ def upload_to_oss_by_topic(data: bytes, topic: str, filename: str, file_type: st
         if bucket is None:
             return None
         
-        safe_topic = _sanitize_topic(topic)
-        oss_key = f"{safe_topic}/{file_type}/{filename}"
+        oss_key = _topic_key(topic, filename, file_type)
         
         bucket.put_object(oss_key, data)
         oss_url = f"{OSS_URL_PREFIX}/{oss_key}"
@@ -99,7 +112,8 @@ def upload_to_oss_by_topic(data: bytes, topic: str, filename: str, file_type: st
 
 def upload_file_to_oss_by_topic(local_path: str, topic: str, file_type: str = "images") -> str:
     """
-    按主题上传本地文件到 OSS
+    按主题上传本地文件到 OSS（SDK 直接从文件分块读取上传，不把整个文件读入内存；
+    大文件分片并发上传，中断后可断点续传）
     
     Args:
         local_path: 本地文件路径
@@ -115,13 +129,22 @@ def upload_file_to_oss_by_topic(local_path: str, topic: str, file_type: str = "i
             print(f"[OSS Error] 本地文件不存在: {local_path}")
             return None
         
-        with open(local_file, "rb") as f:
-            data = f.read()
+        bucket = _get_bucket()
+        if bucket is None:
+            return None
         
-        return upload_to_oss_by_topic(data, topic, local_file.name, file_type)
+        oss_key = _topic_key(topic, local_file.name, file_type)
+        oss2.resumable_upload(
+            bucket, oss_key, str(local_file),
+            multipart_threshold=MULTIPART_THRESHOLD,
+            part_size=MULTIPART_PART_SIZE,
+            num_threads=MULTIPART_THREADS,
+        )
+        print(f"[OSS] 上传成功: {oss_key}")
+        return f"{OSS_URL_PREFIX}/{oss_key}"
         
     except Exception as e:
-        print(f"[OSS Error] 读取文件失败: {e}")
+        print(f"[OSS Error] 上传失败: {e}")
         return None
 
 
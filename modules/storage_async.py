@@ -0,0 +1,96 @@
+"""
+OSS 后台上传模块
+生成流程把上传任务交给后台线程，本地文件写完即可继续下一个分镜，
+需要 OSS URL 时再等待对应的 Future
+"""
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Optional
+
+from modules.storage import upload_file_to_oss_by_topic
+
+# 后台上传线程数：一批分镜的上传可同时进行，不再逐个排队
+OSS_UPLOAD_WORKERS = int(os.getenv("OSS_UPLOAD_WORKERS", "8"))
+
+
+class AsyncOssWriter:
+    """后台 OSS 上传队列（线程安全）"""
+
+    def __init__(self, workers: int = OSS_UPLOAD_WORKERS):
+        self._workers = workers
+        self._queue: queue.Queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self._workers):
+                thread = threading.Thread(target=self._run, name=f"oss-writer-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                local_path, topic, file_type, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(upload_file_to_oss_by_topic(local_path, topic, file_type))
+                except Exception as e:
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, local_path: str, topic: str, file_type: str = "images") -> Future:
+        """
+        提交上传任务（立即返回）
+
+        Args:
+            local_path: 本地文件路径
+            topic: 主题名称
+            file_type: 文件类型目录 (images/audio/video)
+
+        Returns:
+            Future，结果为 OSS URL（上传失败时为 None）
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((local_path, topic, file_type, future))
+        return future
+
+    def flush(self):
+        """阻塞等待队列中已提交的上传全部完成"""
+        self._queue.join()
+
+    def close(self):
+        """处理完已提交的任务后停止后台线程"""
+        with self._lock:
+            for _ in self._threads:
+                self._queue.put(None)
+            for thread in self._threads:
+                thread.join()
+            self._threads = []
+
+
+_writer: Optional[AsyncOssWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_oss_writer() -> AsyncOssWriter:
+    """获取全局后台上传队列（懒加载）"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AsyncOssWriter()
+    return _writer
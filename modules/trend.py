@@ -144,13 +144,10 @@ def _fallback_analyze(niche: str) -> tuple[list, str]:
     降级方案：不使用联网搜索，直接让模型生成选题（使用 OpenRouter，更快）
     """
     try:
-        from openai import OpenAI
+        from modules.writer import get_openrouter_client
         
-        # 使用 OpenRouter（速度快）
-        client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=os.getenv("OPENROUTER_API_KEY"),
-        )
+        # 使用 OpenRouter（速度快），复用 writer 的共享连接池
+        client = get_openrouter_client()
         
         response = client.chat.completions.create(
             model="deepseek/deepseek-chat",  # 快速且便宜
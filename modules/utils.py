@@ -7,7 +7,7 @@ import json
 import traceback
 from pathlib import Path
 from typing import Any, Callable, Optional
-from functools import wraps
+from functools import lru_cache, wraps
 
 # 缓存目录
 CACHE_DIR = Path("output/.cache")
@@ -16,10 +16,17 @@ CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 # ========== 文件命名工具 ==========
 
+# Windows 非法字符: \ / : * ? " < > |，加上空白字符
+_ILLEGAL_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|\s\n\r\t]+')
+
+
+@lru_cache(maxsize=1024)
 def sanitize_filename(name: str, max_length: int = 50) -> str:
     """
     清理文件名中的非法字符，生成安全的文件名
     
+    同一主题在批量生成时会对每个分镜重复调用，结果按参数缓存
+    
     Args:
         name: 原始名称（如主题）
         max_length: 最大长度
@@ -31,10 +38,7 @@ def sanitize_filename(name: str, max_length: int = 50) -> str:
         return "untitled"
     
     # 替换非法字符为下划线
-    # Windows 非法字符: \ / : * ? " < > |
-    # 加上空格和一些特殊符号
-    illegal_chars = r'[\\/:*?"<>|\s\n\r\t]+'
-    safe_name = re.sub(illegal_chars, '_', name)
+    safe_name = _ILLEGAL_FILENAME_CHARS.sub('_', name)
     
     # 移除开头和结尾的下划线
     safe_name = safe_name.strip('_')
@@ -4,7 +4,9 @@
 import os
 import json
 import re
+from functools import lru_cache
 from pathlib import Path
+import httpx
 from dotenv import load_dotenv
 from openai import OpenAI
 from typing import List, Dict, Any, Optional
@@ -19,8 +21,13 @@ load_dotenv(_project_root / ".env")
 # OpenRouter 客户端（延迟初始化）
 _client = None
 
+# 连接池配置：整个进程共享一个连接池，复用 keep-alive 连接，避免每次请求重新握手 TLS
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+HTTP_TIMEOUT = httpx.Timeout(600.0, connect=5.0)
+
+
 def get_openrouter_client():
-    """延迟初始化 OpenRouter 客户端"""
+    """延迟初始化 OpenRouter 客户端（进程内单例，共享连接池）"""
     global _client
     if _client is None:
         api_key = os.getenv("OPENROUTER_API_KEY")
@@ -29,10 +36,19 @@ def get_openrouter_client():
         _client = OpenAI(
             base_url="https://openrouter.ai/api/v1",
             api_key=api_key,
+            http_client=httpx.Client(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT),
         )
     return _client
 
 
+def close_openrouter_client():
+    """关闭 OpenRouter 客户端并释放连接池（应用退出时调用）"""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
 def _fix_json_newlines(text: str) -> str:
     """修复 JSON 字符串值中的裸换行符（简化版，双引号由 Prompt 控制）"""
     result = []
@@ -55,16 +71,73 @@ def _fix_json_newlines(text: str) -> str:
     return ''.join(result)
 
 
-def _call_llm_and_parse(system_prompt: str, user_content: str, topic: str, persona: str, model_name: str = "deepseek/deepseek-chat", temperature: float = 0.8, log_result: bool = True) -> dict:
-    """内部函数：调用 LLM 并解析 JSON 响应"""
+def _format_search_context(search_data: dict, topic: str, outline_label: Optional[str] = None) -> str:
+    """
+    将 websearch 热点数据格式化为独立的上下文消息
+    
+    字段顺序固定，同一热点总是生成逐字节相同的文本。
+    
+    Args:
+        search_data: websearch 返回的热点数据
+        topic: 选题（热点数据缺少标题时使用）
+        outline_label: 原始大纲的标签，为 None 时不附带大纲
+    """
+    search_data = search_data or {}
+    lines = [
+        "【热点上下文】",
+        f"- 来源平台：{search_data.get('source', '未知来源')}",
+        f"- 原始标题：{search_data.get('title', topic)}",
+        f"- 火爆原因：{search_data.get('why_hot', '')}",
+        f"- 核心摘要：{search_data.get('summary', '')}",
+    ]
+    raw_outline = search_data.get('outline', [])
+    if outline_label and raw_outline:
+        lines.append(f"- {outline_label}：")
+        lines.append(json.dumps(raw_outline, indent=2, ensure_ascii=False, sort_keys=True))
+    return "\n".join(lines)
+
+
+def _build_messages(system_prompt: str, user_content: str, model_name: str, context: Optional[str] = None) -> list:
+    """
+    组装对话消息，保证静态前缀在前、动态内容在后，以命中服务商的 Prompt 缓存
+    
+    system_prompt 只包含静态内容（角色、人设、规则、范文），选题/热点/参考内容等
+    动态信息全部放在 user 消息中。热点数据（context）单独作为一条 user 消息放在
+    任务指令之前，只有消息尾部随请求变化。Anthropic 模型需要显式的 cache_control 断点，
+    OpenAI / DeepSeek 等会自动缓存相同前缀。
+    """
+    if model_name.startswith("anthropic/"):
+        system_message = {
+            "role": "system",
+            "content": [
+                {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}
+            ],
+        }
+    else:
+        system_message = {"role": "system", "content": system_prompt}
+    
+    messages = [system_message]
+    if context:
+        messages.append({"role": "user", "content": context})
+    messages.append({"role": "user", "content": user_content})
+    return messages
+
+
+def _call_llm_and_parse(system_prompt: str, user_content: str, topic: str, persona: str, model_name: str = "deepseek/deepseek-chat", temperature: float = 0.8, log_result: bool = True, json_mode: bool = False, context: Optional[str] = None) -> dict:
+    """
+    内部函数：调用 LLM 并解析 JSON 响应
+    
+    context 为可选的热点上下文，作为独立 user 消息发送（见 _build_messages）；
+    json_mode=True 时要求模型以 JSON 对象输出（response_format），减少因格式错误导致的重试；
+    仅用于输出结构固定的步骤（如配图设计）
+    """
+    extra_params = {"response_format": {"type": "json_object"}} if json_mode else {}
     response = get_openrouter_client().chat.completions.create(
         model=model_name,
         max_tokens=8192,
         temperature=temperature,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_content}
-        ]
+        messages=_build_messages(system_prompt, user_content, model_name, context),
+        **extra_params
     )
     
     # 记录 API 调用
@@ -117,8 +190,9 @@ def _call_llm_and_parse(system_prompt: str, user_content: str, topic: str, perso
         raise ValueError(f"LLM 返回格式错误，请检查日志。预览: {text[:200]}")
 
 
+@lru_cache(maxsize=1)
 def load_few_shot_examples() -> str:
-    """加载 Few-Shot 范文数据"""
+    """加载 Few-Shot 范文数据（进程内只读取一次，修改范文文件后需重启）"""
     try:
         examples_path = _project_root / "data" / "examples" / "xiaohongshu_best_practices.json"
         if examples_path.exists():
@@ -151,16 +225,7 @@ def generate_outline_step(
     """
     【Step 1】生成结构化大纲和标题
     """
-    search_data = search_data or {}
-    source = search_data.get('source', '未知来源')
-    original_title = search_data.get('title', topic)
-    why_hot = search_data.get('why_hot', '')
-    summary = search_data.get('summary', '')
-    raw_outline = search_data.get('outline', [])
-    
-    outline_text = ""
-    if raw_outline and len(raw_outline) > 0:
-        outline_text = json.dumps(raw_outline, indent=2, ensure_ascii=False)
+    context = _format_search_context(search_data, topic, outline_label="原始大纲（仅供参考，需要你重新提炼）")
 
     system_prompt = f"""你是内容策划专家，擅长分析热点话题并提炼结构化大纲。
 你的任务是：基于热点数据，输出一份**逻辑清晰、角度独特**的文章大纲。
@@ -190,18 +255,10 @@ def generate_outline_step(
 
 只输出 JSON，不要其他内容。"""
 
-    user_content = f"""热门选题信息：
-- 来源平台：{source}
-- 原始标题：{original_title}
-- 火爆原因：{why_hot}
-- 核心摘要：{summary}
-- 原始大纲（仅供参考，需要你重新提炼）：
-{outline_text}
-
-请分析以上信息，输出结构化大纲和 5 个爆款标题。"""
+    user_content = "请分析以上热点信息，输出结构化大纲和 5 个爆款标题。"
 
     print("[Writer] Step 1: 生成大纲和标题...")
-    return _call_llm_and_parse(system_prompt, user_content, topic, persona, model_name, temperature, log_result=False)
+    return _call_llm_and_parse(system_prompt, user_content, topic, persona, model_name, temperature, log_result=False, context=context)
 
 
 def generate_content_step(
@@ -217,9 +274,7 @@ def generate_content_step(
     """
     【Step 2】基于大纲生成深度正文 (Few-Shot Enhanced)
     """
-    search_data = search_data or {}
-    why_hot = search_data.get('why_hot', '')
-    summary = search_data.get('summary', '')
+    context = _format_search_context(search_data, topic)
     
     outline_text = "\n".join([f"- {item}" for item in outline])
     titles_preview = titles[0] if titles else topic
@@ -296,10 +351,6 @@ B. 金句升华："（一句有力量的话，不要鸡汤）"
 
     user_content = f"""【文章标题方向】{titles_preview}
 
-【火爆原因】{why_hot}
-
-【核心摘要】{summary}
-
 【文章大纲】（必须严格遵循）
 {outline_text}
 
@@ -308,7 +359,7 @@ B. 金句升华："（一句有力量的话，不要鸡汤）"
 哪怕某个论点只有一句话，你也要通过举例、讲故事、列步骤，将其丰富成一段有血有肉的内容。"""
 
     print("[Writer] Step 2: 基于大纲生成深度正文...")
-    return _call_llm_and_parse(system_prompt, user_content, topic, persona, model_name, temperature, log_result=False)
+    return _call_llm_and_parse(system_prompt, user_content, topic, persona, model_name, temperature, log_result=False, context=context)
 
 
 def generate_visuals_step(
@@ -341,8 +392,6 @@ def generate_visuals_step(
 2. 阅读正文，提取 3-5 个**视觉化关键场景**
 3. 为每个场景设计 FLUX 优化的生图提示词
 
-{style_instruction}
-
 【配图设计原则】
 - 第一张图（Index 1）必须是最吸睛的「钩子图」，构图干净、视觉冲击力强
 - 每张图独立表达一个视觉主题，与正文段落呼应
@@ -389,6 +438,8 @@ def generate_visuals_step(
 
     user_content = f"""【文章选题】{topic}
 
+{style_instruction}
+
 【完整正文】
 {content_preview}
 
@@ -397,7 +448,8 @@ def generate_visuals_step(
 确保所有图片风格统一！"""
 
     print("[Writer] Step 3: 基于正文生成配图设计...")
-    return _call_llm_and_parse(system_prompt, user_content, topic, None, model_name, temperature, log_result=False)
+    # 所有配图在一次调用中批量生成，强制 JSON 输出避免解析失败重试
+    return _call_llm_and_parse(system_prompt, user_content, topic, None, model_name, temperature, log_result=False, json_mode=True)
 
 
 def generate_image_note(topic: str, persona: str = None, reference_text: str = None, model_name: str = "deepseek/deepseek-chat", search_data: dict = None, temperature: float = 0.8) -> dict:
@@ -409,6 +461,19 @@ def generate_image_note(topic: str, persona: str = None, reference_text: str = N
     2. generate_content_step: 基于大纲深度扩展正文（800+ 字）
     3. generate_visuals_step: 基于正文设计配图（3-5 张）
     """
+    result = {}
+    for event in iter_image_note(topic, persona, reference_text, model_name, search_data, temperature):
+        result[event["stage"]] = event["data"]
+    return result
+
+
+def iter_image_note(topic: str, persona: str = None, reference_text: str = None, model_name: str = "deepseek/deepseek-chat", search_data: dict = None, temperature: float = 0.8):
+    """
+    【图文模式】逐步生成图文笔记，每完成一步产出一个阶段事件
+    
+    Yields:
+        {"stage": "titles" | "content" | "image_designs", "data": ...}
+    """
     print(f"\n{'='*60}")
     print(f"[Writer] 🚀 图文模式 - Chain of Thought 流水线启动")
     print(f"[Writer] 选题: {topic}")
@@ -429,6 +494,7 @@ def generate_image_note(topic: str, persona: str = None, reference_text: str = N
     print(f"[Writer] ✅ Step 1 完成 - 生成 {len(titles)} 个标题, {len(outline)} 个大纲要点")
     for i, point in enumerate(outline, 1):
         print(f"         {i}. {point}")
+    yield {"stage": "titles", "data": titles}
     
     # ========== Step 2: 基于大纲生成正文 ==========
     step2_result = generate_content_step(
@@ -446,6 +512,7 @@ def generate_image_note(topic: str, persona: str = None, reference_text: str = N
     content_len = len(content)
     
     print(f"[Writer] ✅ Step 2 完成 - 正文 {content_len} 字")
+    yield {"stage": "content", "data": content}
     
     # ========== Step 3: 基于正文生成配图 ==========
     step3_result = generate_visuals_step(
@@ -458,13 +525,7 @@ def generate_image_note(topic: str, persona: str = None, reference_text: str = N
     image_designs = step3_result.get("image_designs", [])
     
     print(f"[Writer] ✅ Step 3 完成 - 生成 {len(image_designs)} 张配图设计")
-    
-    # ========== 合并最终结果 ==========
-    final_result = {
-        "titles": titles,
-        "content": content,
-        "image_designs": image_designs
-    }
+    yield {"stage": "image_designs", "data": image_designs}
     
     # 记录生成历史
     log_generation(
@@ -478,8 +539,6 @@ def generate_image_note(topic: str, persona: str = None, reference_text: str = N
     print(f"[Writer] 🎉 图文模式流水线完成")
     print(f"[Writer] 标题数: {len(titles)}, 正文字数: {content_len}, 配图数: {len(image_designs)}")
     print(f"{'='*60}\n")
-    
-    return final_result
 
 
 def generate_video_script(topic: str, persona: str = None, reference_text: str = None, model_name: str = "deepseek/deepseek-chat", temperature: float = 0.8) -> dict:
@@ -668,18 +727,8 @@ def generate_wechat_article(topic: str, persona: str = None, reference_text: str
 ---
 """
 
-    # 解析 search_data
-    search_data = search_data or {}
-    source = search_data.get('source', '未知来源')
-    original_title = search_data.get('title', topic)
-    why_hot = search_data.get('why_hot', '')
-    summary = search_data.get('summary', '')
-    outline = search_data.get('outline', [])
-    
-    # 格式化大纲
-    outline_text = ""
-    if outline and len(outline) > 0:
-        outline_text = json.dumps(outline, indent=2, ensure_ascii=False)
+    # 热点数据作为独立的上下文消息
+    context = _format_search_context(search_data, topic, outline_label="参考大纲")
 
     system_prompt = f"""你是{persona or '技术博主'}，专注于深度技术内容创作。
 你现在要为微信公众号创作一篇**深度技术长文**，字数不限，以把技术讲透为第一优先级。
@@ -755,16 +804,8 @@ def generate_wechat_article(topic: str, persona: str = None, reference_text: str
 5. JSON 字符串中必须用 \\n 表示换行，不要使用实际换行符
 6. **绝对禁止**：不要输出 ```json、```python 等代码块，直接输出纯 JSON 对象"""
 
-    user_content = f"""当前技术选题信息如下：
-- 来源平台：{source}
-- 原始标题：{original_title}
-- 火爆原因：{why_hot}
-- 核心摘要：{summary}
-- 参考大纲：
-{outline_text}
-
-{reference_section}
-请创作一篇微信公众号深度技术文章，把这个技术话题讲透彻。
+    user_content = f"""{reference_section}
+请基于以上技术选题信息，创作一篇微信公众号深度技术文章，把这个技术话题讲透彻。
 
 **重要提醒**：
 1. 直接输出 JSON 对象，不要用 ```json 包裹
@@ -772,7 +813,7 @@ def generate_wechat_article(topic: str, persona: str = None, reference_text: str
 3. 代码逻辑用文字描述即可
 4. 只输出纯 JSON，格式如：{{"titles": [...], "content": "...", "diagrams": [...]}}"""
 
-    return _call_llm_and_parse(system_prompt, user_content, topic, persona, model_name, temperature)
+    return _call_llm_and_parse(system_prompt, user_content, topic, persona, model_name, temperature, context=context)
 
 
 def generate_note_package(topic: str, persona: str = None, reference_text: str = None, mode: str = "image", model_name: str = "deepseek/deepseek-chat", search_data: dict = None, temperature: float = 0.8) -> dict:
@@ -798,6 +839,25 @@ def generate_note_package(topic: str, persona: str = None, reference_text: str =
         return generate_image_note(topic, persona, reference_text, model_name, search_data, temperature)
 
 
+def iter_note_package(topic: str, persona: str = None, reference_text: str = None, mode: str = "image", model_name: str = "deepseek/deepseek-chat", search_data: dict = None, temperature: float = 0.8):
+    """
+    逐阶段生成内容（生成器版 generate_note_package），用于流式接口
+    
+    图文模式每完成一步立即产出；视频 / 公众号模式为单次 LLM 调用，完成后依次产出各字段。
+    
+    Yields:
+        {"stage": 字段名, "data": 字段值}，字段名与 generate_note_package 返回的 key 一致
+    """
+    if mode == "image":
+        yield from iter_image_note(topic, persona, reference_text, model_name, search_data, temperature)
+        return
+    
+    result = generate_note_package(topic, persona, reference_text, mode, model_name, search_data, temperature)
+    list_key = "visual_scenes" if mode == "video" else "diagrams"
+    for key in ("titles", "content", list_key):
+        yield {"stage": key, "data": result.get(key, [] if key != "content" else "")}
+
+
 def generate_note_package_with_retry(
     topic: str,
     persona: str = None,
@@ -812,7 +872,8 @@ def generate_note_package_with_retry(
     """
     带质量检测的生成函数
     
-    如果生成的内容质量不达标，会自动重试（降低 temperature 提升稳定性）
+    如果生成的内容质量不达标，会自动重试（降低 temperature 提升稳定性）。
+    图文模式在正文生成后立即评分，不合格且还能重试时直接进入下一轮，跳过配图设计的 LLM 调用。
     
     Args:
         max_retries: 最大重试次数
@@ -822,41 +883,49 @@ def generate_note_package_with_retry(
     Returns:
         生成结果（同 generate_note_package）
     """
-    current_temp = temperature
-    
-    for attempt in range(max_retries + 1):
-        print(f"[Writer] 生成尝试 {attempt + 1}/{max_retries + 1}，temperature={current_temp:.2f}")
-        
-        result = generate_note_package(
+    # 只检测图文模式的正文质量（视频和公众号模式直接返回）
+    if mode != "image":
+        return generate_note_package(
             topic=topic,
             persona=persona,
             reference_text=reference_text,
             mode=mode,
             model_name=model_name,
             search_data=search_data,
-            temperature=current_temp
+            temperature=temperature
         )
+    
+    current_temp = temperature
+    
+    for attempt in range(max_retries + 1):
+        print(f"[Writer] 生成尝试 {attempt + 1}/{max_retries + 1}，temperature={current_temp:.2f}")
         
-        # 只检测图文模式的正文质量（视频和公众号模式跳过）
-        if mode == "image" and result.get("content"):
-            quality = check_content_quality(result["content"])
+        result = {}
+        stages = iter_image_note(topic, persona, reference_text, model_name, search_data, current_temp)
+        for event in stages:
+            result[event["stage"]] = event["data"]
+            if event["stage"] != "content" or not event["data"]:
+                continue
+            
+            quality = check_content_quality(event["data"])
             print(f"[Quality] 评分: {quality['score']}/100")
             
             if quality["is_acceptable"]:
                 print("[Quality] ✅ 质量合格")
-                return result
-            
-            if attempt < max_retries:
+            elif attempt < max_retries:
                 print(f"[Quality] ❌ 质量不达标 ({quality['score']}分 < {quality_threshold}分)")
                 print(f"[Quality] 问题: {', '.join(quality['issues'])}")
-                print(f"[Quality] 准备重试...")
-                # 降低 temperature 提升稳定性
-                current_temp = max(0.5, current_temp - 0.15)
+                print(f"[Quality] 跳过配图设计，准备重试...")
+                stages.close()
+                break
             else:
                 print(f"[Quality] ⚠️ 已达最大重试次数，返回当前结果")
                 print(format_quality_report(quality))
         else:
-            # 视频模式或无内容，直接返回
+            # 流水线完整结束（合格、已达重试上限或无正文）
             return result
+        
+        # 降低 temperature 提升稳定性
+        current_temp = max(0.5, current_temp - 0.15)
     
     return result
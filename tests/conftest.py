@@ -0,0 +1,7 @@
+"""
+pytest 配置：把项目根目录加入 Python 路径，以便 import modules
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -0,0 +1,51 @@
+"""
+文案质量检测：预编译后的计数与逐模式 re.findall / str.count 的结果一致
+"""
+import re
+
+import pytest
+
+from modules import quality_checker
+from modules.quality_checker import AI_CLICHES, check_content_quality
+
+
+def test_cliche_patterns_are_counted_independently():
+    # 「首先.*?其次.*?最后」的区间内还有「在.*?方面」「进行.*?操作」，每个模式都要单独计数
+    content = "首先在工作方面进行了优化操作，其次在生活方面，最后众所周知，总而言之"
+    expected = sum(len(re.findall(p, content)) for p in AI_CLICHES)
+
+    details = check_content_quality(content)["details"]
+    assert expected == 6
+    assert details["ai_cliche_count"] == expected
+
+
+def test_personal_patterns_are_counted_independently():
+    content = "上次我的朋友来的时候，那天我见过他"
+    patterns = [r'我[的是有在]', r'我朋友', r'我同事', r'我见过', r'上次.*?时', r'那天', r'当时']
+    expected = sum(len(re.findall(p, content)) for p in patterns)
+
+    assert check_content_quality(content)["details"]["personal_count"] == expected
+
+
+def test_score_matches_per_pattern_penalties():
+    content = "首先在工作方面进行了优化操作，其次在生活方面，最后众所周知，总而言之"
+    # 套话 6 处（封顶 40）+ 数字不足 15 + 无个人经历 15 + 情绪不足 10 + 无反问 10 + 字数不足 20
+    assert check_content_quality(content)["score"] == 0
+    assert quality_checker.check_content_quality(content * 40)["details"]["ai_cliche_count"] == 240
+
+
+def test_emotion_count_same_with_and_without_automaton(monkeypatch):
+    pytest.importorskip("ahocorasick")
+    automaton = quality_checker._build_emotion_automaton()
+
+    # 「太爱了爱了爱了」：「太爱了」与「爱了爱了」重叠，「爱了爱了」自身也重叠
+    content = "绝了！太爱了爱了爱了爱了！！真的真的超级巨好用 yyds 🔥🔥 绝绝子 救命？"
+    expected = sum(content.count(word) for word in quality_checker.EMOTION_WORDS)
+    assert quality_checker._count_emotion_words_ac(content, automaton) == expected
+
+    monkeypatch.setattr(quality_checker, "_EMOTION_AC", automaton)
+    with_ac = check_content_quality(content)
+    monkeypatch.setattr(quality_checker, "_EMOTION_AC", None)
+    without_ac = check_content_quality(content)
+    assert with_ac["details"]["emotion_count"] == without_ac["details"]["emotion_count"] == expected
+    assert with_ac["score"] == without_ac["score"]
@@ -0,0 +1,47 @@
+"""
+语义缓存：同一选题的不同写法命中，只差一个关键词的选题不能命中
+"""
+from modules.semantic_cache import SemanticCache
+
+NS = "image|model|persona"
+
+
+def test_near_duplicate_chinese_topics_do_not_hit():
+    cache = SemanticCache()
+    pairs = [
+        ("打工人下班后如何高效学习英语，每天只需30分钟", "打工人下班后如何高效学习日语，每天只需30分钟"),
+        ("2024年考研数学一复习攻略，从零基础到130分", "2025年考研数学一复习攻略，从零基础到130分"),
+    ]
+    for cached_topic, other_topic in pairs:
+        cache.set(NS, cached_topic, cached_topic)
+        assert cache.get(NS, other_topic) is None
+        assert cache.get(NS, cached_topic) == cached_topic
+
+
+def test_rewordings_of_same_topic_hit():
+    cache = SemanticCache()
+    cache.set(NS, "爆款选题 职场干货", "note")
+    assert cache.get(NS, "职场干货 爆款选题") == "note"
+    assert cache.get(NS, "  爆款选题，职场干货！ ") == "note"
+    assert cache.get(NS, "爆款选题　职场干货") == "note"  # 全角空格
+
+
+def test_namespace_and_ttl():
+    cache = SemanticCache()
+    cache.set(NS, "职场干货", "note")
+    assert cache.get("video|model|persona", "职场干货") is None
+
+    cache = SemanticCache(ttl=-1)
+    cache.set(NS, "职场干货", "note")
+    assert cache.get(NS, "职场干货") is None
+
+
+def test_lru_eviction():
+    cache = SemanticCache(max_entries=2)
+    cache.set(NS, "a", 1)
+    cache.set(NS, "b", 2)
+    assert cache.get(NS, "a") == 1
+    cache.set(NS, "c", 3)
+    assert cache.get(NS, "b") is None
+    assert cache.get(NS, "a") == 1
+    assert cache.get(NS, "c") == 3
@@ -1,16 +1,17 @@
 """
 UI 组件模块 - 图文模式
 """
+import gc
 import os
 import time
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import streamlit as st
 import streamlit.components.v1 as components
 
 from modules.trend import analyze_trends
 from modules.crawler import fetch_note_content
 from modules.writer import generate_note_package
-from modules.painter import generate_images, generate_single_image
+from modules.painter import generate_images, generate_single_image, MAX_WORKERS as IMAGE_MAX_WORKERS
 from modules.audio import generate_audio_for_scenes, generate_single_audio, EDGE_VOICES, VOLC_VOICES
 from modules.editor import create_video, get_total_duration
 from pathlib import Path
@@ -27,6 +28,9 @@ AVAILABLE_MODELS = {
     "Grok 2 (马斯克/幽默)": "x-ai/grok-2-1212"
 }
 
+# Session State 中保留的选题数量上限（避免多次分析后列表无限增长）
+MAX_TOPICS = 20
+
 
 def init_session_state():
     """初始化 Session State（支持从缓存恢复）"""
@@ -36,7 +40,7 @@ def init_session_state():
     
     # 基础状态
     if "topics" not in st.session_state:
-        st.session_state.topics = load_state("topics", [])
+        st.session_state.topics = load_state("topics", [])[:MAX_TOPICS]
     if "selected_topic" not in st.session_state:
         st.session_state.selected_topic = load_state("selected_topic", None)
     if "note_result" not in st.session_state:
@@ -223,9 +227,10 @@ VOLC_TTS     {'[OK]' if volc_tts_ok else '[--]'}
         with st.expander("缓存管理"):
             if st.button("🗑️ 清除所有缓存", use_container_width=True):
                 clear_state()
-                for key in ["topics", "selected_topic", "note_result", "image_paths", "audio_paths", "video_path", "image_errors", "audio_errors", "workflow_mode"]:
+                for key in ["topics", "selected_topic", "selected_topic_data", "note_result", "image_paths", "audio_paths", "video_path", "image_errors", "audio_errors", "workflow_mode"]:
                     if key in st.session_state:
                         del st.session_state[key]
+                gc.collect()
                 st.rerun()
             
             st.caption("刷新页面会自动恢复上次进度")
@@ -270,7 +275,7 @@ def render_topic_selector():
         with st.spinner("🔍 联网搜索热点中..."):
             try:
                 topics, source = analyze_trends(keyword)
-                st.session_state.topics = topics
+                st.session_state.topics = topics[:MAX_TOPICS]
                 st.session_state.selected_topic = None
                 st.session_state.selected_topic_data = None  # 完整热点数据
                 _reset_downstream_state()
@@ -478,6 +483,9 @@ def render_persona_config():
                         
                 except Exception as e:
                     status.update(label=f"❌ 生成失败: {e}", state="error")
+                finally:
+                    # 释放生成过程中的临时对象（参考内容、LLM 响应等）
+                    gc.collect()
     
     st.markdown("---")
 
@@ -640,25 +648,43 @@ def _render_image_export():
     if st.button("🎨 一键生成所有配图", use_container_width=True, type="primary"):
         provider = getattr(st.session_state, 'image_provider', 'replicate')
         
+        use_schnell = getattr(st.session_state, 'use_schnell', False)
+        
         with st.status("生成配图中...", expanded=True) as status:
+            pending = []
             for i, design in enumerate(image_designs):
                 if image_paths[i] and os.path.exists(image_paths[i]):
                     st.write(f"✅ 配图 {i+1}: 已存在，跳过")
                     continue
-                
-                status.update(label=f"🎨 生成配图 {i+1}/{len(image_designs)}...")
-                
-                # 构造 scene 结构以复用 generate_single_image
-                scene_like = {"prompt": design.get("prompt", "")}
-                use_schnell = getattr(st.session_state, 'use_schnell', False)
-                path, error = generate_single_image(scene_like, i, provider, use_schnell=use_schnell)
-                image_paths[i] = path
-                image_errors[i] = error
-                
-                if path:
-                    st.write(f"✅ 配图 {i+1}: 成功")
-                else:
-                    st.write(f"❌ 配图 {i+1}: {error}")
+                pending.append((i, design))
+            
+            # 各配图互相独立且耗时在网络等待上：并发生成，
+            # Streamlit 组件只在主线程中按完成顺序更新
+            if pending:
+                status.update(label=f"🎨 并发生成 {len(pending)} 张配图...")
+                with ThreadPoolExecutor(max_workers=min(IMAGE_MAX_WORKERS, len(pending))) as executor:
+                    futures = {
+                        # 构造 scene 结构以复用 generate_single_image
+                        executor.submit(
+                            generate_single_image, {"prompt": design.get("prompt", "")}, i, provider,
+                            use_schnell=use_schnell,
+                        ): i
+                        for i, design in pending
+                    }
+                    for done, future in enumerate(as_completed(futures), 1):
+                        i = futures[future]
+                        try:
+                            path, error = future.result()
+                        except Exception as e:
+                            path, error = None, str(e)
+                        image_paths[i] = path
+                        image_errors[i] = error
+                        
+                        status.update(label=f"🎨 生成配图 {done}/{len(pending)}...")
+                        if path:
+                            st.write(f"✅ 配图 {i+1}: 成功")
+                        else:
+                            st.write(f"❌ 配图 {i+1}: {error}")
             
             st.session_state.image_paths = image_paths
             st.session_state.image_errors = image_errors
@@ -882,6 +908,8 @@ def _render_video_studio():
                 st.session_state.audio_errors = audio_errors
                 _save_all_state()
                 
+                gc.collect()
+                
                 img_ok = len([p for p in image_paths if p and os.path.exists(p)])
                 aud_ok = len([p for p in audio_paths if p and os.path.exists(p)])
                 st.write(f"✅ 图片: {img_ok}/{len(visual_scenes)} | 音频: {aud_ok}/{len(visual_scenes)}")
@@ -1005,6 +1033,9 @@ def _render_video_studio():
                             status.update(label="❌ 失败", state="error")
                     except Exception as e:
                         status.update(label=f"❌ {e}", state="error")
+                    finally:
+                        # MoviePy 合成会产生大量帧缓冲，及时回收
+                        gc.collect()
         else:
             st.button("🎬 合成视频", use_container_width=True, type="primary", disabled=True)
             st.caption("需完成所有素材")
@@ -1014,10 +1045,11 @@ def _render_video_studio():
         if video_path and os.path.exists(video_path):
             st.markdown("**成品预览**")
             st.video(video_path)
-            with open(video_path, "rb") as f:
+            # 直接传文件对象：视频内容只在本次渲染中读取，不在进程级缓存中常驻
+            with open(video_path, "rb") as video_file:
                 st.download_button(
                     label="📥 下载视频",
-                    data=f,
+                    data=video_file,
                     file_name=f"{st.session_state.selected_topic or 'output'}.mp4",
                     mime="video/mp4",
                     use_container_width=True